@@ -1,8 +1,7 @@
 import frappe
-from bs4 import BeautifulSoup
 from frappe.core.api.file import get_max_file_size
 from frappe.translate import get_all_translations
-from frappe.utils import cstr, split_emails, validate_email_address
+from frappe.utils import split_emails, validate_email_address
 from frappe.utils.modules import get_modules_from_all_apps_for_user
 from frappe.utils.telemetry import POSTHOG_HOST_FIELD, POSTHOG_PROJECT_FIELD
 
@@ -39,15 +38,7 @@ def get_user_signature():
 	if not signature:
 		return
 
-	soup = BeautifulSoup(signature, "html.parser")
-	html_signature = soup.find("div", {"class": "ql-editor read-mode"})
-	_signature = None
-	if html_signature:
-		_signature = html_signature.renderContents()
-	content = ""
-	if cstr(_signature) or signature:
-		content = f'<br><p class="signature">{signature}</p>'
-	return content
+	return f'<br><p class="signature">{signature}</p>'
 
 
 @frappe.whitelist()
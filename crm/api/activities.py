@@ -1,12 +1,53 @@
+import html
 import json
 
 import frappe
-from bs4 import BeautifulSoup
 from frappe import _
 from frappe.desk.form.load import get_docinfo
-from frappe.query_builder import JoinType
-
-from crm.fcrm.doctype.crm_call_log.crm_call_log import parse_call_log
+from frappe.query_builder import JoinType, Order
+from frappe.utils import cint, get_datetime, sbool, strip_html_tags
+from pypika import Criterion
+
+from crm.fcrm.doctype.crm_call_log.crm_call_log import parse_call_logs
+from crm.utils.html_extractor import extract_tag
+
+ATTACHMENT_FIELDS = [
+	"name",
+	"file_name",
+	"file_type",
+	"file_url",
+	"file_size",
+	"is_private",
+	"modified",
+	"creation",
+	"owner",
+]
+# changes to these fields are not shown in the timeline
+AVOID_FIELDS = {
+	"CRM Lead": [
+		"converted",
+		"response_by",
+		"sla_creation",
+		"sla",
+		"first_response_time",
+		"first_responded_on",
+	],
+	"CRM Deal": [
+		"lead",
+		"response_by",
+		"sla_creation",
+		"sla",
+		"first_response_time",
+		"first_responded_on",
+	],
+}
+TIMELINE_FIELDS_CACHE_KEY = "crm:timeline_fields"
+# number of parsed versions kept per process
+VERSION_CACHE_SIZE = 10000
+_version_cache = {}
+TIMELINE_PAGE_LENGTH = 20
+MAX_TIMELINE_PAGE_LENGTH = 100
+PREVIEW_LENGTH = 200
 
 
 @frappe.whitelist()
@@ -22,18 +63,6 @@ def get_activities(name):
 def get_deal_activities(name):
 	get_docinfo("", "CRM Deal", name)
 	docinfo = frappe.response["docinfo"]
-	deal_meta = frappe.get_meta("CRM Deal")
-	deal_fields = {
-		field.fieldname: {"label": field.label, "options": field.options} for field in deal_meta.fields
-	}
-	avoid_fields = [
-		"lead",
-		"response_by",
-		"sla_creation",
-		"sla",
-		"first_response_time",
-		"first_responded_on",
-	]
 
 	doc = frappe.db.get_values("CRM Deal", name, ["creation", "owner", "lead"])[0]
 	lead = doc[2]
@@ -49,251 +78,410 @@ def get_deal_activities(name):
 		activities, calls, notes, tasks, attachments = get_lead_activities(lead)
 		creation_text = "converted the lead to this deal"
 
-	activities.append(
-		{
-			"activity_type": "creation",
-			"creation": doc[0],
-			"owner": doc[1],
-			"data": creation_text,
-			"is_lead": False,
-		}
-	)
+	activities.append(get_creation_activity(doc[0], doc[1], creation_text, is_lead=False))
+	activities += get_docinfo_activities(docinfo, "CRM Deal")
 
-	docinfo.versions.reverse()
+	linked_calls = get_linked_calls(name)
+	calls = calls + linked_calls.get("calls", [])
+	notes = notes + get_linked_notes(name) + linked_calls.get("notes", [])
+	tasks = tasks + get_linked_tasks(name) + linked_calls.get("tasks", [])
+	attachments = attachments + get_attachments("CRM Deal", name)
 
-	for version in docinfo.versions:
-		data = json.loads(version.data)
-		if not data.get("changed"):
-			continue
+	activities.sort(key=lambda x: x["creation"], reverse=True)
+	activities = handle_multiple_versions(activities)
 
-		if change := data.get("changed")[0]:
-			field = deal_fields.get(change[0], None)
+	return activities, calls, notes, tasks, attachments
 
-			if not field or change[0] in avoid_fields or (not change[1] and not change[2]):
-				continue
 
-			field_label = field.get("label") or change[0]
-			field_option = field.get("options") or None
-
-			activity_type = "changed"
-			data = {
-				"field": change[0],
-				"field_label": field_label,
-				"old_value": change[1],
-				"value": change[2],
-			}
-
-			if not change[1] and change[2]:
-				activity_type = "added"
-				data = {
-					"field": change[0],
-					"field_label": field_label,
-					"value": change[2],
-				}
-			elif change[1] and not change[2]:
-				activity_type = "removed"
-				data = {
-					"field": change[0],
-					"field_label": field_label,
-					"value": change[1],
-				}
-
-		activity = {
-			"activity_type": activity_type,
-			"creation": version.creation,
-			"owner": version.owner,
-			"data": data,
-			"is_lead": False,
-			"options": field_option,
-		}
-		activities.append(activity)
+def get_lead_activities(name):
+	get_docinfo("", "CRM Lead", name)
+	docinfo = frappe.response["docinfo"]
+
+	doc = frappe.db.get_values("CRM Lead", name, ["creation", "owner"])[0]
+	activities = [get_creation_activity(doc[0], doc[1], "created this lead", is_lead=True)]
+	activities += get_docinfo_activities(docinfo, "CRM Lead")
+
+	linked_calls = get_linked_calls(name)
+	calls = linked_calls.get("calls", [])
+	notes = get_linked_notes(name) + linked_calls.get("notes", [])
+	tasks = get_linked_tasks(name) + linked_calls.get("tasks", [])
+	attachments = get_attachments("CRM Lead", name)
+
+	activities.sort(key=lambda x: x["creation"], reverse=True)
+	activities = handle_multiple_versions(activities)
+
+	return activities, calls, notes, tasks, attachments
+
+
+def get_docinfo_activities(docinfo, doctype):
+	"""
+	Build the version, comment, communication and attachment log activities of a lead/deal from its docinfo
+	"""
+	is_lead = doctype == "CRM Lead"
+	activities = get_version_activities(list(reversed(docinfo.versions)), doctype)
+
+	communications = docinfo.communications + docinfo.automated_messages
+	attachments = get_timeline_attachments(
+		[comment.name for comment in docinfo.comments],
+		[communication.name for communication in communications],
+	)
 
 	for comment in docinfo.comments:
-		activity = {
-			"name": comment.name,
-			"activity_type": "comment",
-			"creation": comment.creation,
-			"owner": comment.owner,
-			"content": comment.content,
-			"attachments": get_attachments("Comment", comment.name),
-			"is_lead": False,
-		}
-		activities.append(activity)
+		activities.append(
+			get_comment_activity(comment, is_lead, attachments.get(("Comment", comment.name), []))
+		)
 
-	for communication in docinfo.communications + docinfo.automated_messages:
-		activity = {
-			"activity_type": "communication",
-			"communication_type": communication.communication_type,
-			"communication_date": communication.communication_date or communication.creation,
-			"creation": communication.creation,
-			"data": {
-				"subject": communication.subject,
-				"content": communication.content,
-				"sender_full_name": communication.sender_full_name,
-				"sender": communication.sender,
-				"recipients": communication.recipients,
-				"cc": communication.cc,
-				"bcc": communication.bcc,
-				"attachments": get_attachments("Communication", communication.name),
-				"read_by_recipient": communication.read_by_recipient,
-				"delivery_status": communication.delivery_status,
-			},
-			"is_lead": False,
-		}
-		activities.append(activity)
+	for communication in communications:
+		activities.append(
+			get_communication_activity(
+				communication, is_lead, attachments.get(("Communication", communication.name), [])
+			)
+		)
 
 	for attachment_log in docinfo.attachment_logs:
-		activity = {
-			"name": attachment_log.name,
-			"activity_type": "attachment_log",
-			"creation": attachment_log.creation,
-			"owner": attachment_log.owner,
-			"data": parse_attachment_log(attachment_log.content, attachment_log.comment_type),
-			"is_lead": False,
-		}
-		activities.append(activity)
+		activities.append(get_attachment_log_activity(attachment_log, is_lead))
 
-	calls = calls + get_linked_calls(name).get("calls", [])
-	notes = notes + get_linked_notes(name) + get_linked_calls(name).get("notes", [])
-	tasks = tasks + get_linked_tasks(name) + get_linked_calls(name).get("tasks", [])
-	attachments = attachments + get_attachments("CRM Deal", name)
+	return activities
 
-	activities.sort(key=lambda x: x["creation"], reverse=True)
-	activities = handle_multiple_versions(activities)
 
-	return activities, calls, notes, tasks, attachments
+def get_version_fields(doctype):
+	"""
+	Label and options of the fields of `doctype` whose changes are shown in the timeline
+	"""
+	return get_timeline_fields(doctype).fields
+
+
+def get_timeline_fields(doctype):
+	"""
+	Get the timeline fields of `doctype`, cached until its meta is modified or customized
+
+	:return: `fields` as in `get_version_fields`, and a `token` that changes whenever they are rebuilt
+	"""
+	meta = frappe.get_meta(doctype)
+	modified = str(meta.modified)
+	cached = frappe.cache.hget(TIMELINE_FIELDS_CACHE_KEY, doctype)
+	if cached and cached.modified == modified:
+		return cached
+
+	cached = frappe._dict(
+		modified=modified,
+		token=frappe.generate_hash(length=10),
+		fields={
+			field.fieldname: {"label": field.label, "options": field.options}
+			for field in meta.fields
+			if field.fieldname not in AVOID_FIELDS[doctype]
+		},
+	)
+	frappe.cache.hset(TIMELINE_FIELDS_CACHE_KEY, doctype, cached)
+	return cached
 
 
-def get_lead_activities(name):
-	get_docinfo("", "CRM Lead", name)
-	docinfo = frappe.response["docinfo"]
-	lead_meta = frappe.get_meta("CRM Lead")
-	lead_fields = {
-		field.fieldname: {"label": field.label, "options": field.options} for field in lead_meta.fields
+def clear_timeline_fields_cache(doc, method=None):
+	"""
+	Evict the timeline fields of a lead/deal after its custom fields or property setters change
+	"""
+	doctype = doc.dt if doc.doctype == "Custom Field" else doc.doc_type
+	if doctype in AVOID_FIELDS:
+		frappe.cache.hdel(TIMELINE_FIELDS_CACHE_KEY, doctype)
+
+
+def get_version_activities(versions, doctype):
+	"""
+	Activities of the versions of a lead/deal, in order, skipping those not shown in the timeline.
+	Versions never change, so their activities are cached by name in every process and are only
+	rebuilt when the timeline fields of `doctype` are.
+
+	:param versions: Versions with `name`, `data`, `creation` and `owner`
+	:param doctype: Lead/Deal
+	"""
+	timeline_fields = get_timeline_fields(doctype)
+	is_lead = doctype == "CRM Lead"
+
+	activities = []
+	for version in versions:
+		key = (frappe.local.site, version.name)
+		cached = _version_cache.get(key)
+		if cached and cached[0] == timeline_fields.token:
+			activity = cached[1]
+		else:
+			activity = get_version_activity(version, timeline_fields.fields, is_lead)
+			if len(_version_cache) >= VERSION_CACHE_SIZE:
+				_version_cache.pop(next(iter(_version_cache), None), None)
+			_version_cache[key] = (timeline_fields.token, activity)
+
+		if activity:
+			# grouping adds `other_versions` to the activities, keep the cached ones intact
+			activities.append(activity.copy())
+	return activities
+
+
+def get_creation_activity(creation, owner, text, is_lead):
+	return {
+		"activity_type": "creation",
+		"creation": creation,
+		"owner": owner,
+		"data": text,
+		"is_lead": is_lead,
 	}
-	avoid_fields = [
-		"converted",
-		"response_by",
-		"sla_creation",
-		"sla",
-		"first_response_time",
-		"first_responded_on",
-	]
 
-	doc = frappe.db.get_values("CRM Lead", name, ["creation", "owner"])[0]
-	activities = [
-		{
-			"activity_type": "creation",
-			"creation": doc[0],
-			"owner": doc[1],
-			"data": "created this lead",
-			"is_lead": True,
+
+def get_version_activity(version, fields, is_lead):
+	"""
+	Activity for the first change of a version, `None` if it is not shown in the timeline
+
+	:param version: Version with `data`, `creation` and `owner`
+	:param fields: Fields shown in the timeline, from `get_version_fields`
+	:param is_lead: Whether the version belongs to a lead
+	"""
+	data = json.loads(version.data)
+	if not data.get("changed"):
+		return
+
+	change = data.get("changed")[0]
+	field = fields.get(change[0], None)
+	if not field or (not change[1] and not change[2]):
+		return
+
+	field_label = field.get("label") or change[0]
+	field_option = field.get("options") or None
+
+	activity_type = "changed"
+	data = {
+		"field": change[0],
+		"field_label": field_label,
+		"old_value": change[1],
+		"value": change[2],
+	}
+
+	if not change[1] and change[2]:
+		activity_type = "added"
+		data = {
+			"field": change[0],
+			"field_label": field_label,
+			"value": change[2],
+		}
+	elif change[1] and not change[2]:
+		activity_type = "removed"
+		data = {
+			"field": change[0],
+			"field_label": field_label,
+			"value": change[1],
 		}
-	]
 
-	docinfo.versions.reverse()
+	return {
+		"activity_type": activity_type,
+		"creation": version.creation,
+		"owner": version.owner,
+		"data": data,
+		"is_lead": is_lead,
+		"options": field_option,
+	}
 
-	for version in docinfo.versions:
-		data = json.loads(version.data)
-		if not data.get("changed"):
-			continue
 
-		if change := data.get("changed")[0]:
-			field = lead_fields.get(change[0], None)
+def get_comment_activity(comment, is_lead, attachments=None):
+	return {
+		"name": comment.name,
+		"activity_type": "comment",
+		"creation": comment.creation,
+		"owner": comment.owner,
+		"content": comment.content,
+		"attachments": attachments or [],
+		"is_lead": is_lead,
+	}
 
-			if not field or change[0] in avoid_fields or (not change[1] and not change[2]):
-				continue
 
-			field_label = field.get("label") or change[0]
-			field_option = field.get("options") or None
-
-			activity_type = "changed"
-			data = {
-				"field": change[0],
-				"field_label": field_label,
-				"old_value": change[1],
-				"value": change[2],
-			}
-
-			if not change[1] and change[2]:
-				activity_type = "added"
-				data = {
-					"field": change[0],
-					"field_label": field_label,
-					"value": change[2],
-				}
-			elif change[1] and not change[2]:
-				activity_type = "removed"
-				data = {
-					"field": change[0],
-					"field_label": field_label,
-					"value": change[1],
-				}
-
-		activity = {
-			"activity_type": activity_type,
-			"creation": version.creation,
-			"owner": version.owner,
-			"data": data,
-			"is_lead": True,
-			"options": field_option,
-		}
-		activities.append(activity)
+def get_communication_activity(communication, is_lead, attachments=None):
+	return {
+		"name": communication.name,
+		"activity_type": "communication",
+		"communication_type": communication.communication_type,
+		"communication_date": communication.communication_date or communication.creation,
+		"creation": communication.creation,
+		"data": {
+			"subject": communication.subject,
+			"content": communication.content,
+			"sender_full_name": communication.sender_full_name,
+			"sender": communication.sender,
+			"recipients": communication.recipients,
+			"cc": communication.cc,
+			"bcc": communication.bcc,
+			"attachments": attachments or [],
+			"read_by_recipient": communication.read_by_recipient,
+			"delivery_status": communication.delivery_status,
+		},
+		"is_lead": is_lead,
+	}
 
-	for comment in docinfo.comments:
-		activity = {
-			"name": comment.name,
-			"activity_type": "comment",
-			"creation": comment.creation,
-			"owner": comment.owner,
-			"content": comment.content,
-			"attachments": get_attachments("Comment", comment.name),
-			"is_lead": True,
-		}
-		activities.append(activity)
 
-	for communication in docinfo.communications + docinfo.automated_messages:
-		activity = {
-			"activity_type": "communication",
-			"communication_type": communication.communication_type,
-			"communication_date": communication.communication_date or communication.creation,
-			"creation": communication.creation,
-			"data": {
-				"subject": communication.subject,
-				"content": communication.content,
-				"sender_full_name": communication.sender_full_name,
-				"sender": communication.sender,
-				"recipients": communication.recipients,
-				"cc": communication.cc,
-				"bcc": communication.bcc,
-				"attachments": get_attachments("Communication", communication.name),
-				"read_by_recipient": communication.read_by_recipient,
-				"delivery_status": communication.delivery_status,
-			},
-			"is_lead": True,
-		}
-		activities.append(activity)
+def get_attachment_log_activity(attachment_log, is_lead):
+	return {
+		"name": attachment_log.name,
+		"activity_type": "attachment_log",
+		"creation": attachment_log.creation,
+		"owner": attachment_log.owner,
+		"data": parse_attachment_log(attachment_log.content, attachment_log.comment_type),
+		"is_lead": is_lead,
+	}
 
-	for attachment_log in docinfo.attachment_logs:
-		activity = {
-			"name": attachment_log.name,
-			"activity_type": "attachment_log",
-			"creation": attachment_log.creation,
-			"owner": attachment_log.owner,
-			"data": parse_attachment_log(attachment_log.content, attachment_log.comment_type),
-			"is_lead": True,
-		}
+
+@frappe.whitelist()
+def get_timeline(name, before=None, since=None, limit=TIMELINE_PAGE_LENGTH, previews=False):
+	"""
+	Get a page of the activity timeline of a lead/deal, newest first. The timeline of a deal
+	includes the one of the lead it was converted from.
+
+	Activities are read from the CRM Activity feed, pre-rendered as their sources change, with a
+	single range query on its `(reference_doctype, reference_name, creation)` index. Consecutive
+	changes by the same user are grouped within a page.
+
+	:param name: Lead/Deal name
+	:param before: Only return activities created before this, the `cursor` of the previous page
+	:param since: Only return activities created after this, the `latest` of an earlier page,
+	        to refresh the timeline after a realtime event. Pass `cursor` as `before` along with it
+	        for the rest of the new activities when `has_more` is set.
+	:param limit: Number of activities in the page, activities created at the same time as the
+	        last one are always included so that `cursor` doesn't skip them
+	:param previews: Return plain text previews of emails instead of their bodies, the bodies
+	        can then be loaded with `get_communication_content`
+	:return: `activities`, `has_more`, `cursor` and `latest`
+	"""
+	if frappe.db.exists("CRM Deal", name):
+		doctype = "CRM Deal"
+	elif frappe.db.exists("CRM Lead", name):
+		doctype = "CRM Lead"
+	else:
+		frappe.throw(_("Document not found"), frappe.DoesNotExistError)
+
+	frappe.has_permission(doctype, "read", name, throw=True)
+
+	limit = min(cint(limit) or TIMELINE_PAGE_LENGTH, MAX_TIMELINE_PAGE_LENGTH)
+	references = [(doctype, name)]
+	if doctype == "CRM Deal" and (lead := frappe.db.get_value("CRM Deal", name, "lead")):
+		references.append(("CRM Lead", lead))
+
+	Activity = frappe.qb.DocType("CRM Activity")
+	query = (
+		frappe.qb.from_(Activity)
+		.select(Activity.name, Activity.creation, Activity.data)
+		.where(
+			Criterion.any(
+				[
+					(Activity.reference_doctype == reference_doctype)
+					& (Activity.reference_name == reference_name)
+					for reference_doctype, reference_name in references
+				]
+			)
+		)
+		.orderby(Activity.creation, order=Order.desc)
+		.orderby(Activity.name, order=Order.desc)
+	)
+	if before:
+		query = query.where(Activity.creation < get_datetime(before))
+	if since:
+		query = query.where(Activity.creation > get_datetime(since))
+
+	rows = query.limit(limit + 1).run(as_dict=True)
+	has_more = len(rows) > limit
+	if has_more:
+		next_row, rows = rows[limit], rows[:limit]
+		last = rows[-1]
+		if next_row.creation == last.creation:
+			# include the rest of the activities created with the last one, `cursor` would skip them
+			rows += (
+				query.where(Activity.creation == last.creation)
+				.where(Activity.name < last.name)
+				.run(as_dict=True)
+			)
+			has_more = bool(query.where(Activity.creation < last.creation).limit(1).run())
+
+	activities = []
+	for row in rows:
+		activity = json.loads(row.data)
+		activity["creation"] = row.creation
 		activities.append(activity)
 
-	calls = get_linked_calls(name).get("calls", [])
-	notes = get_linked_notes(name) + get_linked_calls(name).get("notes", [])
-	tasks = get_linked_tasks(name) + get_linked_calls(name).get("tasks", [])
-	attachments = get_attachments("CRM Lead", name)
+	cursor = activities[-1]["creation"] if activities else None
+	latest = activities[0]["creation"] if activities else None
+	load_timeline_details(activities, sbool(previews))
 
-	activities.sort(key=lambda x: x["creation"], reverse=True)
-	activities = handle_multiple_versions(activities)
+	return {
+		"activities": handle_multiple_versions(activities),
+		"has_more": has_more,
+		"cursor": cursor,
+		"latest": latest,
+	}
 
-	return activities, calls, notes, tasks, attachments
+
+@frappe.whitelist()
+def get_communication_content(name):
+	"""
+	Get the full body of an email shown as a preview in the timeline
+	"""
+	frappe.has_permission("Communication", "read", name, throw=True)
+	return frappe.db.get_value("Communication", name, "content")
+
+
+def load_timeline_details(activities, previews=False):
+	"""
+	Load what the activity feed doesn't store for a page of activities, in batched queries:
+	the labels and options of changed fields, the callers and contacts of calls, and the
+	bodies of emails unless `previews` is set
+	"""
+	load_field_labels(activities)
+
+	calls = [activity for activity in activities if activity["activity_type"] == "call"]
+	# sets the `activity_type` of calls to incoming_call/outgoing_call
+	parse_call_logs(calls)
+
+	if previews:
+		return
+
+	communications = [a for a in activities if a["activity_type"] == "communication"]
+	if not communications:
+		return
+
+	contents = dict(
+		frappe.db.get_all(
+			"Communication",
+			filters={"name": ("in", [a["name"] for a in communications])},
+			fields=["name", "content"],
+			as_list=True,
+		)
+	)
+	for activity in communications:
+		activity["data"]["content"] = contents.get(activity["name"])
+		activity["data"]["is_preview"] = False
+
+
+def load_field_labels(activities):
+	"""
+	Set the current label and options of the field changed by each version activity, dropping
+	the activities of fields that are no longer shown in the timeline
+	"""
+	fields = {}
+	shown = []
+	for activity in activities:
+		if activity["activity_type"] in ("changed", "added", "removed"):
+			doctype = "CRM Lead" if activity.get("is_lead") else "CRM Deal"
+			if doctype not in fields:
+				fields[doctype] = get_version_fields(doctype)
+			field = fields[doctype].get(activity["data"]["field"])
+			if not field:
+				continue
+			activity["data"]["field_label"] = field.get("label") or activity["data"]["field"]
+			activity["options"] = field.get("options") or None
+		shown.append(activity)
+	activities[:] = shown
+
+
+def get_content_preview(content):
+	"""
+	Plain text preview of the start of an email body
+	"""
+	text = " ".join(html.unescape(strip_html_tags(content or "")).split())
+	if len(text) > PREVIEW_LENGTH:
+		text = text[:PREVIEW_LENGTH].rsplit(" ", 1)[0] + "…"
+	return text
 
 
 def get_attachments(doctype, name):
@@ -301,22 +489,41 @@ def get_attachments(doctype, name):
 		frappe.db.get_all(
 			"File",
 			filters={"attached_to_doctype": doctype, "attached_to_name": name},
-			fields=[
-				"name",
-				"file_name",
-				"file_type",
-				"file_url",
-				"file_size",
-				"is_private",
-				"modified",
-				"creation",
-				"owner",
-			],
+			fields=ATTACHMENT_FIELDS,
 		)
 		or []
 	)
 
 
+def get_timeline_attachments(comments, communications):
+	"""
+	Get the attachments of all comments and communications of a timeline in one query,
+	instead of one query per item
+
+	:param comments: Comment names
+	:param communications: Communication names
+	:return: Attachments keyed by `(attached_to_doctype, attached_to_name)`
+	"""
+	names = comments + communications
+	if not names:
+		return {}
+
+	files = frappe.db.get_all(
+		"File",
+		filters={
+			"attached_to_doctype": ("in", ["Comment", "Communication"]),
+			"attached_to_name": ("in", names),
+		},
+		fields=[*ATTACHMENT_FIELDS, "attached_to_doctype", "attached_to_name"],
+	)
+
+	attachments = {}
+	for file in files:
+		key = (file.pop("attached_to_doctype"), file.pop("attached_to_name"))
+		attachments.setdefault(key, []).append(file)
+	return attachments
+
+
 def handle_multiple_versions(versions):
 	activities = []
 	grouped_versions = []
@@ -443,7 +650,7 @@ def get_linked_calls(name):
 			],
 		)
 
-	calls = [parse_call_log(call) for call in calls] if calls else []
+	calls = parse_call_logs(calls)
 
 	return {"calls": calls, "notes": notes, "tasks": tasks}
 
@@ -476,8 +683,7 @@ def get_linked_tasks(name):
 
 
 def parse_attachment_log(html, type):
-	soup = BeautifulSoup(html, "html.parser")
-	a_tag = soup.find("a")
+	a_tag = extract_tag(html, "a")
 	type = "added" if type == "Attachment" else "removed"
 	if not a_tag:
 		return {
@@ -487,13 +693,14 @@ def parse_attachment_log(html, type):
 			"is_private": False,
 		}
 
+	href = a_tag.attrs.get("href") or ""
 	is_private = False
-	if "private/files" in a_tag["href"]:
+	if "private/files" in href:
 		is_private = True
 
 	return {
 		"type": type,
 		"file_name": a_tag.text,
-		"file_url": a_tag["href"],
+		"file_url": href,
 		"is_private": is_private,
 	}
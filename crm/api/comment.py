@@ -2,8 +2,8 @@ from collections.abc import Iterable
 
 import frappe
 from frappe import _
-from bs4 import BeautifulSoup
 from crm.fcrm.doctype.crm_notification.crm_notification import notify_user
+from crm.utils.html_extractor import extract_tags
 
 
 def on_update(self, method):
@@ -55,11 +55,12 @@ def notify_mentions(doc):
 def extract_mentions(html):
     if not html:
         return []
-    soup = BeautifulSoup(html, "html.parser")
     mentions = []
-    for d in soup.find_all("span", attrs={"data-type": "mention"}):
+    for d in extract_tags(html, "span", {"data-type": "mention"}):
         mentions.append(
-            frappe._dict(full_name=d.get("data-label"), email=d.get("data-id"))
+            frappe._dict(
+                full_name=d.attrs.get("data-label"), email=d.attrs.get("data-id")
+            )
         )
     return mentions
 
@@ -1,11 +1,20 @@
 import frappe
 from frappe import _
 
+from crm.utils import get_national_phone_number, normalize_phone_number
+
 
 def validate(doc, method):
+	set_normalized_phone_numbers(doc)
 	update_deals_email_mobile_no(doc)
 
 
+def set_normalized_phone_numbers(doc):
+	for row in doc.phone_nos:
+		row.mobile_no_normalized = normalize_phone_number(row.phone)
+		row.mobile_no_national = get_national_phone_number(row.phone)
+
+
 def update_deals_email_mobile_no(doc):
 	linked_deals = frappe.get_all(
 		"CRM Contacts",
@@ -22,6 +31,7 @@ def update_deals_email_mobile_no(doc):
 				{
 					"email": doc.email_id,
 					"mobile_no": doc.mobile_no,
+					"mobile_no_normalized": normalize_phone_number(doc.mobile_no),
 				},
 			)
 
@@ -1,11 +1,33 @@
+import hashlib
 import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
 
 import frappe
 from frappe import _
+from frappe.utils import add_days, cint, date_diff, getdate, now
+from werkzeug.local import release_local
 
 from crm.fcrm.doctype.crm_dashboard.crm_dashboard import create_default_manager_dashboard
 from crm.utils import sales_user_only
 
+# charts are evaluated on a pool of this many threads per process, each keeping its own
+# database connection, override with `crm_dashboard_workers` in site config
+DASHBOARD_WORKERS = 4
+# seconds a chart may take before it is reported as failed
+CHART_TIMEOUT = 10
+# computed charts are kept in the cache under `crm:dashboard_cache:<key>`, the hash
+# `crm:dashboard_cache` maps every such key to the dates its data is drawn from
+DASHBOARD_CACHE_KEY = "crm:dashboard_cache"
+DASHBOARD_CACHE_TTL = 60 * 60
+# charts not limited to the selected dates, evicted on any change
+UNBOUNDED_CHARTS = ("forecasted_revenue",)
+
+chart_pools: dict[int, ThreadPoolExecutor] = {}
+chart_worker = threading.local()
+
 
 @frappe.whitelist()
 def reset_to_default():
@@ -39,13 +61,9 @@ def get_dashboard(from_date="", to_date="", user=""):
 	else:
 		layout = json.loads(frappe.db.get_value("CRM Dashboard", "Manager Dashboard", "layout") or "[]")
 
+	charts = get_charts([l["name"] for l in layout], from_date, to_date, user)
 	for l in layout:
-		method_name = f"get_{l['name']}"
-		if hasattr(frappe.get_attr("crm.api.dashboard"), method_name):
-			method = getattr(frappe.get_attr("crm.api.dashboard"), method_name)
-			l["data"] = method(from_date, to_date, user)
-		else:
-			l["data"] = None
+		l["data"] = charts.get(l["name"])
 
 	return layout
 
@@ -65,49 +83,233 @@ def get_chart(name, type, from_date="", to_date="", user=""):
 	if is_sales_user and not user:
 		user = frappe.session.user
 
-	method_name = f"get_{name}"
-	if hasattr(frappe.get_attr("crm.api.dashboard"), method_name):
-		method = getattr(frappe.get_attr("crm.api.dashboard"), method_name)
-		return method(from_date, to_date, user)
+	if get_chart_method(name):
+		return get_charts([name], from_date, to_date, user)[name]
 	else:
 		return {"error": _("Invalid chart name")}
 
 
+def get_charts(names, from_date, to_date, user=""):
+	"""
+	Get data of charts `names`, computing only the ones missing in the cache.
+	Computed data carries the time it was computed at in `computed_at`.
+	"""
+	keys = {name: get_dashboard_cache_key(name, from_date, to_date, user) for name in names}
+
+	res = {}
+	for name, key in keys.items():
+		data = frappe.cache.get_value(key)
+		if data:
+			res[name] = data
+
+	window = get_dashboard_cache_window(from_date, to_date)
+	computed = evaluate_charts([name for name in keys if name not in res], from_date, to_date, user)
+	for name, data in computed.items():
+		if isinstance(data, dict) and "error" not in data:
+			data["computed_at"] = now()
+			frappe.cache.set_value(keys[name], data, expires_in_sec=DASHBOARD_CACHE_TTL)
+			frappe.cache.hset(
+				DASHBOARD_CACHE_KEY,
+				keys[name],
+				(None, None, time.time()) if name in UNBOUNDED_CHARTS else (*window, time.time()),
+			)
+		res[name] = data
+	return res
+
+
+def get_dashboard_cache_key(name, from_date, to_date, user=""):
+	# the charts a user may see, and how, depend on their roles
+	roles = hashlib.md5("|".join(sorted(frappe.get_roles())).encode()).hexdigest()
+	return f"{DASHBOARD_CACHE_KEY}:{name}:{getdate(from_date)}:{getdate(to_date)}:{user}:{roles}"
+
+
+def get_dashboard_cache_window(from_date, to_date):
+	"""
+	Get the dates a chart for `from_date` to `to_date` reads, including the
+	period of the same length before it which deltas are computed against.
+	"""
+	diff = date_diff(to_date, from_date) or 1
+	return add_days(getdate(from_date), -diff), getdate(to_date)
+
+
+def clear_dashboard_cache(doc, method=None):
+	"""
+	Evict cached charts reading any date `doc` contributes to, once the change is committed.
+	Hooked on changes of leads, deals, deal statuses and status change logs.
+	"""
+	dates = get_dashboard_dates(doc)
+	frappe.db.after_commit.add(lambda: evict_dashboard_cache(dates))
+
+
+def get_dashboard_dates(doc):
+	"""
+	Get the dates charts draw `doc` on, `None` if it can affect any date
+	"""
+	if doc.doctype == "CRM Lead":
+		return {getdate(doc.creation)}
+	if doc.doctype == "CRM Deal":
+		before = doc.get_doc_before_save()
+		closed_dates = {doc.closed_date, before.closed_date if before else None}
+		return {getdate(doc.creation)} | {getdate(d) for d in closed_dates if d}
+	# status types and logs apply to deals of any date
+	return None
+
+
+def evict_dashboard_cache(dates=None):
+	"""
+	Evict cached charts whose window covers any of `dates`, all of them if `dates` is `None`
+	"""
+	index = frappe.cache.hgetall(DASHBOARD_CACHE_KEY) or {}
+	expiry = time.time() - DASHBOARD_CACHE_TTL
+
+	keys = []
+	for key, (from_date, to_date, computed_at) in index.items():
+		if (
+			dates is None
+			or from_date is None
+			or computed_at < expiry
+			or any(from_date <= date <= to_date for date in dates)
+		):
+			keys.append(key)
+
+	if keys:
+		frappe.cache.delete_value(keys)
+		for key in keys:
+			frappe.cache.hdel(DASHBOARD_CACHE_KEY, key)
+
+
+def get_chart_method(name):
+	"""
+	Get the function computing chart `name`, if there is one.
+	"""
+	return getattr(frappe.get_attr("crm.api.dashboard"), f"get_{name}", None)
+
+
+def evaluate_charts(names, from_date, to_date, user=""):
+	"""
+	Evaluate charts `names` concurrently on the chart pool, so the dashboard takes about as
+	long as its slowest chart. A chart that fails or runs out of time gets an `{"error": ...}`
+	in place of its data without affecting the others.
+	"""
+	names = [name for name in dict.fromkeys(names) if get_chart_method(name)]
+	workers = cint(frappe.conf.get("crm_dashboard_workers", DASHBOARD_WORKERS))
+
+	# worker connections can't see uncommitted data, tests run inside a transaction
+	if min(workers, len(names)) <= 1 or frappe.flags.in_test:
+		return {name: evaluate_chart(name, from_date, to_date, user) for name in names}
+
+	context = frappe._dict(
+		site=frappe.local.site,
+		sites_path=frappe.local.sites_path,
+		user=frappe.session.user,
+		lang=frappe.local.lang,
+	)
+	pool = get_chart_pool(workers)
+	futures = {
+		name: pool.submit(evaluate_chart_in_thread, context, name, from_date, to_date, user) for name in names
+	}
+
+	# every chart is stopped by the statement timeout of its connection, this only
+	# guards against a worker that hangs anyway
+	deadline = time.monotonic() + CHART_TIMEOUT * -(-len(names) // min(workers, len(names)))
+	res = {}
+	for name, future in futures.items():
+		try:
+			res[name] = future.result(timeout=max(deadline - time.monotonic(), 0))
+		except FutureTimeoutError:
+			future.cancel()
+			res[name] = {"error": _("Chart took too long to load")}
+		except Exception:
+			# the worker could not connect
+			frappe.log_error(title=f"Dashboard chart {name} failed")
+			res[name] = {"error": _("Could not load this chart")}
+	return res
+
+
+def get_chart_pool(workers: int) -> ThreadPoolExecutor:
+	"""
+	Get the pool of this process evaluating charts on `workers` threads, created on first use
+	and kept for every later request
+	"""
+	if workers not in chart_pools:
+		chart_pools[workers] = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="crm-dashboard")
+	return chart_pools[workers]
+
+
+def evaluate_chart_in_thread(context, name, from_date, to_date, user=""):
+	"""
+	Evaluate chart `name` on a worker thread of the chart pool
+
+	:param context: Site, user and language of the request
+	"""
+	frappe.init(site=context.site, sites_path=context.sites_path)
+	try:
+		connect_chart_worker(context.site)
+		frappe.set_user(context.user)
+		frappe.local.lang = context.lang
+		res = evaluate_chart(name, from_date, to_date, user)
+		# keeps the error log of a failed chart
+		frappe.db.commit()
+		return res
+	finally:
+		# the connection is kept for the next chart of this thread, the rest is per request
+		release_local(frappe.local)
+
+
+def connect_chart_worker(site):
+	"""
+	Attach the connection of this worker thread to `site`, connecting the first time and again
+	when the server dropped it. Statements on it are stopped after `CHART_TIMEOUT` seconds.
+	"""
+	connections = chart_worker.__dict__.setdefault("connections", {})
+	if site in connections:
+		frappe.local.db = connections[site]
+		try:
+			frappe.db.sql("SELECT 1")
+			return
+		except Exception:
+			frappe.db.close()
+
+	frappe.connect(set_admin_as_user=False)
+	if frappe.db.db_type == "mariadb":
+		frappe.db.sql("SET SESSION max_statement_time = %s", CHART_TIMEOUT)
+	connections[site] = frappe.local.db
+
+
+def evaluate_chart(name, from_date, to_date, user=""):
+	"""
+	Get data of chart `name`, or an `{"error": ...}` if it can't be computed.
+	"""
+	try:
+		return get_chart_method(name)(from_date, to_date, user)
+	except Exception:
+		frappe.log_error(title=f"Dashboard chart {name} failed")
+		return {"error": _("Could not load this chart")}
+
+
 def get_total_leads(from_date, to_date, user=""):
 	"""
 	Get lead count for the dashboard.
 	"""
-	conds = ""
-
 	diff = frappe.utils.date_diff(to_date, from_date)
 	if diff == 0:
 		diff = 1
 
-	if user:
-		conds += f" AND lead_owner = '{user}'"
-
 	result = frappe.db.sql(
 		f"""
 		SELECT
-            COUNT(CASE
-                WHEN creation >= %(from_date)s AND creation < DATE_ADD(%(to_date)s, INTERVAL 1 DAY)
-                {conds}
-                THEN name
-                ELSE NULL
-            END) as current_month_leads,
-
-            COUNT(CASE
-                WHEN creation >= %(prev_from_date)s AND creation < %(from_date)s
-                {conds}
-                THEN name
-                ELSE NULL
-            END) as prev_month_leads
-		FROM `tabCRM Lead`
-    """,
+			SUM(CASE WHEN m.date >= %(from_date)s THEN m.count ELSE 0 END) as current_month_leads,
+			SUM(CASE WHEN m.date < %(from_date)s THEN m.count ELSE 0 END) as prev_month_leads
+		FROM `tabCRM Daily Metric` m
+		WHERE m.reference_doctype = 'CRM Lead' AND m.based_on = 'Created'
+			AND {get_date_range_cond("m.date", "prev_from_date", "to_date")}
+			{get_metric_conds(user)}
+		""",
 		{
 			"from_date": from_date,
 			"to_date": to_date,
 			"prev_from_date": frappe.utils.add_days(from_date, -diff),
+			"user": user,
 		},
 		as_dict=1,
 	)
@@ -132,46 +334,12 @@ def get_ongoing_deals(from_date, to_date, user=""):
 	"""
 	Get ongoing deal count for the dashboard, and also calculate average deal value for ongoing deals.
 	"""
-	conds = ""
-
-	diff = frappe.utils.date_diff(to_date, from_date)
-	if diff == 0:
-		diff = 1
-
-	if user:
-		conds += f" AND d.deal_owner = '{user}'"
-
-	result = frappe.db.sql(
-		f"""
-		SELECT
-			COUNT(CASE
-				WHEN d.creation >= %(from_date)s AND d.creation < DATE_ADD(%(to_date)s, INTERVAL 1 DAY)
-					AND s.type NOT IN ('Won', 'Lost')
-					{conds}
-				THEN d.name
-				ELSE NULL
-			END) as current_month_deals,
-
-			COUNT(CASE
-				WHEN d.creation >= %(prev_from_date)s AND d.creation < %(from_date)s
-					AND s.type NOT IN ('Won', 'Lost')
-					{conds}
-				THEN d.name
-				ELSE NULL
-			END) as prev_month_deals
-		FROM `tabCRM Deal` d
-		JOIN `tabCRM Deal Status` s ON d.status = s.name
-	""",
-		{
-			"from_date": from_date,
-			"to_date": to_date,
-			"prev_from_date": frappe.utils.add_days(from_date, -diff),
-		},
-		as_dict=1,
+	result = get_deal_metric_totals(
+		from_date, to_date, user, based_on="Created", status_conds="s.type NOT IN ('Won', 'Lost')"
 	)
 
-	current_month_deals = result[0].current_month_deals or 0
-	prev_month_deals = result[0].prev_month_deals or 0
+	current_month_deals = result.current_count or 0
+	prev_month_deals = result.prev_count or 0
 
 	delta_in_percentage = (
 		(current_month_deals - prev_month_deals) / prev_month_deals * 100 if prev_month_deals else 0
@@ -190,46 +358,12 @@ def get_average_ongoing_deal_value(from_date, to_date, user=""):
 	"""
 	Get ongoing deal count for the dashboard, and also calculate average deal value for ongoing deals.
 	"""
-	conds = ""
-
-	diff = frappe.utils.date_diff(to_date, from_date)
-	if diff == 0:
-		diff = 1
-
-	if user:
-		conds += f" AND d.deal_owner = '{user}'"
-
-	result = frappe.db.sql(
-		f"""
-		SELECT
-			AVG(CASE
-				WHEN d.creation >= %(from_date)s AND d.creation < DATE_ADD(%(to_date)s, INTERVAL 1 DAY)
-					AND s.type NOT IN ('Won', 'Lost')
-					{conds}
-				THEN d.deal_value * IFNULL(d.exchange_rate, 1)
-				ELSE NULL
-			END) as current_month_avg_value,
-
-			AVG(CASE
-				WHEN d.creation >= %(prev_from_date)s AND d.creation < %(from_date)s
-					AND s.type NOT IN ('Won', 'Lost')
-					{conds}
-				THEN d.deal_value * IFNULL(d.exchange_rate, 1)
-				ELSE NULL
-			END) as prev_month_avg_value
-		FROM `tabCRM Deal` d
-		JOIN `tabCRM Deal Status` s ON d.status = s.name
-    """,
-		{
-			"from_date": from_date,
-			"to_date": to_date,
-			"prev_from_date": frappe.utils.add_days(from_date, -diff),
-		},
-		as_dict=1,
+	result = get_deal_metric_totals(
+		from_date, to_date, user, based_on="Created", status_conds="s.type NOT IN ('Won', 'Lost')"
 	)
 
-	current_month_avg_value = result[0].current_month_avg_value or 0
-	prev_month_avg_value = result[0].prev_month_avg_value or 0
+	current_month_avg_value = get_average(result.current_value, result.current_value_count)
+	prev_month_avg_value = get_average(result.prev_value, result.prev_value_count)
 
 	avg_value_delta = current_month_avg_value - prev_month_avg_value if prev_month_avg_value else 0
 
@@ -246,47 +380,12 @@ def get_won_deals(from_date, to_date, user=""):
 	"""
 	Get won deal count for the dashboard, and also calculate average deal value for won deals.
 	"""
-
-	diff = frappe.utils.date_diff(to_date, from_date)
-	if diff == 0:
-		diff = 1
-
-	conds = ""
-
-	if user:
-		conds += f" AND d.deal_owner = '{user}'"
-
-	result = frappe.db.sql(
-		f"""
-		SELECT
-			COUNT(CASE
-				WHEN d.closed_date >= %(from_date)s AND d.closed_date < DATE_ADD(%(to_date)s, INTERVAL 1 DAY)
-					AND s.type = 'Won'
-					{conds}
-				THEN d.name
-				ELSE NULL
-			END) as current_month_deals,
-
-			COUNT(CASE
-				WHEN d.closed_date >= %(prev_from_date)s AND d.closed_date < %(from_date)s
-					AND s.type = 'Won'
-					{conds}
-				THEN d.name
-				ELSE NULL
-			END) as prev_month_deals
-		FROM `tabCRM Deal` d
-		JOIN `tabCRM Deal Status` s ON d.status = s.name
-		""",
-		{
-			"from_date": from_date,
-			"to_date": to_date,
-			"prev_from_date": frappe.utils.add_days(from_date, -diff),
-		},
-		as_dict=1,
+	result = get_deal_metric_totals(
+		from_date, to_date, user, based_on="Closed", status_conds="s.type = 'Won'"
 	)
 
-	current_month_deals = result[0].current_month_deals or 0
-	prev_month_deals = result[0].prev_month_deals or 0
+	current_month_deals = result.current_count or 0
+	prev_month_deals = result.prev_count or 0
 
 	delta_in_percentage = (
 		(current_month_deals - prev_month_deals) / prev_month_deals * 100 if prev_month_deals else 0
@@ -305,47 +404,12 @@ def get_average_won_deal_value(from_date, to_date, user=""):
 	"""
 	Get won deal count for the dashboard, and also calculate average deal value for won deals.
 	"""
-
-	diff = frappe.utils.date_diff(to_date, from_date)
-	if diff == 0:
-		diff = 1
-
-	conds = ""
-
-	if user:
-		conds += f" AND d.deal_owner = '{user}'"
-
-	result = frappe.db.sql(
-		f"""
-		SELECT
-			AVG(CASE
-				WHEN d.closed_date >= %(from_date)s AND d.closed_date < DATE_ADD(%(to_date)s, INTERVAL 1 DAY)
-					AND s.type = 'Won'
-					{conds}
-				THEN d.deal_value * IFNULL(d.exchange_rate, 1)
-				ELSE NULL
-			END) as current_month_avg_value,
-
-			AVG(CASE
-				WHEN d.closed_date >= %(prev_from_date)s AND d.closed_date < %(from_date)s
-					AND s.type = 'Won'
-					{conds}
-				THEN d.deal_value * IFNULL(d.exchange_rate, 1)
-				ELSE NULL
-			END) as prev_month_avg_value
-		FROM `tabCRM Deal` d
-		JOIN `tabCRM Deal Status` s ON d.status = s.name
-		""",
-		{
-			"from_date": from_date,
-			"to_date": to_date,
-			"prev_from_date": frappe.utils.add_days(from_date, -diff),
-		},
-		as_dict=1,
+	result = get_deal_metric_totals(
+		from_date, to_date, user, based_on="Closed", status_conds="s.type = 'Won'"
 	)
 
-	current_month_avg_value = result[0].current_month_avg_value or 0
-	prev_month_avg_value = result[0].prev_month_avg_value or 0
+	current_month_avg_value = get_average(result.current_value, result.current_value_count)
+	prev_month_avg_value = get_average(result.prev_value, result.prev_value_count)
 
 	avg_value_delta = current_month_avg_value - prev_month_avg_value if prev_month_avg_value else 0
 
@@ -362,47 +426,12 @@ def get_average_deal_value(from_date, to_date, user=""):
 	"""
 	Get average deal value for the dashboard.
 	"""
-
-	diff = frappe.utils.date_diff(to_date, from_date)
-	if diff == 0:
-		diff = 1
-
-	conds = ""
-
-	if user:
-		conds += f" AND d.deal_owner = '{user}'"
-
-	result = frappe.db.sql(
-		f"""
-		SELECT
-			AVG(CASE
-				WHEN d.creation >= %(from_date)s AND d.creation < DATE_ADD(%(to_date)s, INTERVAL 1 DAY)
-					AND s.type != 'Lost'
-					{conds}
-				THEN d.deal_value * IFNULL(d.exchange_rate, 1)
-				ELSE NULL
-			END) as current_month_avg,
-
-			AVG(CASE
-				WHEN d.creation >= %(prev_from_date)s AND d.creation < %(from_date)s
-					AND s.type != 'Lost'
-					{conds}
-				THEN d.deal_value * IFNULL(d.exchange_rate, 1)
-				ELSE NULL
-			END) as prev_month_avg
-		FROM `tabCRM Deal` AS d
-		JOIN `tabCRM Deal Status` s ON d.status = s.name
-		""",
-		{
-			"from_date": from_date,
-			"to_date": to_date,
-			"prev_from_date": frappe.utils.add_days(from_date, -diff),
-		},
-		as_dict=1,
+	result = get_deal_metric_totals(
+		from_date, to_date, user, based_on="Created", status_conds="s.type != 'Lost'"
 	)
 
-	current_month_avg = result[0].current_month_avg or 0
-	prev_month_avg = result[0].prev_month_avg or 0
+	current_month_avg = get_average(result.current_value, result.current_value_count)
+	prev_month_avg = get_average(result.prev_value, result.prev_value_count)
 
 	delta = current_month_avg - prev_month_avg if prev_month_avg else 0
 
@@ -420,43 +449,12 @@ def get_average_time_to_close_a_lead(from_date, to_date, user=""):
 	"""
 	Get average time to close deals for the dashboard.
 	"""
-
-	diff = frappe.utils.date_diff(to_date, from_date)
-	if diff == 0:
-		diff = 1
-
-	conds = ""
-
-	if user:
-		conds += f" AND d.deal_owner = '{user}'"
-
-	prev_from_date = frappe.utils.add_days(from_date, -diff)
-	prev_to_date = from_date
-
-	result = frappe.db.sql(
-		f"""
-		SELECT
-			AVG(CASE WHEN d.closed_date >= %(from_date)s AND d.closed_date < DATE_ADD(%(to_date)s, INTERVAL 1 DAY)
-				THEN TIMESTAMPDIFF(DAY, COALESCE(l.creation, d.creation), d.closed_date) END) as current_avg_lead,
-			AVG(CASE WHEN d.closed_date >= %(prev_from_date)s AND d.closed_date < %(prev_to_date)s
-				THEN TIMESTAMPDIFF(DAY, COALESCE(l.creation, d.creation), d.closed_date) END) as prev_avg_lead
-		FROM `tabCRM Deal` AS d
-		JOIN `tabCRM Deal Status` s ON d.status = s.name
-		LEFT JOIN `tabCRM Lead` l ON d.lead = l.name
-		WHERE d.closed_date IS NOT NULL AND s.type = 'Won'
-			{conds}
-		""",
-		{
-			"from_date": from_date,
-			"to_date": to_date,
-			"prev_from_date": prev_from_date,
-			"prev_to_date": prev_to_date,
-		},
-		as_dict=1,
+	result = get_deal_metric_totals(
+		from_date, to_date, user, based_on="Closed", status_conds="s.type = 'Won'"
 	)
 
-	current_avg_lead = result[0].current_avg_lead or 0
-	prev_avg_lead = result[0].prev_avg_lead or 0
+	current_avg_lead = get_average(result.current_days_from_lead, result.current_count)
+	prev_avg_lead = get_average(result.prev_days_from_lead, result.prev_count)
 	delta_lead = current_avg_lead - prev_avg_lead if prev_avg_lead else 0
 
 	return {
@@ -474,43 +472,12 @@ def get_average_time_to_close_a_deal(from_date, to_date, user=""):
 	"""
 	Get average time to close deals for the dashboard.
 	"""
-
-	diff = frappe.utils.date_diff(to_date, from_date)
-	if diff == 0:
-		diff = 1
-
-	conds = ""
-
-	if user:
-		conds += f" AND d.deal_owner = '{user}'"
-
-	prev_from_date = frappe.utils.add_days(from_date, -diff)
-	prev_to_date = from_date
-
-	result = frappe.db.sql(
-		f"""
-		SELECT
-			AVG(CASE WHEN d.closed_date >= %(from_date)s AND d.closed_date < DATE_ADD(%(to_date)s, INTERVAL 1 DAY)
-				THEN TIMESTAMPDIFF(DAY, d.creation, d.closed_date) END) as current_avg_deal,
-			AVG(CASE WHEN d.closed_date >= %(prev_from_date)s AND d.closed_date < %(prev_to_date)s
-				THEN TIMESTAMPDIFF(DAY, d.creation, d.closed_date) END) as prev_avg_deal
-		FROM `tabCRM Deal` AS d
-		JOIN `tabCRM Deal Status` s ON d.status = s.name
-		LEFT JOIN `tabCRM Lead` l ON d.lead = l.name
-		WHERE d.closed_date IS NOT NULL AND s.type = 'Won'
-			{conds}
-		""",
-		{
-			"from_date": from_date,
-			"to_date": to_date,
-			"prev_from_date": prev_from_date,
-			"prev_to_date": prev_to_date,
-		},
-		as_dict=1,
+	result = get_deal_metric_totals(
+		from_date, to_date, user, based_on="Closed", status_conds="s.type = 'Won'"
 	)
 
-	current_avg_deal = result[0].current_avg_deal or 0
-	prev_avg_deal = result[0].prev_avg_deal or 0
+	current_avg_deal = get_average(result.current_days, result.current_count)
+	prev_avg_deal = get_average(result.prev_days, result.prev_count)
 	delta_deal = current_avg_deal - prev_avg_deal if prev_avg_deal else 0
 
 	return {
@@ -534,52 +501,25 @@ def get_sales_trend(from_date="", to_date="", user=""):
 	]
 	"""
 
-	lead_conds = ""
-	deal_conds = ""
-
 	if not from_date or not to_date:
 		from_date = frappe.utils.get_first_day(from_date or frappe.utils.nowdate())
 		to_date = frappe.utils.get_last_day(to_date or frappe.utils.nowdate())
 
-	if user:
-		lead_conds += f" AND lead_owner = '{user}'"
-		deal_conds += f" AND deal_owner = '{user}'"
-
 	result = frappe.db.sql(
 		f"""
 		SELECT
-			DATE_FORMAT(date, '%%Y-%%m-%%d') AS date,
-			SUM(leads) AS leads,
-			SUM(deals) AS deals,
-			SUM(won_deals) AS won_deals
-		FROM (
-			SELECT
-				DATE(creation) AS date,
-				COUNT(*) AS leads,
-				0 AS deals,
-				0 AS won_deals
-			FROM `tabCRM Lead`
-			WHERE DATE(creation) BETWEEN %(from)s AND %(to)s
-			{lead_conds}
-			GROUP BY DATE(creation)
-
-			UNION ALL
-
-			SELECT
-				DATE(d.creation) AS date,
-				0 AS leads,
-				COUNT(*) AS deals,
-				SUM(CASE WHEN s.type = 'Won' THEN 1 ELSE 0 END) AS won_deals
-			FROM `tabCRM Deal` d
-			JOIN `tabCRM Deal Status` s ON d.status = s.name
-			WHERE DATE(d.creation) BETWEEN %(from)s AND %(to)s
-			{deal_conds}
-			GROUP BY DATE(d.creation)
-		) AS daily
-		GROUP BY date
-		ORDER BY date
+			DATE_FORMAT(m.date, '%%Y-%%m-%%d') AS date,
+			SUM(CASE WHEN m.reference_doctype = 'CRM Lead' THEN m.count ELSE 0 END) AS leads,
+			SUM(CASE WHEN s.name IS NOT NULL THEN m.count ELSE 0 END) AS deals,
+			SUM(CASE WHEN s.type = 'Won' THEN m.count ELSE 0 END) AS won_deals
+		FROM `tabCRM Daily Metric` m
+		LEFT JOIN `tabCRM Deal Status` s ON m.reference_doctype = 'CRM Deal' AND m.status = s.name
+		WHERE m.based_on = 'Created' AND {get_date_range_cond("m.date")}
+		{get_metric_conds(user)}
+		GROUP BY m.date
+		ORDER BY m.date
 		""",
-		{"from": from_date, "to": to_date},
+		{"from": from_date, "to": to_date, "user": user},
 		as_dict=True,
 	)
 
@@ -693,7 +633,6 @@ def get_funnel_conversion(from_date="", to_date="", user=""):
 		...
 	]
 	"""
-	lead_conds = ""
 	deal_conds = ""
 
 	if not from_date or not to_date:
@@ -701,7 +640,6 @@ def get_funnel_conversion(from_date="", to_date="", user=""):
 		to_date = frappe.utils.get_last_day(to_date or frappe.utils.nowdate())
 
 	if user:
-		lead_conds += f" AND lead_owner = '{user}'"
 		deal_conds += f" AND deal_owner = '{user}'"
 
 	result = []
@@ -709,12 +647,13 @@ def get_funnel_conversion(from_date="", to_date="", user=""):
 	# Get total leads
 	total_leads = frappe.db.sql(
 		f"""
-			SELECT COUNT(*) AS count
-			FROM `tabCRM Lead`
-			WHERE DATE(creation) BETWEEN %(from)s AND %(to)s
-			{lead_conds}
+			SELECT IFNULL(SUM(m.count), 0) AS count
+			FROM `tabCRM Daily Metric` m
+			WHERE m.reference_doctype = 'CRM Lead' AND m.based_on = 'Created'
+				AND {get_date_range_cond("m.date")}
+			{get_metric_conds(user)}
 		""",
-		{"from": from_date, "to": to_date},
+		{"from": from_date, "to": to_date, "user": user},
 		as_dict=True,
 	)
 	total_leads_count = total_leads[0].count if total_leads else 0
@@ -757,29 +696,25 @@ def get_deals_by_stage_axis(from_date="", to_date="", user=""):
 		...
 	]
 	"""
-	deal_conds = ""
-
 	if not from_date or not to_date:
 		from_date = frappe.utils.get_first_day(from_date or frappe.utils.nowdate())
 		to_date = frappe.utils.get_last_day(to_date or frappe.utils.nowdate())
 
-	if user:
-		deal_conds += f" AND d.deal_owner = '{user}'"
-
 	result = frappe.db.sql(
 		f"""
 		SELECT
-			d.status AS stage,
-			COUNT(*) AS count,
+			m.status AS stage,
+			SUM(m.count) AS count,
 			s.type AS status_type
-		FROM `tabCRM Deal` AS d
-		JOIN `tabCRM Deal Status` s ON d.status = s.name
-		WHERE DATE(d.creation) BETWEEN %(from)s AND %(to)s AND s.type NOT IN ('Lost')
-		{deal_conds}
-		GROUP BY d.status
+		FROM `tabCRM Daily Metric` m
+		JOIN `tabCRM Deal Status` s ON m.status = s.name
+		WHERE m.reference_doctype = 'CRM Deal' AND m.based_on = 'Created'
+			AND {get_date_range_cond("m.date")} AND s.type NOT IN ('Lost')
+		{get_metric_conds(user)}
+		GROUP BY m.status
 		ORDER BY count DESC
 		""",
-		{"from": from_date, "to": to_date},
+		{"from": from_date, "to": to_date, "user": user},
 		as_dict=True,
 	)
 
@@ -807,29 +742,25 @@ def get_deals_by_stage_donut(from_date="", to_date="", user=""):
 		...
 	]
 	"""
-	deal_conds = ""
-
 	if not from_date or not to_date:
 		from_date = frappe.utils.get_first_day(from_date or frappe.utils.nowdate())
 		to_date = frappe.utils.get_last_day(to_date or frappe.utils.nowdate())
 
-	if user:
-		deal_conds += f" AND d.deal_owner = '{user}'"
-
 	result = frappe.db.sql(
 		f"""
 		SELECT
-			d.status AS stage,
-			COUNT(*) AS count,
+			m.status AS stage,
+			SUM(m.count) AS count,
 			s.type AS status_type
-		FROM `tabCRM Deal` AS d
-		JOIN `tabCRM Deal Status` s ON d.status = s.name
-		WHERE DATE(d.creation) BETWEEN %(from)s AND %(to)s
-		{deal_conds}
-		GROUP BY d.status
+		FROM `tabCRM Daily Metric` m
+		JOIN `tabCRM Deal Status` s ON m.status = s.name
+		WHERE m.reference_doctype = 'CRM Deal' AND m.based_on = 'Created'
+			AND {get_date_range_cond("m.date")}
+		{get_metric_conds(user)}
+		GROUP BY m.status
 		ORDER BY count DESC
 		""",
-		{"from": from_date, "to": to_date},
+		{"from": from_date, "to": to_date, "user": user},
 		as_dict=True,
 	)
 
@@ -868,7 +799,7 @@ def get_lost_deal_reasons(from_date="", to_date="", user=""):
 			COUNT(*) AS count
 		FROM `tabCRM Deal` AS d
 		JOIN `tabCRM Deal Status` s ON d.status = s.name
-		WHERE DATE(d.creation) BETWEEN %(from)s AND %(to)s AND s.type = 'Lost'
+		WHERE {get_date_range_cond("d.creation")} AND s.type = 'Lost'
 		{deal_conds}
 		GROUP BY d.lost_reason
 		HAVING reason IS NOT NULL AND reason != ''
@@ -905,27 +836,23 @@ def get_leads_by_source(from_date="", to_date="", user=""):
 		...
 	]
 	"""
-	lead_conds = ""
-
 	if not from_date or not to_date:
 		from_date = frappe.utils.get_first_day(from_date or frappe.utils.nowdate())
 		to_date = frappe.utils.get_last_day(to_date or frappe.utils.nowdate())
 
-	if user:
-		lead_conds += f" AND lead_owner = '{user}'"
-
 	result = frappe.db.sql(
 		f"""
 		SELECT
-			IFNULL(source, 'Empty') AS source,
-			COUNT(*) AS count
-		FROM `tabCRM Lead`
-		WHERE DATE(creation) BETWEEN %(from)s AND %(to)s
-		{lead_conds}
-		GROUP BY source
+			IFNULL(m.source, 'Empty') AS source,
+			SUM(m.count) AS count
+		FROM `tabCRM Daily Metric` m
+		WHERE m.reference_doctype = 'CRM Lead' AND m.based_on = 'Created'
+			AND {get_date_range_cond("m.date")}
+		{get_metric_conds(user)}
+		GROUP BY m.source
 		ORDER BY count DESC
 		""",
-		{"from": from_date, "to": to_date},
+		{"from": from_date, "to": to_date, "user": user},
 		as_dict=True,
 	)
 
@@ -947,27 +874,23 @@ def get_deals_by_source(from_date="", to_date="", user=""):
 		...
 	]
 	"""
-	deal_conds = ""
-
 	if not from_date or not to_date:
 		from_date = frappe.utils.get_first_day(from_date or frappe.utils.nowdate())
 		to_date = frappe.utils.get_last_day(to_date or frappe.utils.nowdate())
 
-	if user:
-		deal_conds += f" AND deal_owner = '{user}'"
-
 	result = frappe.db.sql(
 		f"""
 		SELECT
-			IFNULL(source, 'Empty') AS source,
-			COUNT(*) AS count
-		FROM `tabCRM Deal`
-		WHERE DATE(creation) BETWEEN %(from)s AND %(to)s
-		{deal_conds}
-		GROUP BY source
+			IFNULL(m.source, 'Empty') AS source,
+			SUM(m.count) AS count
+		FROM `tabCRM Daily Metric` m
+		WHERE m.reference_doctype = 'CRM Deal' AND m.based_on = 'Created'
+			AND {get_date_range_cond("m.date")}
+		{get_metric_conds(user)}
+		GROUP BY m.source
 		ORDER BY count DESC
 		""",
-		{"from": from_date, "to": to_date},
+		{"from": from_date, "to": to_date, "user": user},
 		as_dict=True,
 	)
 
@@ -989,28 +912,24 @@ def get_deals_by_territory(from_date="", to_date="", user=""):
 		...
 	]
 	"""
-	deal_conds = ""
-
 	if not from_date or not to_date:
 		from_date = frappe.utils.get_first_day(from_date or frappe.utils.nowdate())
 		to_date = frappe.utils.get_last_day(to_date or frappe.utils.nowdate())
 
-	if user:
-		deal_conds += f" AND d.deal_owner = '{user}'"
-
 	result = frappe.db.sql(
 		f"""
 		SELECT
-			IFNULL(d.territory, 'Empty') AS territory,
-			COUNT(*) AS deals,
-			SUM(COALESCE(d.deal_value, 0) * IFNULL(d.exchange_rate, 1)) AS value
-		FROM `tabCRM Deal` AS d
-		WHERE DATE(d.creation) BETWEEN %(from)s AND %(to)s
-		{deal_conds}
-		GROUP BY d.territory
+			IFNULL(m.territory, 'Empty') AS territory,
+			SUM(m.count) AS deals,
+			SUM(m.total_value) AS value
+		FROM `tabCRM Daily Metric` m
+		WHERE m.reference_doctype = 'CRM Deal' AND m.based_on = 'Created'
+			AND {get_date_range_cond("m.date")}
+		{get_metric_conds(user)}
+		GROUP BY m.territory
 		ORDER BY deals DESC, value DESC
 		""",
-		{"from": from_date, "to": to_date},
+		{"from": from_date, "to": to_date, "user": user},
 		as_dict=True,
 	)
 
@@ -1045,29 +964,25 @@ def get_deals_by_salesperson(from_date="", to_date="", user=""):
 		...
 	]
 	"""
-	deal_conds = ""
-
 	if not from_date or not to_date:
 		from_date = frappe.utils.get_first_day(from_date or frappe.utils.nowdate())
 		to_date = frappe.utils.get_last_day(to_date or frappe.utils.nowdate())
 
-	if user:
-		deal_conds += f" AND d.deal_owner = '{user}'"
-
 	result = frappe.db.sql(
 		f"""
 		SELECT
-			IFNULL(u.full_name, d.deal_owner) AS salesperson,
-			COUNT(*)                           AS deals,
-			SUM(COALESCE(d.deal_value, 0) * IFNULL(d.exchange_rate, 1)) AS value
-		FROM `tabCRM Deal` AS d
-		LEFT JOIN `tabUser` AS u ON u.name = d.deal_owner
-		WHERE DATE(d.creation) BETWEEN %(from)s AND %(to)s
-		{deal_conds}
-		GROUP BY d.deal_owner
+			IFNULL(u.full_name, m.record_owner) AS salesperson,
+			SUM(m.count)                        AS deals,
+			SUM(m.total_value)                  AS value
+		FROM `tabCRM Daily Metric` m
+		LEFT JOIN `tabUser` AS u ON u.name = m.record_owner
+		WHERE m.reference_doctype = 'CRM Deal' AND m.based_on = 'Created'
+			AND {get_date_range_cond("m.date")}
+		{get_metric_conds(user)}
+		GROUP BY m.record_owner
 		ORDER BY deals DESC, value DESC
 		""",
-		{"from": from_date, "to": to_date},
+		{"from": from_date, "to": to_date, "user": user},
 		as_dict=True,
 	)
 
@@ -1101,6 +1016,69 @@ def get_base_currency_symbol():
 	return frappe.db.get_value("Currency", base_currency, "symbol") or ""
 
 
+def get_date_range_cond(column, from_key="from", to_key="to"):
+	"""
+	Get a condition matching `column` from the date in `from_key` through the date in `to_key`.
+	The range is half-open on the bare column, unlike `DATE(column) BETWEEN ...`,
+	so that an index on `column` can be used.
+	"""
+	return f"{column} >= %({from_key})s AND {column} < DATE_ADD(%({to_key})s, INTERVAL 1 DAY)"
+
+
+def get_metric_conds(user):
+	"""
+	Get the condition limiting daily metrics to records owned by `user`, if any.
+	"""
+	return " AND m.record_owner = %(user)s" if user else ""
+
+
+def get_deal_metric_totals(from_date, to_date, user, based_on, status_conds):
+	"""
+	Get deal count, value and days to close from the daily metrics, for the given period
+	and for the period of the same length before it. Value averages divide by `value_count`,
+	the deals that have a value.
+	"""
+	diff = frappe.utils.date_diff(to_date, from_date)
+	if diff == 0:
+		diff = 1
+
+	totals = []
+	for period, cond in (("current", "m.date >= %(from_date)s"), ("prev", "m.date < %(from_date)s")):
+		totals += [
+			f"SUM(CASE WHEN {cond} THEN m.count ELSE 0 END) as {period}_count",
+			f"SUM(CASE WHEN {cond} THEN m.total_value ELSE 0 END) as {period}_value",
+			f"SUM(CASE WHEN {cond} THEN m.value_count ELSE 0 END) as {period}_value_count",
+			f"SUM(CASE WHEN {cond} THEN m.total_days_to_close ELSE 0 END) as {period}_days",
+			f"SUM(CASE WHEN {cond} THEN m.total_days_to_close_from_lead ELSE 0 END) as {period}_days_from_lead",
+		]
+
+	result = frappe.db.sql(
+		f"""
+		SELECT
+			{", ".join(totals)}
+		FROM `tabCRM Daily Metric` m
+		JOIN `tabCRM Deal Status` s ON m.status = s.name
+		WHERE m.reference_doctype = 'CRM Deal' AND m.based_on = %(based_on)s
+			AND {get_date_range_cond("m.date", "prev_from_date", "to_date")}
+			AND {status_conds}
+			{get_metric_conds(user)}
+		""",
+		{
+			"from_date": from_date,
+			"to_date": to_date,
+			"prev_from_date": frappe.utils.add_days(from_date, -diff),
+			"based_on": based_on,
+			"user": user,
+		},
+		as_dict=1,
+	)
+	return result[0]
+
+
+def get_average(total, count):
+	return total / count if count else 0
+
+
 def get_deal_status_change_counts(from_date, to_date, deal_conds=""):
 	"""
 	Get count of each status change (to) for each deal, excluding deals with current status type 'Lost'.
@@ -1129,7 +1107,7 @@ def get_deal_status_change_counts(from_date, to_date, deal_conds=""):
 			scl.to IS NOT NULL
 			AND scl.to != ''
 			AND s.type != 'Lost'
-			AND DATE(d.creation) BETWEEN %(from)s AND %(to)s
+			AND {get_date_range_cond("d.creation")}
 			{deal_conds}
 		GROUP BY
 			scl.to, st.position
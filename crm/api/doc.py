@@ -1,18 +1,28 @@
+import base64
+import hashlib
 import json
+import re
+import time
 
 import frappe
 from frappe import _
 from frappe.custom.doctype.property_setter.property_setter import make_property_setter
 from frappe.desk.form.assign_to import set_status
-from frappe.model import no_value_fields
+from frappe.model import default_fields, no_value_fields
 from frappe.model.document import get_controller
-from frappe.utils import make_filter_tuple
+from frappe.utils import cint, make_filter_tuple
 from pypika import Criterion
 
 from crm.api.views import get_views
 from crm.fcrm.doctype.crm_form_script.crm_form_script import get_form_script
 from crm.utils import get_dynamic_linked_docs, get_linked_docs
 
+LIST_COUNT_CACHE_DOCTYPES = ("CRM Lead", "CRM Deal", "Contact", "CRM Organization", "CRM Task")
+# cached counts are dropped on every change of the doctype, the TTL only guards
+# against writes that bypass document events
+LIST_COUNT_CACHE_TTL = 10 * 60
+ESTIMATED_COUNT_THRESHOLD = 100_000
+
 
 @frappe.whitelist()
 def sort_options(doctype: str):
@@ -288,8 +298,11 @@ def get_data(
 	kanban_fields=[],
 	view=None,
 	default_filters=None,
+	cursor=None,
+	count_mode="exact",
 ):
 	custom_view = False
+	next_cursor = None
 	filters = frappe._dict(filters)
 	rows = frappe.parse_json(rows or "[]")
 	columns = frappe.parse_json(columns or "[]")
@@ -299,22 +312,10 @@ def get_data(
 	custom_view_name = view.get("custom_view_name") if view else None
 	view_type = view.get("view_type") if view else None
 	group_by_field = view.get("group_by_field") if view else None
+	if group_by_field and view_type == "group_by":
+		validate_group_by_field(doctype, group_by_field)
 
-	for key in filters:
-		value = filters[key]
-		if isinstance(value, list):
-			if "@me" in value:
-				value[value.index("@me")] = frappe.session.user
-			elif "%@me%" in value:
-				index = [i for i, v in enumerate(value) if v == "%@me%"]
-				for i in index:
-					value[i] = "%" + frappe.session.user + "%"
-		elif value == "@me":
-			filters[key] = frappe.session.user
-
-	if default_filters:
-		default_filters = frappe.parse_json(default_filters)
-		filters.update(default_filters)
+	set_list_filters(filters, default_filters)
 
 	is_default = True
 	data = []
@@ -375,16 +376,20 @@ def get_data(
 		if group_by_field and group_by_field not in rows:
 			rows.append(group_by_field)
 
-		data = (
-			frappe.get_list(
-				doctype,
-				fields=rows,
-				filters=filters,
-				order_by=order_by,
-				page_length=page_length,
+		seek_order = get_seek_order(doctype, order_by)
+		if seek_order:
+			data, next_cursor = get_list_page(doctype, rows, filters, seek_order, cint(page_length), cursor)
+		else:
+			data = (
+				frappe.get_list(
+					doctype,
+					fields=rows,
+					filters=filters,
+					order_by=order_by,
+					page_length=page_length,
+				)
+				or []
 			)
-			or []
-		)
 		data = parse_list_data(data, doctype)
 
 	if view_type == "kanban":
@@ -419,54 +424,7 @@ def get_data(
 			if field not in rows:
 				rows.append(field)
 
-		for kc in kanban_columns:
-			# Start with base filters
-			column_filters = []
-
-			# Convert and add the main filters first
-			if filters:
-				base_filters = convert_filter_to_tuple(doctype, filters)
-				column_filters.extend(base_filters)
-
-			# Add the column-specific filter
-			if column_field and kc.get("name"):
-				column_filters.append([doctype, column_field, "=", kc.get("name")])
-
-			order = kc.get("order")
-			if kc.get("delete"):
-				column_data = []
-			else:
-				page_length = kc.get("page_length", 20)
-
-				if order:
-					column_data = get_records_based_on_order(
-						doctype, rows, column_filters, page_length, order
-					)
-				else:
-					column_data = frappe.get_list(
-						doctype,
-						fields=rows,
-						filters=column_filters,
-						order_by=order_by,
-						page_length=page_length,
-					)
-
-				all_count = frappe.get_list(
-					doctype,
-					filters=column_filters,
-					fields="count(*) as total_count",
-				)[0].total_count
-
-				kc["all_count"] = all_count
-				kc["count"] = len(column_data)
-
-			if order:
-				column_data = sorted(
-					column_data,
-					key=lambda x: order.index(x.get("name")) if x.get("name") in order else len(order),
-				)
-
-			data.append({"column": kc, "fields": kanban_fields, "data": column_data})
+		data = get_kanban_data(doctype, rows, filters, order_by, column_field, kanban_columns, kanban_fields)
 
 	fields = frappe.get_meta(doctype).fields
 	fields = [field for field in fields if field.fieldtype not in no_value_fields]
@@ -507,28 +465,21 @@ def get_data(
 		is_default = frappe.db.get_value("CRM View Settings", custom_view_name, "load_default_columns")
 
 	if group_by_field and view_type == "group_by":
+		group_counts = get_group_counts(doctype, group_by_field, filters)
 
 		def get_options(type, options):
 			if type == "Select":
 				return [option for option in options.split("\n")]
 			else:
-				has_empty_values = any([not d.get(group_by_field) for d in data])
-				options = list(set([d.get(group_by_field) for d in data]))
-				options = [u for u in options if u]
-				if has_empty_values:
-					options.append("")
+				options = [value for value in group_counts if value]
 
-				if order_by and group_by_field in order_by:
-					order_by_fields = order_by.split(",")
-					order_by_fields = [
-						(field.split(" ")[0], field.split(" ")[1]) for field in order_by_fields
-					]
-					if (group_by_field, "asc") in order_by_fields:
-						options.sort()
-					elif (group_by_field, "desc") in order_by_fields:
-						options.sort(reverse=True)
+				if (group_by_field, "desc") in parse_order_by(order_by):
+					options.sort(reverse=True)
 				else:
 					options.sort()
+
+				if "" in group_counts:
+					options.append("")
 				return options
 
 		for field in fields:
@@ -538,8 +489,11 @@ def get_data(
 					"fieldname": field.get("fieldname"),
 					"fieldtype": field.get("fieldtype"),
 					"options": get_options(field.get("fieldtype"), field.get("options")),
+					"counts": group_counts,
 				}
 
+	total_count, total_count_estimated = get_total_count(doctype, filters, count_mode)
+
 	return {
 		"data": data,
 		"columns": columns,
@@ -554,10 +508,10 @@ def get_data(
 		"page_length_count": page_length_count,
 		"is_default": is_default,
 		"views": get_views(doctype),
-		"total_count": frappe.get_list(doctype, filters=filters, fields="count(*) as total_count")[
-			0
-		].total_count,
+		"total_count": total_count,
+		"total_count_estimated": total_count_estimated,
 		"row_count": len(data),
+		"cursor": next_cursor,
 		"form_script": get_form_script(doctype),
 		"list_script": get_form_script(doctype, "List"),
 		"view_type": view_type,
@@ -609,6 +563,439 @@ def get_records_based_on_order(doctype, rows, filters, page_length, order):
 	return records
 
 
+def get_total_count(doctype, filters, count_mode="exact"):
+	"""
+	Get number of records matching `filters` that the user can see.
+
+	Counts of doctypes in `LIST_COUNT_CACHE_DOCTYPES` are cached until a record of
+	the doctype is inserted, updated or deleted. The cache key is the count query
+	itself, which covers the filters as well as the user's permission conditions.
+	With `count_mode` "estimated", large counts of unfiltered lists come from the
+	table statistics instead of counting rows. Filtered counts are always exact, the
+	optimizer's row estimates are for rows scanned rather than matched.
+
+	:return: Count and whether it is an estimate
+	"""
+	query = frappe.get_list(doctype, filters=filters, fields="count(*) as total_count", order_by=None, run=0)
+
+	# the query has a condition when filtered or restricted by permissions
+	is_filtered = re.search(r"\bwhere\b", query, re.IGNORECASE)
+	if count_mode == "estimated" and frappe.db.db_type == "mariadb" and not is_filtered:
+		estimate = get_estimated_count(doctype)
+		if estimate >= ESTIMATED_COUNT_THRESHOLD:
+			return estimate, True
+
+	if doctype not in LIST_COUNT_CACHE_DOCTYPES:
+		return get_count(query), False
+
+	key = hashlib.sha1(query.encode()).hexdigest()
+	cached = frappe.cache.hget(get_list_count_cache_key(doctype), key)
+	if cached and cached["expires_at"] > time.time():
+		return cached["count"], False
+
+	count = get_count(query)
+	frappe.cache.hset(
+		get_list_count_cache_key(doctype),
+		key,
+		{"count": count, "expires_at": time.time() + LIST_COUNT_CACHE_TTL},
+	)
+	# counts expire one by one, the hash goes once no count is cached for a while
+	frappe.cache.expire(frappe.cache.make_key(get_list_count_cache_key(doctype)), LIST_COUNT_CACHE_TTL)
+	return count, False
+
+
+def get_count(query):
+	# values are already interpolated in the query, it is run without any to format
+	return frappe.db.sql(query, as_dict=True)[0].total_count
+
+
+def get_estimated_count(doctype):
+	"""
+	Get the number of rows in the table of `doctype` as per the table statistics,
+	which are cheap to read but can be off by a few percent
+	"""
+	res = frappe.db.sql(
+		"""
+		SELECT TABLE_ROWS
+		FROM information_schema.TABLES
+		WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+		""",
+		f"tab{doctype}",
+	)
+	return cint(res[0][0]) if res else 0
+
+
+def get_list_count_cache_key(doctype):
+	return f"crm:list_count:{doctype}"
+
+
+def clear_list_count_cache(doc, method=None):
+	clear_list_count_cache_for(doc.doctype)
+
+
+def clear_list_count_cache_for(doctype):
+	"""
+	Clear cached counts of `doctype` after changes that bypass document events
+	"""
+	frappe.cache.delete_value(get_list_count_cache_key(doctype))
+
+
+def get_list_page(doctype, rows, filters, order, page_length, cursor=None):
+	"""
+	Get a page of records sorted by `order`, along with a cursor to the next page.
+	With a `cursor` the page starts right after the record it points to (keyset
+	pagination), so loading more doesn't fetch the earlier pages again.
+
+	:param order: List of `(fieldname, direction)` ending with `name`, from `get_seek_order`
+	:param cursor: Cursor returned with the previous page
+	:return: Records and the cursor to the next page, `None` if this is the last page
+	"""
+	fields = list(dict.fromkeys([*rows, *(field for field, _direction in order)]))
+	order_by = ", ".join(f"`tab{doctype}`.`{field}` {direction}" for field, direction in order)
+
+	if cursor:
+		values = decode_cursor(cursor, order)
+		condition, params = get_seek_condition(order, values)
+		query = get_list_query(doctype, fields, filters)
+		outer_order_by = ", ".join(f"`{field}` {direction}" for field, direction in order)
+		params["page_length"] = page_length
+		records = frappe.db.sql(
+			f"""
+			select * from ({query}) `records`
+			where {condition}
+			order by {outer_order_by}
+			limit %(page_length)s
+			""",
+			params,
+			as_dict=True,
+		)
+	else:
+		records = frappe.get_list(
+			doctype,
+			fields=fields,
+			filters=filters,
+			order_by=order_by,
+			page_length=page_length,
+		)
+
+	next_cursor = None
+	if page_length and len(records) >= page_length:
+		next_cursor = encode_cursor([records[-1].get(field) for field, _direction in order])
+
+	extra_fields = [field for field in fields if field not in rows]
+	for record in records:
+		for field in extra_fields:
+			record.pop(field, None)
+	return records, next_cursor
+
+
+def get_seek_order(doctype, order_by):
+	"""
+	Get sort order usable for keyset pagination, i.e. only on columns of `doctype`,
+	with `name` added as the tie breaker
+
+	:return: List of `(fieldname, direction)`, empty if `order_by` can't be used
+	"""
+	order = parse_order_by(order_by)
+	if not order:
+		return []
+
+	meta = frappe.get_meta(doctype)
+	for fieldname, _direction in order:
+		if fieldname not in default_fields and not meta.has_field(fieldname):
+			return []
+
+	if order[-1][0] != "name":
+		order = [(field, direction) for field, direction in order if field != "name"]
+		order.append(("name", order[-1][1] if order else "desc"))
+	return order
+
+
+def get_seek_condition(order, values):
+	"""
+	Build the condition selecting records that come after `values` in `order`,
+	i.e. (a > x) or (a = x and b > y) or ..., with NULLs first in ascending order
+	and last in descending order as MariaDB sorts them
+
+	:return: Condition and its query parameters
+	"""
+	params = {}
+	conditions = []
+	equal_to = []
+	for i, ((field, direction), value) in enumerate(zip(order, values, strict=True)):
+		column = f"`{field}`"
+		key = f"cursor_{i}"
+		params[key] = value
+
+		if value is None:
+			after = f"{column} is not null" if direction == "asc" else None
+			equal = f"{column} is null"
+		else:
+			if direction == "asc":
+				after = f"{column} > %({key})s"
+			else:
+				after = f"({column} < %({key})s or {column} is null)"
+			equal = f"{column} = %({key})s"
+
+		if after:
+			conditions.append(" and ".join([*equal_to, after]))
+		equal_to.append(equal)
+
+	if not conditions:
+		return "1 = 0", params
+	return " or ".join(f"({condition})" for condition in conditions), params
+
+
+def encode_cursor(values):
+	return base64.urlsafe_b64encode(json.dumps(values, default=str).encode()).decode()
+
+
+def decode_cursor(cursor, order):
+	try:
+		values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+	except ValueError:
+		values = None
+
+	if not isinstance(values, list) or len(values) != len(order):
+		frappe.throw(_("Invalid cursor"), frappe.ValidationError)
+	return values
+
+
+def get_list_query(doctype, fields, filters):
+	"""
+	Get the query frappe.get_list runs for `fields` and `filters` (with permission
+	conditions applied) without ordering or limit, for use as a subquery
+	"""
+	query = frappe.get_list(doctype, fields=fields, filters=filters, order_by=None, page_length=0, run=0)
+	# values are already interpolated in the query so literal % signs need escaping
+	return query.replace("%", "%%")
+
+
+def get_kanban_data(doctype, rows, filters, order_by, column_field, kanban_columns, kanban_fields):
+	"""
+	Get rows and counts of every kanban column with a fixed number of queries,
+	one GROUP BY for the counts and one windowed query for the rows of all columns
+	"""
+	base_filters = convert_filter_to_tuple(doctype, filters) if filters else []
+	columns = [kc for kc in kanban_columns if not kc.get("delete")]
+
+	counts = {}
+	column_rows = {}
+	if column_field and any(not kc.get("order") for kc in columns):
+		counts = get_group_counts(doctype, column_field, base_filters)
+		page_length = max(cint(kc.get("page_length", 20)) for kc in columns if not kc.get("order"))
+		column_rows = get_kanban_column_rows(doctype, rows, base_filters, order_by, column_field, page_length)
+
+	data = []
+	for kc in kanban_columns:
+		column_filters = base_filters.copy()
+		if column_field and kc.get("name"):
+			column_filters.append([doctype, column_field, "=", kc.get("name")])
+
+		order = kc.get("order")
+		if kc.get("delete"):
+			column_data = []
+		else:
+			page_length = cint(kc.get("page_length", 20))
+
+			if order:
+				column_data = get_records_based_on_order(doctype, rows, column_filters, page_length, order)
+				all_count = frappe.get_list(
+					doctype,
+					filters=column_filters,
+					fields="count(*) as total_count",
+				)[0].total_count
+			elif column_field:
+				value = kc.get("name") or ""
+				column_data = column_rows.get(value, [])[:page_length]
+				all_count = counts.get(value, 0)
+			else:
+				column_data = frappe.get_list(
+					doctype,
+					fields=rows,
+					filters=column_filters,
+					order_by=order_by,
+					page_length=page_length,
+				)
+				all_count = frappe.get_list(
+					doctype,
+					filters=column_filters,
+					fields="count(*) as total_count",
+				)[0].total_count
+
+			kc["all_count"] = all_count
+			kc["count"] = len(column_data)
+
+		if order:
+			column_data = sorted(
+				column_data,
+				key=lambda x: order.index(x.get("name")) if x.get("name") in order else len(order),
+			)
+
+		data.append({"column": kc, "fields": kanban_fields, "data": column_data})
+
+	# counts shown on the cards, fetched for the whole board at once
+	set_activity_counts(doctype, [record for column in data for record in column["data"]])
+	return data
+
+
+def set_list_filters(filters, default_filters=None):
+	"""
+	Replace "@me" in `filters` with the current user and add the `default_filters` of the page
+	"""
+	for key in filters:
+		value = filters[key]
+		if isinstance(value, list):
+			if "@me" in value:
+				value[value.index("@me")] = frappe.session.user
+			elif "%@me%" in value:
+				index = [i for i, v in enumerate(value) if v == "%@me%"]
+				for i in index:
+					value[i] = "%" + frappe.session.user + "%"
+		elif value == "@me":
+			filters[key] = frappe.session.user
+
+	if default_filters:
+		default_filters = frappe.parse_json(default_filters)
+		filters.update(default_filters)
+
+
+def get_group_counts(doctype, group_by_field, filters):
+	"""
+	Get number of permitted records per value of `group_by_field` with one GROUP BY query,
+	empty values are counted together under ""
+	"""
+	validate_group_by_field(doctype, group_by_field)
+
+	res = {}
+	for row in frappe.get_list(
+		doctype,
+		fields=[f"{group_by_field} as group_value", "count(*) as total_count"],
+		filters=filters,
+		group_by=group_by_field,
+		order_by=None,
+	):
+		value = row.group_value or ""
+		res[value] = res.get(value, 0) + row.total_count
+	return res
+
+
+def validate_group_by_field(doctype, group_by_field):
+	"""
+	Throw unless records of `doctype` can be grouped by `group_by_field`, which comes from the client
+	"""
+	if group_by_field not in {field["fieldname"] for field in get_group_by_fields(doctype)}:
+		frappe.throw(_("Cannot group {0} by {1}").format(_(doctype), group_by_field))
+
+
+@frappe.whitelist()
+def get_group_by_rows(
+	doctype: str,
+	filters: dict,
+	order_by: str,
+	group_by_field: str,
+	group_value: str | None = None,
+	rows=None,
+	page_length=20,
+	cursor=None,
+	default_filters=None,
+):
+	"""
+	Get a page of records of one group in group by view, so that groups can be
+	expanded lazily instead of loading every record of every group
+
+	:param group_value: Value of `group_by_field` for the group, empty for records without one
+	:param cursor: Cursor returned with the previous page of the group
+	:param default_filters: Filters of the page, as passed to `get_data`
+	:return: Records of the group and the cursor to its next page
+	"""
+	validate_group_by_field(doctype, group_by_field)
+
+	rows = frappe.parse_json(rows or "[]") or ["name"]
+	if group_by_field not in rows:
+		rows.append(group_by_field)
+
+	filters = frappe._dict(frappe.parse_json(filters or "{}"))
+	set_list_filters(filters, default_filters)
+	group_filters = convert_filter_to_tuple(doctype, filters)
+	if group_value:
+		group_filters.append([doctype, group_by_field, "=", group_value])
+	else:
+		group_filters.append([doctype, group_by_field, "is", "not set"])
+
+	page_length = cint(page_length)
+	order = get_seek_order(doctype, order_by)
+	if order:
+		data, next_cursor = get_list_page(doctype, rows, group_filters, order, page_length, cursor)
+	else:
+		data = frappe.get_list(
+			doctype,
+			fields=rows,
+			filters=group_filters,
+			order_by=order_by,
+			page_length=page_length,
+		)
+		next_cursor = None
+
+	return {"data": parse_list_data(data, doctype), "cursor": next_cursor}
+
+
+def get_kanban_column_rows(doctype, rows, filters, order_by, column_field, page_length):
+	"""
+	Get first `page_length` records per value of `column_field` in one query, by ranking
+	the permitted records of each column with ROW_NUMBER() OVER (PARTITION BY column_field)
+	"""
+	if not re.fullmatch(r"[a-zA-Z0-9_]+", column_field):
+		frappe.throw(_("Invalid column field {0}").format(column_field))
+
+	order = parse_order_by(order_by) or [("modified", "desc")]
+	fields = list(dict.fromkeys([*rows, column_field, *(field for field, _direction in order)]))
+
+	query = get_list_query(doctype, fields, filters)
+	window_order = ", ".join(f"`{field}` {direction}" for field, direction in order)
+	records = frappe.db.sql(
+		f"""
+		select * from (
+			select `records`.*,
+				row_number() over (partition by `records`.`{column_field}` order by {window_order}) as `_kanban_rank`
+			from ({query}) `records`
+		) `ranked`
+		where `_kanban_rank` <= %(page_length)s
+		order by `_kanban_rank`
+		""",
+		{"page_length": page_length},
+		as_dict=True,
+	)
+
+	res = {}
+	extra_fields = [field for field in fields if field not in rows]
+	for record in records:
+		value = record.get(column_field) or ""
+		record.pop("_kanban_rank", None)
+		for field in extra_fields:
+			record.pop(field, None)
+		res.setdefault(value, []).append(record)
+	return res
+
+
+def parse_order_by(order_by):
+	"""
+	Parse `order_by` like "modified desc, creation asc" into a list of `(fieldname, direction)`,
+	returns an empty list if any part isn't a plain field of the doctype
+	"""
+	res = []
+	for part in (order_by or "").split(","):
+		part = part.strip().split()
+		if not part or len(part) > 2:
+			return []
+		fieldname = part[0].split(".")[-1].strip("`")
+		direction = part[1].lower() if len(part) == 2 else "asc"
+		if not re.fullmatch(r"[a-zA-Z0-9_]+", fieldname) or direction not in ("asc", "desc"):
+			return []
+		res.append((fieldname, direction))
+	return res
+
+
 @frappe.whitelist()
 def get_fields_meta(doctype, restricted_fieldtypes=None, as_array=False, only_required=False):
 	not_allowed_fieldtypes = [
@@ -717,36 +1104,69 @@ def get_fields(doctype: str, allow_all_fieldtypes: bool = False):
 
 
 def getCounts(d, doctype):
-	d["_email_count"] = (
-		frappe.db.count(
+	d.update(count_activities(doctype, [d.get("name")])[d.get("name")])
+	return d
+
+
+@frappe.whitelist()
+def get_activity_counts(doctype: str, names: list[str]) -> dict:
+	"""
+	Get email, comment, task and note counts of the permitted records among `names`
+
+	:param names: Names of the records
+	:return: `_email_count`, `_comment_count`, `_task_count` and `_note_count` per name
+	"""
+	names = frappe.parse_json(names) if isinstance(names, str) else names
+	names = [name for name in dict.fromkeys(names or []) if name]
+	if not names:
+		return {}
+
+	names = frappe.get_list(doctype, filters={"name": ["in", names]}, pluck="name", page_length=0)
+	return count_activities(doctype, names)
+
+
+def count_activities(doctype, names):
+	"""
+	Count activities of `names` with one grouped query per source table
+	"""
+	res = {
+		name: {"_email_count": 0, "_comment_count": 0, "_task_count": 0, "_note_count": 0} for name in names
+	}
+	if not names:
+		return res
+
+	sources = [
+		(
+			"_email_count",
 			"Communication",
-			filters={
-				"reference_doctype": doctype,
-				"reference_name": d.get("name"),
-				"communication_type": "Communication",
-			},
+			"reference_name",
+			{"communication_type": ["in", ["Communication", "Automated Message"]]},
+		),
+		("_comment_count", "Comment", "reference_name", {"comment_type": "Comment"}),
+		("_task_count", "CRM Task", "reference_docname", {}),
+		("_note_count", "FCRM Note", "reference_docname", {}),
+	]
+	for key, source, reference_field, filters in sources:
+		rows = frappe.get_all(
+			source,
+			filters={"reference_doctype": doctype, reference_field: ["in", names], **filters},
+			fields=[f"{reference_field} as reference_name", "count(*) as count"],
+			group_by=reference_field,
+			order_by=None,
 		)
-		or 0
-	)
-	d["_email_count"] = d["_email_count"] + frappe.db.count(
-		"Communication",
-		filters={
-			"reference_doctype": doctype,
-			"reference_name": d.get("name"),
-			"communication_type": "Automated Message",
-		},
-	)
-	d["_comment_count"] = frappe.db.count(
-		"Comment",
-		filters={"reference_doctype": doctype, "reference_name": d.get("name"), "comment_type": "Comment"},
-	)
-	d["_task_count"] = frappe.db.count(
-		"CRM Task", filters={"reference_doctype": doctype, "reference_docname": d.get("name")}
-	)
-	d["_note_count"] = frappe.db.count(
-		"FCRM Note", filters={"reference_doctype": doctype, "reference_docname": d.get("name")}
-	)
-	return d
+		for row in rows:
+			res[row.reference_name][key] = row.count
+	return res
+
+
+def set_activity_counts(doctype, records):
+	"""
+	Add activity counts to already permitted `records` in place
+	"""
+	counts = count_activities(doctype, list(dict.fromkeys(record.get("name") for record in records)))
+	for record in records:
+		record.update(counts.get(record.get("name"), {}))
+	return records
 
 
 @frappe.whitelist()
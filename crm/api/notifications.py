@@ -13,6 +13,19 @@ def get_notifications():
     )
     notifications = query.run(as_dict=True)
 
+    # one query for the names of all senders instead of one per notification
+    full_names = {}
+    from_users = list({n.from_user for n in notifications if n.from_user})
+    if from_users:
+        full_names = dict(
+            frappe.get_all(
+                "User",
+                filters={"name": ["in", from_users]},
+                fields=["name", "full_name"],
+                as_list=True,
+            )
+        )
+
     _notifications = []
     for notification in notifications:
         _notifications.append(
@@ -20,9 +33,7 @@ def get_notifications():
                 "creation": notification.creation,
                 "from_user": {
                     "name": notification.from_user,
-                    "full_name": frappe.get_value(
-                        "User", notification.from_user, "full_name"
-                    ),
+                    "full_name": full_names.get(notification.from_user),
                 },
                 "type": notification.type,
                 "to_user": notification.to_user,
@@ -5,6 +5,7 @@ from frappe import _
 
 from crm.api.doc import get_assigned_users
 from crm.fcrm.doctype.crm_notification.crm_notification import notify_user
+from crm.utils import normalize_phone_number
 
 
 def validate(doc, method):
@@ -57,27 +58,25 @@ def notify_agent(doc):
 
 def get_lead_or_deal_from_number(number):
 	"""Get lead/deal from the given number."""
-
-	def find_record(doctype, mobile_no, where=""):
-		mobile_no = parse_mobile_no(mobile_no)
-
-		query = f"""
-            SELECT name, mobile_no
-            FROM `tab{doctype}`
-            WHERE CONCAT('+', REGEXP_REPLACE(mobile_no, '[^0-9]', '')) = {mobile_no}
-        """
-
-		data = frappe.db.sql(query + where, as_dict=True)
-		return data[0].name if data else None
+	# WhatsApp sends numbers in international format without the leading "+"
+	mobile_no = parse_mobile_no(number)
+	if mobile_no and not mobile_no.startswith("+"):
+		mobile_no = f"+{mobile_no}"
+	mobile_no = normalize_phone_number(mobile_no)
+	if not mobile_no:
+		return None, "CRM Lead"
+
+	def find_record(doctype, filters=None):
+		return frappe.db.get_value(
+			doctype, {"mobile_no_normalized": mobile_no, **(filters or {})}, "name", order_by="modified desc"
+		)
 
 	doctype = "CRM Deal"
 
-	doc = find_record(doctype, number) or None
+	doc = find_record(doctype)
 	if not doc:
 		doctype = "CRM Lead"
-		doc = find_record(doctype, number, "AND converted is not True")
-		if not doc:
-			doc = find_record(doctype, number)
+		doc = find_record(doctype, {"converted": 0}) or find_record(doctype)
 
 	return doc, doctype
 
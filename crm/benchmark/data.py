@@ -0,0 +1,436 @@
+import json
+import random
+
+import frappe
+from frappe.utils import add_days, add_to_date, now_datetime
+
+from crm.api.doc import clear_list_count_cache_for
+from crm.fcrm.doctype.crm_activity.crm_activity import backfill_activities
+from crm.fcrm.doctype.crm_daily_metric.crm_daily_metric import rebuild_daily_metrics
+from crm.integrations.api import evict_caller_id_cache
+from crm.utils import get_national_phone_number, normalize_phone_number
+
+# generated records are named `BENCH-<kind>-<run>-<n>`, tasks are autonamed and titled `BENCH ...`
+PREFIX = "BENCH"
+# number of records generated at scale 1
+VOLUMES = {
+	"organizations": 100,
+	"contacts": 500,
+	"leads": 2000,
+	"deals": 500,
+	"calls": 1000,
+	"notes": 1000,
+	"tasks": 1000,
+	"communications": 2000,
+	"versions": 2000,
+}
+# records are spread over this many days before now
+HISTORY_DAYS = 365
+GENERATED_DOCTYPES = (
+	"CRM Organization",
+	"Contact",
+	"Contact Email",
+	"Contact Phone",
+	"CRM Lead",
+	"CRM Deal",
+	"CRM Contacts",
+	"CRM Status Change Log",
+	"CRM Call Log",
+	"FCRM Note",
+	"CRM Task",
+	"Communication",
+	"Version",
+)
+
+
+def generate_data(scale: float = 1, seed: int | None = None) -> dict[str, int]:
+	"""
+	Insert synthetic leads, deals, contacts, organizations and their activities in bulk,
+	bypassing document events, then rebuild what those events would have maintained
+
+	:param scale: Multiplier for the number of records in `VOLUMES`
+	:param seed: Seed for reproducible data
+	:return: Number of rows inserted per doctype
+	"""
+	generator = DataGenerator(scale, seed)
+	generator.generate()
+
+	rebuild_daily_metrics(commit=True)
+	backfill_activities(commit=True)
+	evict_caller_id_cache()
+	for doctype in ("CRM Lead", "CRM Deal", "Contact", "CRM Organization", "CRM Task"):
+		clear_list_count_cache_for(doctype)
+	frappe.db.commit()
+	return generator.counts
+
+
+def delete_data() -> dict[str, int]:
+	"""
+	Delete everything inserted by `generate_data`
+
+	:return: Number of rows deleted per doctype
+	"""
+	res = {}
+	for doctype in GENERATED_DOCTYPES:
+		filters = {"name": ["like", f"{PREFIX}-%"]}
+		if doctype in ("CRM Organization", "CRM Task"):
+			filters = {"name" if doctype == "CRM Organization" else "title": ["like", f"{PREFIX} %"]}
+		elif frappe.get_meta(doctype).istable:
+			filters = {"parent": ["like", f"{PREFIX}-%"]}
+		res[doctype] = frappe.db.count(doctype, filters)
+		frappe.db.delete(doctype, filters)
+
+	# only the timelines of the generated leads and deals have generated activities
+	frappe.db.delete("CRM Activity", {"reference_name": ["like", f"{PREFIX}-%"]})
+	rebuild_daily_metrics(commit=True)
+	evict_caller_id_cache()
+	for doctype in ("CRM Lead", "CRM Deal", "Contact", "CRM Organization", "CRM Task"):
+		clear_list_count_cache_for(doctype)
+	frappe.db.commit()
+	return res
+
+
+class DataGenerator:
+	def __init__(self, scale: float = 1, seed: int | None = None):
+		self.random = random.Random(seed)
+		self.run = frappe.generate_hash(length=6).upper()
+		self.volumes = {kind: max(int(count * scale), 1) for kind, count in VOLUMES.items()}
+		self.now = now_datetime()
+		self.counts = {}
+
+		self.users = frappe.get_all(
+			"User", filters={"enabled": 1, "user_type": "System User"}, pluck="name"
+		) or ["Administrator"]
+		self.lead_statuses = frappe.get_all("CRM Lead Status", pluck="name") or ["New"]
+		self.deal_statuses = frappe.get_all(
+			"CRM Deal Status", fields=["name", "type"], order_by="position asc"
+		)
+		self.sources = [*frappe.get_all("CRM Lead Source", pluck="name"), None]
+		self.territories = [*frappe.get_all("CRM Territory", pluck="name"), None]
+		self.lost_reasons = frappe.get_all("CRM Lost Reason", pluck="name")
+
+		self.organizations = []
+		self.contacts = []
+		self.leads = []
+		self.deals = []
+
+	def generate(self):
+		self.generate_organizations()
+		self.generate_contacts()
+		self.generate_leads()
+		self.generate_deals()
+		self.generate_calls()
+		self.generate_notes()
+		self.generate_tasks()
+		self.generate_communications()
+		self.generate_versions()
+
+	def insert(self, doctype: str, rows: list[dict]):
+		if not rows:
+			return
+		fields = list(rows[0])
+		frappe.db.bulk_insert(doctype, fields, [[row[field] for field in fields] for row in rows])
+		self.counts[doctype] = self.counts.get(doctype, 0) + len(rows)
+
+	def get_name(self, kind: str, i: int) -> str:
+		return f"{PREFIX}-{kind}-{self.run}-{i:07}"
+
+	def get_creation(self):
+		return add_to_date(self.now, seconds=-self.random.randint(0, HISTORY_DAYS * 24 * 60 * 60))
+
+	def get_standard_fields(self, name: str | None, creation) -> dict:
+		res = {"name": name} if name else {}
+		owner = self.random.choice(self.users)
+		res.update(creation=creation, modified=creation, owner=owner, modified_by=owner)
+		return res
+
+	def get_child_fields(self, name: str, parent: str, parenttype: str, parentfield: str, idx: int, creation):
+		return {
+			**self.get_standard_fields(name, creation),
+			"parent": parent,
+			"parenttype": parenttype,
+			"parentfield": parentfield,
+			"idx": idx,
+		}
+
+	def get_reference(self) -> tuple[str, str]:
+		if self.deals and self.random.random() < 0.5:
+			return "CRM Deal", self.random.choice(self.deals)
+		return "CRM Lead", self.random.choice(self.leads)
+
+	def get_mobile_no(self) -> str:
+		return f"+91 9{self.random.randint(100000000, 999999999)}"
+
+	def generate_organizations(self):
+		rows = []
+		for i in range(self.volumes["organizations"]):
+			name = f"{PREFIX} {self.run} Organization {i}"
+			self.organizations.append(name)
+			rows.append(
+				{
+					**self.get_standard_fields(name, self.get_creation()),
+					"organization_name": name,
+					"website": f"https://org{i}.{self.run.lower()}.example.com",
+					"no_of_employees": self.random.choice(["1-10", "11-50", "51-200", "201-500"]),
+					"annual_revenue": self.random.randint(1, 500) * 10000,
+					"territory": self.random.choice(self.territories),
+					"exchange_rate": 1,
+				}
+			)
+		self.insert("CRM Organization", rows)
+
+	def generate_contacts(self):
+		contacts, emails, phones = [], [], []
+		for i in range(self.volumes["contacts"]):
+			name = self.get_name("CONTACT", i)
+			creation = self.get_creation()
+			email = f"contact{i}.{self.run.lower()}@example.com"
+			mobile_no = self.get_mobile_no()
+			self.contacts.append(name)
+			contacts.append(
+				{
+					**self.get_standard_fields(name, creation),
+					"first_name": f"Contact {i}",
+					"last_name": self.run,
+					"full_name": f"Contact {i} {self.run}",
+					"email_id": email,
+					"mobile_no": mobile_no,
+					"company_name": self.random.choice(self.organizations),
+					"status": "Passive",
+				}
+			)
+			emails.append(
+				{
+					**self.get_child_fields(f"{name}-E", name, "Contact", "email_ids", 1, creation),
+					"email_id": email,
+					"is_primary": 1,
+				}
+			)
+			phones.append(
+				{
+					**self.get_child_fields(f"{name}-P", name, "Contact", "phone_nos", 1, creation),
+					"phone": mobile_no,
+					"mobile_no_normalized": normalize_phone_number(mobile_no),
+					"mobile_no_national": get_national_phone_number(mobile_no),
+					"is_primary_mobile_no": 1,
+				}
+			)
+		self.insert("Contact", contacts)
+		self.insert("Contact Email", emails)
+		self.insert("Contact Phone", phones)
+
+	def generate_leads(self):
+		rows = []
+		for i in range(self.volumes["leads"]):
+			name = self.get_name("LEAD", i)
+			mobile_no = self.get_mobile_no()
+			self.leads.append(name)
+			rows.append(
+				{
+					**self.get_standard_fields(name, self.get_creation()),
+					"first_name": f"Lead {i}",
+					"last_name": self.run,
+					"lead_name": f"Lead {i} {self.run}",
+					"email": f"lead{i}.{self.run.lower()}@example.com",
+					"mobile_no": mobile_no,
+					"mobile_no_normalized": normalize_phone_number(mobile_no),
+					"mobile_no_national": get_national_phone_number(mobile_no),
+					"organization": self.random.choice(self.organizations),
+					"status": self.random.choice(self.lead_statuses),
+					"lead_owner": self.random.choice(self.users),
+					"source": self.random.choice(self.sources),
+					"territory": self.random.choice(self.territories),
+				}
+			)
+		self.insert("CRM Lead", rows)
+
+	def generate_deals(self):
+		deals, contacts, logs = [], [], []
+		for i in range(self.volumes["deals"]):
+			name = self.get_name("DEAL", i)
+			creation = self.get_creation()
+			path = self.get_status_path()
+			status = path[-1]
+			deal_value = self.random.randint(1, 200) * 1000
+			closed_date = None
+			if status.type == "Won":
+				closed_date = add_days(creation, self.random.randint(0, (self.now - creation).days)).date()
+			self.deals.append(name)
+			deals.append(
+				{
+					**self.get_standard_fields(name, creation),
+					"organization": self.random.choice(self.organizations),
+					"lead": self.random.choice(self.leads) if self.random.random() < 0.5 else None,
+					"status": status.name,
+					"deal_owner": self.random.choice(self.users),
+					"source": self.random.choice(self.sources),
+					"territory": self.random.choice(self.territories),
+					"deal_value": deal_value,
+					"expected_deal_value": deal_value,
+					"probability": self.random.choice([10, 25, 50, 75, 90]),
+					"expected_closure_date": add_days(creation, self.random.randint(7, 120)).date(),
+					"closed_date": closed_date,
+					"lost_reason": (
+						self.random.choice(self.lost_reasons)
+						if status.type == "Lost" and self.lost_reasons
+						else None
+					),
+					"exchange_rate": 1,
+				}
+			)
+			contacts.append(
+				{
+					**self.get_child_fields(f"{name}-C", name, "CRM Deal", "contacts", 1, creation),
+					"contact": self.random.choice(self.contacts),
+					"is_primary": 1,
+				}
+			)
+
+			from_date = creation
+			for idx, (from_status, to_status) in enumerate(zip(path, [*path[1:], None], strict=True), 1):
+				to_date = add_to_date(from_date, hours=self.random.randint(1, 24 * 14)) if to_status else None
+				logs.append(
+					{
+						**self.get_child_fields(
+							f"{name}-L{idx}", name, "CRM Deal", "status_change_log", idx, creation
+						),
+						"from": from_status.name,
+						"from_type": from_status.type or "",
+						"to": to_status.name if to_status else "",
+						"to_type": (to_status.type or "") if to_status else "",
+						"from_date": from_date,
+						"to_date": to_date,
+						"duration": (to_date - from_date).total_seconds() if to_date else 0,
+						"log_owner": self.random.choice(self.users),
+					}
+				)
+				from_date = to_date
+		self.insert("CRM Deal", deals)
+		self.insert("CRM Contacts", contacts)
+		self.insert("CRM Status Change Log", logs)
+
+	def get_status_path(self) -> list[dict]:
+		"""
+		Statuses a deal went through, moving forward through the pipeline
+		"""
+		if not self.deal_statuses:
+			return [frappe._dict(name="Qualification", type="Open")]
+		end = self.random.randrange(len(self.deal_statuses))
+		start = self.random.randint(max(end - 3, 0), end)
+		return self.deal_statuses[start : end + 1]
+
+	def generate_calls(self):
+		rows = []
+		for i in range(self.volumes["calls"]):
+			name = self.get_name("CALL", i)
+			start_time = self.get_creation()
+			duration = self.random.randint(10, 1800)
+			reference_doctype, reference_docname = self.get_reference()
+			call_type = self.random.choice(["Incoming", "Outgoing"])
+			agent = self.random.choice(self.users)
+			rows.append(
+				{
+					**self.get_standard_fields(name, start_time),
+					"id": name,
+					"from": self.get_mobile_no(),
+					"to": self.get_mobile_no(),
+					"status": self.random.choice(["Completed", "Completed", "No Answer", "Busy"]),
+					"type": call_type,
+					"duration": duration,
+					"start_time": start_time,
+					"end_time": add_to_date(start_time, seconds=duration),
+					"caller": agent if call_type == "Outgoing" else None,
+					"receiver": agent if call_type == "Incoming" else None,
+					"reference_doctype": reference_doctype,
+					"reference_docname": reference_docname,
+					"telephony_medium": "Manual",
+				}
+			)
+		self.insert("CRM Call Log", rows)
+
+	def generate_notes(self):
+		rows = []
+		for i in range(self.volumes["notes"]):
+			reference_doctype, reference_docname = self.get_reference()
+			rows.append(
+				{
+					**self.get_standard_fields(self.get_name("NOTE", i), self.get_creation()),
+					"title": f"Note {i}",
+					"content": f"<p>Followed up about the proposal, attempt {i}.</p>",
+					"reference_doctype": reference_doctype,
+					"reference_docname": reference_docname,
+				}
+			)
+		self.insert("FCRM Note", rows)
+
+	def generate_tasks(self):
+		rows = []
+		for i in range(self.volumes["tasks"]):
+			creation = self.get_creation()
+			reference_doctype, reference_docname = self.get_reference()
+			rows.append(
+				{
+					**self.get_standard_fields(None, creation),
+					"title": f"{PREFIX} {self.run} Task {i}",
+					"status": self.random.choice(["Backlog", "Todo", "In Progress", "Done", "Canceled"]),
+					"priority": self.random.choice(["Low", "Medium", "High"]),
+					"assigned_to": self.random.choice(self.users),
+					"due_date": add_days(creation, self.random.randint(1, 30)),
+					"reference_doctype": reference_doctype,
+					"reference_docname": reference_docname,
+				}
+			)
+		self.insert("CRM Task", rows)
+
+	def generate_communications(self):
+		rows = []
+		for i in range(self.volumes["communications"]):
+			creation = self.get_creation()
+			reference_doctype, reference_name = self.get_reference()
+			sent = self.random.random() < 0.5
+			agent = self.random.choice(self.users)
+			customer = f"customer{i}.{self.run.lower()}@example.com"
+			rows.append(
+				{
+					**self.get_standard_fields(self.get_name("COMM", i), creation),
+					"subject": f"Re: Proposal {i}",
+					"content": f"<p>Hello,</p><p>Following up on the proposal {i}.</p><p>Regards</p>",
+					"communication_type": "Communication",
+					"communication_medium": "Email",
+					"sent_or_received": "Sent" if sent else "Received",
+					"sender": agent if sent else customer,
+					"recipients": customer if sent else agent,
+					"communication_date": creation,
+					"status": "Linked",
+					"reference_doctype": reference_doctype,
+					"reference_name": reference_name,
+				}
+			)
+		self.insert("Communication", rows)
+
+	def generate_versions(self):
+		rows = []
+		for i in range(self.volumes["versions"]):
+			ref_doctype, docname = self.get_reference()
+			statuses = (
+				[status.name for status in self.deal_statuses]
+				if ref_doctype == "CRM Deal"
+				else self.lead_statuses
+			) or ["New"]
+			data = {
+				"changed": [["status", self.random.choice(statuses), self.random.choice(statuses)]],
+				"added": [],
+				"removed": [],
+				"row_changed": [],
+				"data_import": None,
+				"updater_reference": None,
+			}
+			rows.append(
+				{
+					**self.get_standard_fields(self.get_name("VERSION", i), self.get_creation()),
+					"ref_doctype": ref_doctype,
+					"docname": docname,
+					"data": json.dumps(data),
+				}
+			)
+		self.insert("Version", rows)
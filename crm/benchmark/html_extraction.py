@@ -0,0 +1,58 @@
+import timeit
+
+from bs4 import BeautifulSoup
+
+from crm.utils.html_extractor import extract_tag, extract_tags, parse_tags
+
+ATTACHMENT_LOG = '<a href="/private/files/proposal-v2.pdf" target="_blank">proposal-v2.pdf</a>'
+COMMENT = (
+	"<p>"
+	+ "Followed up on the proposal, waiting for the revised numbers from procurement. " * 10
+	+ '<span class="mention" data-type="mention" data-id="jane@example.com" data-label="Jane">@Jane</span>'
+	+ " and "
+	+ '<span class="mention" data-type="mention" data-id="john@example.com" data-label="John">@John</span>'
+	+ " please review.</p>"
+) * 3
+
+
+def soup_attachment_log(html):
+	a_tag = BeautifulSoup(html, "html.parser").find("a")
+	return a_tag["href"], a_tag.text
+
+
+def soup_mentions(html):
+	soup = BeautifulSoup(html, "html.parser")
+	return [
+		(d.get("data-label"), d.get("data-id")) for d in soup.find_all("span", attrs={"data-type": "mention"})
+	]
+
+
+def run_html_benchmark(iterations: int = 1000) -> dict:
+	"""
+	Time the extraction of attachment log links and comment mentions with BeautifulSoup,
+	as it was done before `crm.utils.html_extractor`, against the extractor
+
+	:param iterations: Number of calls per measurement
+	:return: Microseconds per call with BeautifulSoup, the extractor without its cache and
+	        the extractor with its cache
+	"""
+	cases = {
+		"attachment_log": (
+			lambda: soup_attachment_log(ATTACHMENT_LOG),
+			lambda: parse_tags(ATTACHMENT_LOG, "a", limit=1),
+			lambda: extract_tag(ATTACHMENT_LOG, "a"),
+		),
+		"mentions": (
+			lambda: soup_mentions(COMMENT),
+			lambda: parse_tags(COMMENT, "span", {"data-type": "mention"}),
+			lambda: extract_tags(COMMENT, "span", {"data-type": "mention"}),
+		),
+	}
+
+	results = {}
+	for name, (soup, uncached, cached) in cases.items():
+		results[name] = {
+			key: timeit.timeit(call, number=iterations) / iterations * 1e6
+			for key, call in (("beautifulsoup_us", soup), ("extractor_us", uncached), ("cached_us", cached))
+		}
+	return results
@@ -0,0 +1,66 @@
+import random
+import time
+
+from crm.utils import (
+	ParsedPhoneNumber,
+	get_parsed_phone_number,
+	normalize_phone_number,
+	normalize_phone_numbers,
+)
+
+# ways the same mobile number gets written
+FORMATS = (
+	lambda number: f"+91 {number}",
+	lambda number: f"0{number}",
+	lambda number: number,
+	lambda number: f"+91-{number[:5]}-{number[5:]}",
+)
+
+
+def get_phone_numbers(count: int, distinct: int, seed: int = 25) -> list[str]:
+	"""
+	Get `count` Indian mobile numbers, drawn from `distinct` ones written in different formats,
+	with a few US and invalid numbers
+	"""
+	rand = random.Random(seed)
+	pool = []
+	for i in range(distinct):
+		if i % 20 == 0:
+			pool.append(f"+1 (415) 555-{rand.randint(0, 9999):04d}")
+		elif i % 50 == 1:
+			pool.append(f"{rand.randint(10, 9999)}")
+		else:
+			number = str(rand.randint(9000000000, 9999999999))
+			pool.append(rand.choice(FORMATS)(number))
+	return [rand.choice(pool) for _ in range(count)]
+
+
+def run_phone_benchmark(count: int = 100000, distinct: int = 20000) -> dict:
+	"""
+	Time the normalization of `count` phone numbers parsed every time, as it was done before
+	`get_parsed_phone_number`, against the memoized and batch normalization
+
+	:param count: Number of phone numbers normalized per measurement
+	:param distinct: Number of distinct phone numbers among them
+	:return: Milliseconds per measurement
+	"""
+	phone_numbers = get_phone_numbers(count, distinct)
+
+	def timed(call):
+		get_parsed_phone_number.cache_clear()
+		start = time.perf_counter()
+		call()
+		return (time.perf_counter() - start) * 1000
+
+	return {
+		"count": count,
+		"distinct": distinct,
+		"phonenumbers_ms": timed(
+			lambda: [ParsedPhoneNumber.parse(phone_number).normalized for phone_number in phone_numbers]
+		),
+		"memoized_ms": timed(
+			lambda: [normalize_phone_number(phone_number) for phone_number in phone_numbers]
+		),
+		"batch_ms": timed(lambda: normalize_phone_numbers(phone_numbers)),
+		"batch_uncached_ms": timed(lambda: normalize_phone_numbers(phone_numbers, cache=False)),
+	}
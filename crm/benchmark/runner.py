@@ -0,0 +1,197 @@
+import statistics
+import time
+from contextlib import contextmanager
+
+import frappe
+from frappe.utils import add_days, now, nowdate
+
+import crm
+from crm.api.activities import get_activities, get_timeline
+from crm.api.dashboard import evict_dashboard_cache, get_dashboard
+from crm.api.doc import get_data
+from crm.api.whatsapp import get_whatsapp_messages
+from crm.benchmark.html_extraction import run_html_benchmark
+from crm.benchmark.phone_numbers import run_phone_benchmark
+from crm.integrations.api import evict_caller_id_cache, get_contact_by_phone_number
+
+PERCENTILES = (50, 90, 95, 99)
+COUNTED_DOCTYPES = (
+	"CRM Lead",
+	"CRM Deal",
+	"Contact",
+	"CRM Organization",
+	"CRM Call Log",
+	"FCRM Note",
+	"CRM Task",
+	"Communication",
+	"Version",
+)
+
+
+def get_benchmarks() -> dict:
+	"""
+	Get the benchmarked calls as `{name: (call, setup)}`, `setup` runs untimed before every call
+	"""
+	deal = get_busiest_document("CRM Deal")
+	lead = get_busiest_document("CRM Lead")
+	from_date, to_date = add_days(nowdate(), -365), nowdate()
+	mobile_no = frappe.db.get_value("CRM Lead", lead, "mobile_no") if lead else None
+
+	return {
+		"doc.get_data:list": (
+			lambda: get_data("CRM Lead", {}, "modified desc", view={"view_type": "list"}),
+			None,
+		),
+		"doc.get_data:kanban": (
+			lambda: get_data(
+				"CRM Deal",
+				{},
+				"modified desc",
+				column_field="status",
+				title_field="organization",
+				view={"view_type": "kanban"},
+			),
+			None,
+		),
+		"doc.get_data:group_by": (
+			lambda: get_data(
+				"CRM Lead", {}, "modified desc", view={"view_type": "group_by", "group_by_field": "status"}
+			),
+			None,
+		),
+		"dashboard.get_dashboard": (lambda: get_dashboard(from_date, to_date), evict_dashboard_cache),
+		"dashboard.get_dashboard:cached": (lambda: get_dashboard(from_date, to_date), None),
+		"activities.get_activities:deal": (lambda: get_activities(deal), None),
+		"activities.get_activities:lead": (lambda: get_activities(lead), None),
+		"activities.get_timeline:deal": (lambda: get_timeline(deal, previews=True), None),
+		"whatsapp.get_whatsapp_messages": (lambda: get_whatsapp_messages("CRM Deal", deal), None),
+		"integrations.get_contact_by_phone_number": (
+			lambda: get_contact_by_phone_number(mobile_no),
+			evict_caller_id_cache,
+		),
+		"integrations.get_contact_by_phone_number:cached": (
+			lambda: get_contact_by_phone_number(mobile_no),
+			None,
+		),
+	}
+
+
+def run_benchmarks(iterations: int = 20, warmup: int = 2, cases=None) -> dict:
+	"""
+	Time the hot paths of the app against the data of the current site
+
+	:param iterations: Number of timed calls per benchmark
+	:param warmup: Number of untimed calls per benchmark before timing starts
+	:param cases: Names of the benchmarks to run, all if not given, `html_extraction` and
+	        `phone_numbers` for the micro-benchmarks of `crm.utils.html_extractor` and of the
+	        phone number normalization in `crm.utils`
+	:return: Latency percentiles in milliseconds, query and row counts per benchmark, along
+	        with versions and data volumes so that runs can be compared
+	"""
+	frappe.set_user("Administrator")
+
+	results = {}
+	for name, (call, setup) in get_benchmarks().items():
+		if cases and name not in cases:
+			continue
+		results[name] = run_benchmark(call, setup, iterations, warmup)
+
+	micro = {}
+	if not cases or "html_extraction" in cases:
+		micro["html_extraction"] = run_html_benchmark()
+	if not cases or "phone_numbers" in cases:
+		micro["phone_numbers"] = run_phone_benchmark()
+
+	return {
+		"site": frappe.local.site,
+		"crm_version": crm.__version__,
+		"frappe_version": frappe.__version__,
+		"timestamp": now(),
+		"iterations": iterations,
+		"records": {doctype: frappe.db.count(doctype) for doctype in COUNTED_DOCTYPES},
+		"results": results,
+		"micro": micro,
+	}
+
+
+def run_benchmark(call, setup=None, iterations: int = 20, warmup: int = 2) -> dict:
+	for _ in range(warmup):
+		if setup:
+			setup()
+		call()
+
+	timings = []
+	queries = []
+	rows = []
+	for _ in range(iterations):
+		if setup:
+			setup()
+		with record_queries() as recorder:
+			start = time.perf_counter()
+			call()
+			timings.append((time.perf_counter() - start) * 1000)
+		queries.append(recorder.count)
+		rows.append(recorder.rows)
+		# every call should pay for what a fresh request pays for
+		frappe.local.cache = {}
+
+	res = {f"p{percentile}_ms": get_percentile(timings, percentile) for percentile in PERCENTILES}
+	res.update(
+		mean_ms=statistics.fmean(timings),
+		min_ms=min(timings),
+		max_ms=max(timings),
+		queries=max(queries),
+		rows=max(rows),
+	)
+	return res
+
+
+def get_percentile(values: list[float], percentile: int) -> float:
+	if len(values) < 2:
+		return values[0]
+	return statistics.quantiles(values, n=100, method="inclusive")[percentile - 1]
+
+
+@contextmanager
+def record_queries():
+	"""
+	Record the queries run through `frappe.db.sql` within the block, along with
+	the number of rows they fetched
+	"""
+	recorder = frappe._dict(count=0, rows=0, queries=[])
+	db_class = frappe.db.__class__
+	sql = db_class.sql
+
+	def recorded_sql(self, *args, **kwargs):
+		res = sql(self, *args, **kwargs)
+		recorder.count += 1
+		recorder.queries.append(str(self.last_query))
+		if isinstance(res, list | tuple):
+			recorder.rows += len(res)
+		return res
+
+	db_class.sql = recorded_sql
+	try:
+		yield recorder
+	finally:
+		db_class.sql = sql
+
+
+def get_busiest_document(doctype: str) -> str | None:
+	"""
+	Get the document of `doctype` with the most versions, the heaviest activity timeline
+	"""
+	res = frappe.db.sql(
+		"""
+		SELECT docname
+		FROM `tabVersion`
+		WHERE ref_doctype = %s
+		GROUP BY docname
+		ORDER BY COUNT(*) DESC
+		LIMIT 1
+		""",
+		doctype,
+	)
+	if res:
+		return res[0][0]
+	return frappe.db.get_value(doctype, {}, "name", order_by="creation desc")
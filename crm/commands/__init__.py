@@ -0,0 +1,102 @@
+import click
+import frappe
+from frappe.commands import get_site, pass_context
+
+
+@click.command("recompute-sla")
+@click.argument("sla")
+@click.option("--processes", type=int, help="Number of worker processes, defaults to the number of CPUs")
+@click.option("--chunk-size", type=int, default=1000, help="Number of documents per chunk")
+@click.option("--restart", is_flag=True, default=False, help="Ignore progress of an interrupted run")
+@pass_context
+def recompute_sla(context, sla, processes=None, chunk_size=1000, restart=False):
+	"Recompute SLA fields of leads and deals after the SLA's working hours or priorities change"
+	from crm.fcrm.doctype.crm_service_level_agreement.recompute import recompute_sla
+
+	site = get_site(context)
+	frappe.init(site)
+	frappe.connect()
+	try:
+		count = recompute_sla(
+			site,
+			sla,
+			processes=processes,
+			chunk_size=chunk_size,
+			restart=restart,
+			progress_callback=lambda progress: click.echo(
+				f"Recomputed {progress['done']} of {progress['total']} documents"
+			),
+		)
+		click.secho(f"Recomputed SLA {sla} for {count} documents", fg="green")
+	finally:
+		frappe.destroy()
+
+
+@click.command("generate-crm-data")
+@click.option("--scale", type=float, default=1, help="Multiplier for the base volume of every doctype")
+@click.option("--seed", type=int, help="Seed for reproducible data")
+@click.option("--delete", is_flag=True, default=False, help="Delete previously generated data instead")
+@pass_context
+def generate_crm_data(context, scale=1, seed=None, delete=False):
+	"Generate synthetic leads, deals and activities for benchmarking"
+	from crm.benchmark.data import delete_data, generate_data
+
+	site = get_site(context)
+	frappe.init(site)
+	frappe.connect()
+	try:
+		counts = delete_data() if delete else generate_data(scale=scale, seed=seed)
+		for doctype, count in counts.items():
+			click.echo(f"{doctype}: {count}")
+		click.secho("Deleted generated data" if delete else "Generated data", fg="green")
+	finally:
+		frappe.destroy()
+
+
+@click.command("run-crm-benchmark")
+@click.option("--iterations", type=int, default=20, help="Number of timed calls per benchmark")
+@click.option("--warmup", type=int, default=2, help="Number of untimed calls per benchmark")
+@click.option("--case", "cases", multiple=True, help="Run only this benchmark, can be repeated")
+@click.option("--output", type=click.Path(dir_okay=False), help="Write the results to this file")
+@pass_context
+def run_crm_benchmark(context, iterations=20, warmup=2, cases=None, output=None):
+	"Time list views, the dashboard, activities and WhatsApp messages, and report them as JSON"
+	from crm.benchmark.runner import run_benchmarks
+
+	site = get_site(context)
+	frappe.init(site)
+	frappe.connect()
+	try:
+		results = frappe.as_json(run_benchmarks(iterations=iterations, warmup=warmup, cases=cases))
+		if output:
+			with open(output, "w") as f:
+				f.write(results)
+			click.secho(f"Benchmark results written to {output}", fg="green")
+		else:
+			click.echo(results)
+	finally:
+		frappe.destroy()
+
+
+@click.command("backfill-crm-activity")
+@click.option("--chunk-size", type=int, default=1000, help="Number of documents rendered at a time")
+@pass_context
+def backfill_crm_activity(context, chunk_size=1000):
+	"Rebuild the activity feed of leads and deals from their existing history"
+	from crm.fcrm.doctype.crm_activity.crm_activity import backfill_activities
+
+	site = get_site(context)
+	frappe.init(site)
+	frappe.connect()
+	try:
+		count = backfill_activities(
+			chunk_size=chunk_size,
+			progress_callback=lambda doctype, count: click.echo(f"{doctype}: {count} activities"),
+			commit=True,
+		)
+		click.secho(f"Backfilled {count} activities", fg="green")
+	finally:
+		frappe.destroy()
+
+
+commands = [recompute_sla, generate_crm_data, run_crm_benchmark, backfill_crm_activity]
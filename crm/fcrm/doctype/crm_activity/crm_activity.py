@@ -0,0 +1,467 @@
+# Copyright (c) 2026, Frappe Technologies Pvt. Ltd. and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+from frappe.utils import now
+
+from crm.api.activities import (
+	get_attachment_log_activity,
+	get_comment_activity,
+	get_communication_activity,
+	get_content_preview,
+	get_creation_activity,
+	get_timeline_attachments,
+	get_version_activity,
+	get_version_fields,
+)
+
+TIMELINE_DOCTYPES = ("CRM Lead", "CRM Deal")
+COMMENT_TYPES = ("Comment", "Attachment", "Attachment Removed")
+COMMUNICATION_TYPES = ("Communication", "Feedback", "Automated Message")
+CALL_FIELDS = [
+	"name",
+	"caller",
+	"receiver",
+	"from",
+	"to",
+	"duration",
+	"start_time",
+	"end_time",
+	"status",
+	"type",
+	"recording_url",
+	"creation",
+	"note",
+]
+NOTE_FIELDS = ["name", "title", "content", "owner", "modified"]
+TASK_FIELDS = [
+	"name",
+	"title",
+	"description",
+	"assigned_to",
+	"due_date",
+	"priority",
+	"status",
+	"modified",
+]
+
+
+class CRMActivity(Document):
+	pass
+
+
+def on_doctype_update():
+	frappe.db.add_index("CRM Activity", ["reference_doctype", "reference_name", "creation"])
+	frappe.db.add_index("CRM Activity", ["source_doctype", "source_name"])
+
+
+def sync_activities(doc, method=None):
+	"""
+	Re-render the activities of a timeline source after it changes, hooked on the events of
+	leads, deals, versions, comments, communications, files, calls, notes and tasks
+
+	:param doc: Document that changed
+	:param method: Document event
+	"""
+	if doc.doctype == "File":
+		# attachments are shown on the comment/email they are attached to
+		if doc.attached_to_doctype in ("Comment", "Communication") and doc.attached_to_name:
+			notify_timelines(refresh_activities(doc.attached_to_doctype, [doc.attached_to_name]))
+		return
+
+	if not is_timeline_source(doc):
+		return
+
+	if method == "on_trash":
+		delete_activities(doc.doctype, [doc.name])
+		if doc.doctype in TIMELINE_DOCTYPES:
+			frappe.db.delete("CRM Activity", {"reference_doctype": doc.doctype, "reference_name": doc.name})
+	else:
+		notify_timelines(refresh_activities(doc.doctype, [doc.name]))
+
+
+def is_timeline_source(doc) -> bool:
+	if doc.doctype == "Version":
+		return doc.ref_doctype in TIMELINE_DOCTYPES
+	if doc.doctype == "Comment":
+		return doc.reference_doctype in TIMELINE_DOCTYPES and doc.comment_type in COMMENT_TYPES
+	if doc.doctype == "Communication":
+		return doc.reference_doctype in TIMELINE_DOCTYPES or any(
+			link.link_doctype in TIMELINE_DOCTYPES for link in doc.get("timeline_links", [])
+		)
+	return doc.doctype in RENDERERS
+
+
+def refresh_activities(source_doctype: str, names: list[str]) -> list[dict]:
+	delete_activities(source_doctype, names)
+	rows = render_activities(source_doctype, names)
+	insert_activities(rows)
+	return rows
+
+
+def notify_timelines(rows: list[dict]):
+	"""
+	Let the open timelines of the leads/deals of `rows` load their new activities
+	"""
+	for reference_doctype, reference_name in {(row.reference_doctype, row.reference_name) for row in rows}:
+		frappe.publish_realtime(
+			"crm_activity",
+			{"reference_doctype": reference_doctype, "reference_name": reference_name},
+			after_commit=True,
+		)
+
+
+def delete_activities(source_doctype: str, names: list[str]):
+	frappe.db.delete("CRM Activity", {"source_doctype": source_doctype, "source_name": ("in", names)})
+
+
+def insert_activities(rows: list[dict]):
+	if not rows:
+		return
+
+	timestamp = now()
+	user = frappe.session.user
+	fields = [
+		"name",
+		"creation",
+		"modified",
+		"owner",
+		"modified_by",
+		"reference_doctype",
+		"reference_name",
+		"source_doctype",
+		"source_name",
+		"activity_type",
+		"data",
+	]
+	values = []
+	for row in rows:
+		data = {key: value for key, value in row.activity.items() if key != "creation"}
+		values.append(
+			(
+				frappe.generate_hash(),
+				row.activity["creation"],
+				timestamp,
+				row.activity.get("owner") or user,
+				user,
+				row.reference_doctype,
+				row.reference_name,
+				row.source_doctype,
+				row.source_name,
+				row.activity["activity_type"],
+				frappe.as_json(data, indent=None),
+			)
+		)
+	frappe.db.bulk_insert("CRM Activity", fields, values)
+
+
+def render_activities(source_doctype: str, names: list[str]) -> list[dict]:
+	"""
+	Render the activities of timeline sources, as shown in the timeline of the leads/deals they belong to
+
+	:param source_doctype: Doctype of the sources
+	:param names: Names of the sources
+	:return: `reference_doctype`, `reference_name`, `source_doctype`, `source_name` and `activity`
+	        of every row
+	"""
+	if not names:
+		return []
+	return RENDERERS[source_doctype](names)
+
+
+def get_row(reference_doctype, reference_name, source_doctype, source_name, activity):
+	return frappe._dict(
+		reference_doctype=reference_doctype,
+		reference_name=reference_name,
+		source_doctype=source_doctype,
+		source_name=source_name,
+		activity=activity,
+	)
+
+
+def render_leads(names):
+	leads = frappe.db.get_all(
+		"CRM Lead", filters={"name": ("in", names)}, fields=["name", "creation", "owner"]
+	)
+	return [
+		get_row(
+			"CRM Lead",
+			lead.name,
+			"CRM Lead",
+			lead.name,
+			get_creation_activity(lead.creation, lead.owner, "created this lead", is_lead=True),
+		)
+		for lead in leads
+	]
+
+
+def render_deals(names):
+	deals = frappe.db.get_all(
+		"CRM Deal", filters={"name": ("in", names)}, fields=["name", "creation", "owner", "lead"]
+	)
+	return [
+		get_row(
+			"CRM Deal",
+			deal.name,
+			"CRM Deal",
+			deal.name,
+			get_creation_activity(
+				deal.creation,
+				deal.owner,
+				"converted the lead to this deal" if deal.lead else "created this deal",
+				is_lead=False,
+			),
+		)
+		for deal in deals
+	]
+
+
+def render_versions(names):
+	fields = {doctype: get_version_fields(doctype) for doctype in TIMELINE_DOCTYPES}
+	versions = frappe.db.get_all(
+		"Version",
+		filters={"name": ("in", names), "ref_doctype": ("in", TIMELINE_DOCTYPES)},
+		fields=["name", "ref_doctype", "docname", "creation", "owner", "data"],
+	)
+
+	rows = []
+	for version in versions:
+		is_lead = version.ref_doctype == "CRM Lead"
+		if activity := get_version_activity(version, fields[version.ref_doctype], is_lead):
+			# labels and options are resolved when the timeline is read, they change over time
+			activity["data"].pop("field_label", None)
+			activity.pop("options", None)
+			rows.append(get_row(version.ref_doctype, version.docname, "Version", version.name, activity))
+	return rows
+
+
+def render_comments(names):
+	comments = frappe.db.get_all(
+		"Comment",
+		filters={
+			"name": ("in", names),
+			"reference_doctype": ("in", TIMELINE_DOCTYPES),
+			"comment_type": ("in", COMMENT_TYPES),
+		},
+		fields=[
+			"name",
+			"reference_doctype",
+			"reference_name",
+			"creation",
+			"owner",
+			"content",
+			"comment_type",
+		],
+	)
+	attachments = get_timeline_attachments([c.name for c in comments if c.comment_type == "Comment"], [])
+
+	rows = []
+	for comment in comments:
+		is_lead = comment.reference_doctype == "CRM Lead"
+		if comment.comment_type == "Comment":
+			activity = get_comment_activity(comment, is_lead, attachments.get(("Comment", comment.name)))
+		else:
+			activity = get_attachment_log_activity(comment, is_lead)
+		rows.append(
+			get_row(comment.reference_doctype, comment.reference_name, "Comment", comment.name, activity)
+		)
+	return rows
+
+
+def render_communications(names):
+	communications = frappe.db.get_all(
+		"Communication",
+		filters={"name": ("in", names), "communication_type": ("in", COMMUNICATION_TYPES)},
+		fields=[
+			"name",
+			"reference_doctype",
+			"reference_name",
+			"creation",
+			"communication_type",
+			"communication_date",
+			"subject",
+			"content",
+			"sender_full_name",
+			"sender",
+			"recipients",
+			"cc",
+			"bcc",
+			"read_by_recipient",
+			"delivery_status",
+		],
+	)
+	if not communications:
+		return []
+
+	references = {}
+	for communication in communications:
+		if communication.reference_doctype in TIMELINE_DOCTYPES and communication.reference_name:
+			references.setdefault(communication.name, set()).add(
+				(communication.reference_doctype, communication.reference_name)
+			)
+	for link in frappe.db.get_all(
+		"Communication Link",
+		filters={"parent": ("in", names), "link_doctype": ("in", TIMELINE_DOCTYPES)},
+		fields=["parent", "link_doctype", "link_name"],
+	):
+		references.setdefault(link.parent, set()).add((link.link_doctype, link.link_name))
+
+	attachments = get_timeline_attachments([], [c.name for c in communications])
+
+	rows = []
+	for communication in communications:
+		for reference_doctype, reference_name in references.get(communication.name, ()):
+			activity = get_communication_activity(
+				communication,
+				reference_doctype == "CRM Lead",
+				attachments.get(("Communication", communication.name)),
+			)
+			# bodies are loaded from the communication when the timeline is read
+			activity["data"]["content"] = get_content_preview(communication.content)
+			activity["data"]["is_preview"] = True
+			rows.append(
+				get_row(reference_doctype, reference_name, "Communication", communication.name, activity)
+			)
+	return rows
+
+
+def render_calls(names):
+	calls = frappe.db.get_all(
+		"CRM Call Log",
+		filters={"name": ("in", names)},
+		fields=[*CALL_FIELDS, "reference_doctype", "reference_docname"],
+	)
+
+	references = {}
+	for call in calls:
+		if call.reference_doctype in TIMELINE_DOCTYPES and call.reference_docname:
+			references.setdefault(call.name, set()).add((call.reference_doctype, call.reference_docname))
+	for link in frappe.db.get_all(
+		"Dynamic Link",
+		filters={
+			"parenttype": "CRM Call Log",
+			"parent": ("in", names),
+			"link_doctype": ("in", TIMELINE_DOCTYPES),
+		},
+		fields=["parent", "link_doctype", "link_name"],
+	):
+		references.setdefault(link.parent, set()).add((link.link_doctype, link.link_name))
+
+	rows = []
+	for call in calls:
+		# callers and contacts are resolved when the timeline is read, they change over time
+		activity = {field: call.get(field) for field in CALL_FIELDS}
+		activity["activity_type"] = "call"
+		for reference_doctype, reference_name in references.get(call.name, ()):
+			rows.append(get_row(reference_doctype, reference_name, "CRM Call Log", call.name, activity))
+	return rows
+
+
+def render_notes(names):
+	return render_linked_records("FCRM Note", "note", NOTE_FIELDS, names)
+
+
+def render_tasks(names):
+	return render_linked_records("CRM Task", "task", TASK_FIELDS, names)
+
+
+def render_linked_records(doctype, activity_type, fields, names):
+	records = frappe.db.get_all(
+		doctype,
+		filters={"name": ("in", names), "reference_doctype": ("in", TIMELINE_DOCTYPES)},
+		fields=[*fields, "creation", "owner", "reference_doctype", "reference_docname"],
+	)
+	return [
+		get_row(
+			record.reference_doctype,
+			record.reference_docname,
+			doctype,
+			record.name,
+			{
+				"name": record.name,
+				"activity_type": activity_type,
+				"creation": record.creation,
+				"owner": record.owner,
+				"data": {field: record.get(field) for field in fields},
+				"is_lead": record.reference_doctype == "CRM Lead",
+			},
+		)
+		for record in records
+		if record.reference_docname
+	]
+
+
+# sources with activities of the doctypes that don't only have timeline documents, as
+# `(doctype, field with the source name, filters)`
+SOURCE_QUERIES = {
+	"Version": [("Version", "name", {"ref_doctype": ("in", TIMELINE_DOCTYPES)})],
+	"Comment": [
+		(
+			"Comment",
+			"name",
+			{"reference_doctype": ("in", TIMELINE_DOCTYPES), "comment_type": ("in", COMMENT_TYPES)},
+		)
+	],
+	"Communication": [
+		("Communication", "name", {"reference_doctype": ("in", TIMELINE_DOCTYPES)}),
+		("Communication Link", "parent", {"link_doctype": ("in", TIMELINE_DOCTYPES)}),
+	],
+}
+
+RENDERERS = {
+	"CRM Lead": render_leads,
+	"CRM Deal": render_deals,
+	"Version": render_versions,
+	"Comment": render_comments,
+	"Communication": render_communications,
+	"CRM Call Log": render_calls,
+	"FCRM Note": render_notes,
+	"CRM Task": render_tasks,
+}
+
+
+def get_source_names(source_doctype: str, chunk_size: int):
+	"""
+	Names of all the documents of `source_doctype` that may have activities, `chunk_size` at a
+	time in order of name. Each chunk is read after the previous one, by name.
+	"""
+	for doctype, field, filters in SOURCE_QUERIES.get(source_doctype, [(source_doctype, "name", {})]):
+		last = ""
+		while names := frappe.db.get_all(
+			doctype,
+			filters={**filters, field: (">", last)},
+			fields=[field],
+			order_by=f"{field} asc",
+			limit=chunk_size,
+			distinct=True,
+			pluck=field,
+		):
+			yield names
+			last = names[-1]
+
+
+def backfill_activities(chunk_size: int = 1000, progress_callback=None, commit: bool = False) -> int:
+	"""
+	Rebuild the activity feed from the existing leads, deals and their timeline sources. The
+	activities of each chunk of sources replace the ones they had, so that a rebuild can be
+	committed and resumed chunk by chunk.
+
+	:param chunk_size: Number of sources rendered at a time
+	:param progress_callback: Called with the source doctype and the number of its rows inserted
+	:param commit: Commit after each chunk
+	:return: Number of activities inserted
+	"""
+	total = 0
+	for source_doctype in RENDERERS:
+		count = 0
+		for names in get_source_names(source_doctype, chunk_size):
+			count += len(refresh_activities(source_doctype, names))
+			if commit:
+				frappe.db.commit()
+
+		total += count
+		if progress_callback:
+			progress_callback(source_doctype, count)
+
+	return total
@@ -0,0 +1,86 @@
+# Copyright (c) 2026, Frappe Technologies Pvt. Ltd. and Contributors
+# See license.txt
+
+from unittest.mock import patch
+
+import frappe
+from frappe.tests import IntegrationTestCase
+
+from crm.api.activities import get_timeline
+from crm.fcrm.doctype.crm_activity.crm_activity import backfill_activities
+
+
+def get_feed(reference_name):
+	return sorted(
+		(row.source_doctype, row.source_name, row.activity_type, row.creation, row.data)
+		for row in frappe.get_all(
+			"CRM Activity",
+			filters={"reference_name": reference_name},
+			fields=["source_doctype", "source_name", "activity_type", "creation", "data"],
+		)
+	)
+
+
+class IntegrationTestCRMActivity(IntegrationTestCase):
+	def setUp(self):
+		self.lead = frappe.get_doc({"doctype": "CRM Lead", "first_name": "Feed Lead"}).insert()
+
+	def add_comment(self, content):
+		return frappe.get_doc(
+			{
+				"doctype": "Comment",
+				"comment_type": "Comment",
+				"reference_doctype": "CRM Lead",
+				"reference_name": self.lead.name,
+				"content": content,
+			}
+		).insert(ignore_permissions=True)
+
+	def test_feed_follows_document_events(self):
+		comment = self.add_comment("<p>First</p>")
+		frappe.get_doc(
+			{
+				"doctype": "File",
+				"file_name": "feed.txt",
+				"content": "feed",
+				"attached_to_doctype": "Comment",
+				"attached_to_name": comment.name,
+			}
+		).insert(ignore_permissions=True)
+
+		feed = get_feed(self.lead.name)
+		self.assertLessEqual({"creation", "comment"}, {row[2] for row in feed})
+		comment_data = frappe.parse_json(next(row[4] for row in feed if row[2] == "comment"))
+		self.assertEqual(len(comment_data["attachments"]), 1)
+
+		# one source at a time, each chunk read after the previous one
+		backfill_activities(chunk_size=1)
+		self.assertEqual(feed, get_feed(self.lead.name))
+
+		comment.delete()
+		self.assertNotIn("comment", {row[2] for row in get_feed(self.lead.name)})
+
+	def test_deal_timeline_includes_lead_history(self):
+		self.add_comment("<p>On the lead</p>")
+		deal = frappe.get_doc({"doctype": "CRM Deal", "lead": self.lead.name}).insert(ignore_mandatory=True)
+
+		activities = get_timeline(deal.name)["activities"]
+		comments = [a for a in activities if a["activity_type"] == "comment"]
+		creations = {a["data"] for a in activities if a["activity_type"] == "creation"}
+
+		self.assertEqual(len(comments), 1)
+		self.assertTrue(comments[0]["is_lead"])
+		self.assertEqual(creations, {"created this lead", "converted the lead to this deal"})
+
+	def test_timeline_resolves_field_labels_when_read(self):
+		self.lead.website = "https://feed.example.com"
+		self.lead.save()
+		stored = next(row for row in get_feed(self.lead.name) if row[0] == "Version")
+		self.assertNotIn("field_label", frappe.parse_json(stored[4])["data"])
+
+		fields = {"website": {"label": "Company Site", "options": None}}
+		with patch("crm.api.activities.get_version_fields", return_value=fields):
+			activities = get_timeline(self.lead.name)["activities"]
+
+		change = next(a for a in activities if a["activity_type"] == "added")
+		self.assertEqual(change["data"]["field_label"], "Company Site")
@@ -4,7 +4,7 @@
 import frappe
 from frappe.model.document import Document
 
-from crm.integrations.api import get_contact_by_phone_number
+from crm.integrations.api import get_contact_by_phone_number, get_contacts_by_phone_numbers
 from crm.utils import seconds_to_duration
 
 
@@ -81,7 +81,7 @@ class CRMCallLog(Document):
 		return {"columns": columns, "rows": rows}
 
 	def parse_list_data(calls):
-		return [parse_call_log(call) for call in calls] if calls else []
+		return parse_call_logs(calls)
 
 	def has_link(self, doctype, name):
 		for link in self.links:
@@ -95,17 +95,45 @@ class CRMCallLog(Document):
 		self.append("links", {"link_doctype": reference_doctype, "link_name": reference_name})
 
 
-def parse_call_log(call):
+def parse_call_logs(calls):
+	"""
+	Parse call logs for display, fetching the users and contacts of all calls in batched queries
+
+	:param calls: Call logs as dicts
+	"""
+	if not calls:
+		return []
+
+	users = {}
+	user_names = {user for call in calls for user in (call.get("caller"), call.get("receiver")) if user}
+	if user_names:
+		users = {
+			user.name: (user.full_name, user.user_image)
+			for user in frappe.get_all(
+				"User", filters={"name": ("in", list(user_names))}, fields=["name", "full_name", "user_image"]
+			)
+		}
+
+	numbers = [get_contact_number(call) for call in calls if call.get("type") in ("Incoming", "Outgoing")]
+	contacts = get_contacts_by_phone_numbers(numbers)
+
+	return [parse_call_log(call, users, contacts) for call in calls]
+
+
+def parse_call_log(call, users=None, contacts=None):
+	"""
+	Parse a call log for display
+
+	:param call: Call log as a dict
+	:param users: `(full_name, user_image)` keyed by user, fetched for this call if not given
+	:param contacts: Contacts keyed by phone number, looked up for this call if not given
+	"""
 	call["show_recording"] = False
 	call["_duration"] = seconds_to_duration(call.get("duration"))
 	if call.get("type") == "Incoming":
 		call["activity_type"] = "incoming_call"
-		contact = get_contact_by_phone_number(call.get("from"))
-		receiver = (
-			frappe.db.get_values("User", call.get("receiver"), ["full_name", "user_image"])[0]
-			if call.get("receiver")
-			else [None, None]
-		)
+		contact = get_call_contact(call, contacts)
+		receiver = get_call_user(call.get("receiver"), users)
 		call["_caller"] = {
 			"label": contact.get("full_name", "Unknown"),
 			"image": contact.get("image"),
@@ -116,12 +144,8 @@ def parse_call_log(call):
 		}
 	elif call.get("type") == "Outgoing":
 		call["activity_type"] = "outgoing_call"
-		contact = get_contact_by_phone_number(call.get("to"))
-		caller = (
-			frappe.db.get_values("User", call.get("caller"), ["full_name", "user_image"])[0]
-			if call.get("caller")
-			else [None, None]
-		)
+		contact = get_call_contact(call, contacts)
+		caller = get_call_user(call.get("caller"), users)
 		call["_caller"] = {
 			"label": caller[0],
 			"image": caller[1],
@@ -134,6 +158,27 @@ def parse_call_log(call):
 	return call
 
 
+def get_contact_number(call):
+	"""
+	Number of the other party of the call
+	"""
+	return call.get("from") if call.get("type") == "Incoming" else call.get("to")
+
+
+def get_call_contact(call, contacts=None):
+	if contacts is None:
+		return get_contact_by_phone_number(get_contact_number(call))
+	return contacts[get_contact_number(call)]
+
+
+def get_call_user(user, users=None):
+	if not user:
+		return [None, None]
+	if users is None:
+		return frappe.db.get_values("User", user, ["full_name", "user_image"])[0]
+	return users.get(user) or [None, None]
+
+
 @frappe.whitelist()
 def get_call_log(name):
 	call = frappe.get_cached_doc(
@@ -0,0 +1,296 @@
+# Copyright (c) 2026, Frappe Technologies Pvt. Ltd. and contributors
+# For license information, please see license.txt
+
+import hashlib
+from datetime import datetime, time
+
+import frappe
+from frappe.model.document import Document
+from frappe.utils import add_days, get_datetime, getdate, now
+
+OWNER_FIELDS = {"CRM Lead": "lead_owner", "CRM Deal": "deal_owner"}
+MEASURES = ("count", "total_value", "value_count", "total_days_to_close", "total_days_to_close_from_lead")
+METRIC_FIELDS = (
+	"name",
+	"creation",
+	"modified",
+	"owner",
+	"modified_by",
+	"date",
+	"based_on",
+	"reference_doctype",
+	"record_owner",
+	"source",
+	"territory",
+	"status",
+	*MEASURES,
+)
+REBUILD_CHUNK_DAYS = 31
+REBUILD_LOCK = "crm_daily_metrics_rebuild"
+
+
+class CRMDailyMetric(Document):
+	pass
+
+
+def on_doctype_update():
+	frappe.db.add_index("CRM Daily Metric", ["reference_doctype", "based_on", "date"])
+
+
+def update_daily_metrics(doc, method=None):
+	"""
+	Move the contribution of a lead/deal in the daily metrics from its previous
+	values to its current ones, hooked on `on_change` and `on_trash`
+
+	:param doc: Lead/Deal that changed
+	:param method: Document event
+	"""
+	previous = getattr(doc, "_daily_metrics", None)
+	if previous is None:
+		previous = {}
+		if method == "on_trash":
+			previous = get_metric_rows(doc)
+		elif not doc.flags.in_insert and doc.get_doc_before_save():
+			previous = get_metric_rows(doc.get_doc_before_save())
+
+	current = {} if method == "on_trash" else get_metric_rows(doc)
+
+	deltas = {}
+	for key in previous.keys() | current.keys():
+		old = previous.get(key, (0,) * len(MEASURES))
+		new = current.get(key, (0,) * len(MEASURES))
+		delta = tuple(n - o for n, o in zip(new, old, strict=True))
+		if any(delta):
+			deltas[key] = delta
+
+	apply_metric_deltas(deltas)
+	# db_set runs `on_change` as well, remember what is in the metrics so
+	# that the next change of this document moves it from here
+	doc._daily_metrics = current
+
+
+def get_metric_rows(doc) -> dict[tuple, tuple]:
+	"""
+	Get the contribution of a lead/deal in the daily metrics
+
+	:param doc: Lead/Deal
+	:return: Measures keyed by `(date, based_on, reference_doctype, record_owner, source, territory, status)`
+	"""
+	dimensions = (
+		doc.get(OWNER_FIELDS[doc.doctype]) or None,
+		doc.get("source") or None,
+		doc.get("territory") or None,
+		doc.get("status") or None,
+	)
+	if doc.doctype == "CRM Lead":
+		return {(getdate(doc.creation), "Created", doc.doctype, *dimensions): (1, 0, 0, 0, 0)}
+
+	# deals without a value are left out of the value averages, as `AVG` skips NULLs
+	exchange_rate = 1 if doc.exchange_rate is None else doc.exchange_rate
+	value = (doc.deal_value or 0) * exchange_rate
+	value_count = 0 if doc.deal_value is None else 1
+	res = {(getdate(doc.creation), "Created", doc.doctype, *dimensions): (1, value, value_count, 0, 0)}
+	if doc.closed_date:
+		closed_on = datetime.combine(getdate(doc.closed_date), time())
+		lead_creation = frappe.db.get_value("CRM Lead", doc.lead, "creation") if doc.lead else None
+		res[(getdate(doc.closed_date), "Closed", doc.doctype, *dimensions)] = (
+			1,
+			value,
+			value_count,
+			get_days_between(doc.creation, closed_on),
+			get_days_between(lead_creation or doc.creation, closed_on),
+		)
+	return res
+
+
+def get_days_between(from_date, to_date) -> int:
+	"""
+	Whole days from `from_date` to `to_date`, as `TIMESTAMPDIFF(DAY, ...)` counts them
+	"""
+	return int((to_date - get_datetime(from_date)).total_seconds() / 86400)
+
+
+def get_metric_name(key: tuple) -> str:
+	"""
+	Name of the metric row for `key`
+	"""
+	return hashlib.md5("|".join(str(value or "") for value in key).encode()).hexdigest()
+
+
+def apply_metric_deltas(deltas: dict[tuple, tuple]):
+	"""
+	Add `deltas` to the metric rows, creating the missing ones and dropping the emptied ones
+
+	:param deltas: Measures to add, keyed like `get_metric_rows`
+	"""
+	if not deltas:
+		return
+
+	timestamp = now()
+	user = frappe.session.user
+	values = []
+	for key, delta in deltas.items():
+		values.append((get_metric_name(key), timestamp, timestamp, user, user, *key, *delta))
+
+	placeholders = ", ".join(["%s"] * len(values[0]))
+	frappe.db.sql(
+		f"""
+		INSERT INTO `tabCRM Daily Metric` ({", ".join(METRIC_FIELDS)})
+		VALUES {", ".join([f"({placeholders})"] * len(values))}
+		ON DUPLICATE KEY UPDATE
+			{", ".join(f"{measure} = {measure} + VALUES({measure})" for measure in MEASURES)},
+			modified = VALUES(modified),
+			modified_by = VALUES(modified_by)
+		""",
+		[value for row in values for value in row],
+	)
+	frappe.db.sql(
+		"DELETE FROM `tabCRM Daily Metric` WHERE name IN %(names)s AND count <= 0",
+		{"names": tuple(row[0] for row in values)},
+	)
+
+
+def rebuild_daily_metrics(chunk_days: int = REBUILD_CHUNK_DAYS, commit: bool = False):
+	"""
+	Rebuild the daily metrics from leads and deals, repairing any drift from changes
+	that bypassed document events (direct SQL, `frappe.db.set_value`, renamed statuses, ...)
+
+	Each chunk of dates is compared with the metric rows in a single statement, so both are
+	read from the same snapshot, and only the differences are added as deltas. Deltas add up
+	in any order, so deals saved meanwhile never wait for the rebuild and are not lost.
+
+	:param chunk_days: Number of days rebuilt at a time
+	:param commit: Commit after each chunk
+	"""
+	# two rebuilds would both add the same differences
+	if not frappe.db.sql("SELECT GET_LOCK(%s, 0)", REBUILD_LOCK)[0][0]:
+		return
+
+	try:
+		from_date, to_date = get_metric_date_range()
+		while from_date and from_date <= to_date:
+			next_date = add_days(from_date, chunk_days)
+			apply_metric_deltas(get_metric_drift(from_date, next_date))
+			if commit:
+				frappe.db.commit()
+			from_date = next_date
+	finally:
+		frappe.db.sql("SELECT RELEASE_LOCK(%s)", REBUILD_LOCK)
+
+
+def rebuild_daily_metrics_in_chunks():
+	"""
+	Rebuild the daily metrics, committing after each chunk, for the scheduler and patches
+	"""
+	rebuild_daily_metrics(commit=True)
+
+
+def get_metric_date_range() -> tuple:
+	"""
+	First and last dates that leads, deals or the metric rows have metrics for
+
+	:return: `(from_date, to_date)`, both `None` when there is nothing to rebuild
+	"""
+	from_date, to_date = frappe.db.sql(
+		"""
+		SELECT MIN(from_date), MAX(to_date)
+		FROM (
+			SELECT DATE(MIN(creation)) AS from_date, DATE(MAX(creation)) AS to_date FROM `tabCRM Lead`
+			UNION ALL
+			SELECT DATE(MIN(creation)), DATE(MAX(creation)) FROM `tabCRM Deal`
+			UNION ALL
+			SELECT MIN(closed_date), MAX(closed_date) FROM `tabCRM Deal`
+			UNION ALL
+			SELECT MIN(date), MAX(date) FROM `tabCRM Daily Metric`
+		) AS bounds
+		"""
+	)[0]
+	return (getdate(from_date), getdate(to_date)) if from_date else (None, None)
+
+
+def get_metric_drift(from_date, to_date) -> dict[tuple, tuple]:
+	"""
+	Get what has to be added to the metric rows from `from_date` up to, but excluding,
+	`to_date` for them to match leads and deals
+
+	:param from_date: First date of the chunk
+	:param to_date: Date after the last one of the chunk
+	:return: Measures to add, keyed like `get_metric_rows`
+	"""
+	rows = frappe.db.sql(
+		f"""
+		SELECT
+			date, based_on, reference_doctype, record_owner, source, territory, status,
+			{", ".join(f"SUM({measure})" for measure in MEASURES)}
+		FROM (
+			SELECT
+				DATE(l.creation) AS date,
+				'Created' AS based_on,
+				'CRM Lead' AS reference_doctype,
+				NULLIF(l.lead_owner, '') AS record_owner,
+				NULLIF(l.source, '') AS source,
+				NULLIF(l.territory, '') AS territory,
+				NULLIF(l.status, '') AS status,
+				COUNT(*) AS count,
+				0 AS total_value,
+				0 AS value_count,
+				0 AS total_days_to_close,
+				0 AS total_days_to_close_from_lead
+			FROM `tabCRM Lead` l
+			WHERE l.creation >= %(from_date)s AND l.creation < %(to_date)s
+			GROUP BY 1, 4, 5, 6, 7
+
+			UNION ALL
+
+			SELECT
+				DATE(d.creation) AS date,
+				'Created' AS based_on,
+				'CRM Deal' AS reference_doctype,
+				NULLIF(d.deal_owner, '') AS record_owner,
+				NULLIF(d.source, '') AS source,
+				NULLIF(d.territory, '') AS territory,
+				NULLIF(d.status, '') AS status,
+				COUNT(*) AS count,
+				SUM(COALESCE(d.deal_value, 0) * IFNULL(d.exchange_rate, 1)) AS total_value,
+				COUNT(d.deal_value) AS value_count,
+				0 AS total_days_to_close,
+				0 AS total_days_to_close_from_lead
+			FROM `tabCRM Deal` d
+			WHERE d.creation >= %(from_date)s AND d.creation < %(to_date)s
+			GROUP BY 1, 4, 5, 6, 7
+
+			UNION ALL
+
+			SELECT
+				d.closed_date AS date,
+				'Closed' AS based_on,
+				'CRM Deal' AS reference_doctype,
+				NULLIF(d.deal_owner, '') AS record_owner,
+				NULLIF(d.source, '') AS source,
+				NULLIF(d.territory, '') AS territory,
+				NULLIF(d.status, '') AS status,
+				COUNT(*) AS count,
+				SUM(COALESCE(d.deal_value, 0) * IFNULL(d.exchange_rate, 1)) AS total_value,
+				COUNT(d.deal_value) AS value_count,
+				SUM(TIMESTAMPDIFF(DAY, d.creation, d.closed_date)) AS total_days_to_close,
+				SUM(TIMESTAMPDIFF(DAY, COALESCE(l.creation, d.creation), d.closed_date))
+					AS total_days_to_close_from_lead
+			FROM `tabCRM Deal` d
+			LEFT JOIN `tabCRM Lead` l ON d.lead = l.name
+			WHERE d.closed_date >= %(from_date)s AND d.closed_date < %(to_date)s
+			GROUP BY 1, 4, 5, 6, 7
+
+			UNION ALL
+
+			SELECT
+				date, based_on, reference_doctype, record_owner, source, territory, status,
+				{", ".join(f"-{measure}" for measure in MEASURES)}
+			FROM `tabCRM Daily Metric`
+			WHERE date >= %(from_date)s AND date < %(to_date)s
+		) AS metrics
+		GROUP BY date, based_on, reference_doctype, record_owner, source, territory, status
+		HAVING {" OR ".join(f"SUM({measure}) <> 0" for measure in MEASURES)}
+		""",
+		{"from_date": from_date, "to_date": to_date},
+	)
+	return {tuple(row[:7]): tuple(row[7:]) for row in rows}
@@ -0,0 +1,48 @@
+# Copyright (c) 2026, Frappe Technologies Pvt. Ltd. and Contributors
+# See license.txt
+
+import frappe
+from frappe.tests import IntegrationTestCase
+
+from crm.fcrm.doctype.crm_daily_metric.crm_daily_metric import rebuild_daily_metrics
+
+
+def get_metrics():
+	return {
+		row.name: (row.count, round(row.total_value, 2), row.value_count)
+		for row in frappe.get_all("CRM Daily Metric", fields=["name", "count", "total_value", "value_count"])
+	}
+
+
+class IntegrationTestCRMDailyMetric(IntegrationTestCase):
+	def assertMetricsMatchRebuild(self):
+		incremental = get_metrics()
+		rebuild_daily_metrics()
+		self.assertEqual(incremental, get_metrics())
+
+	def test_metrics_follow_lead_changes(self):
+		rebuild_daily_metrics()
+
+		lead = frappe.get_doc({"doctype": "CRM Lead", "first_name": "Metric Lead", "status": "New"}).insert()
+		self.assertMetricsMatchRebuild()
+
+		lead.status = "Contacted"
+		lead.save()
+		self.assertMetricsMatchRebuild()
+
+		lead.db_set("status", "Qualified")
+		self.assertMetricsMatchRebuild()
+
+		lead.delete()
+		self.assertMetricsMatchRebuild()
+
+	def test_rebuild_repairs_drift(self):
+		rebuild_daily_metrics()
+		lead = frappe.get_doc({"doctype": "CRM Lead", "first_name": "Drifted Lead", "status": "New"}).insert()
+		frappe.db.set_value("CRM Lead", lead.name, "status", "Qualified", update_modified=False)
+
+		rebuild_daily_metrics(chunk_days=1)
+		repaired = get_metrics()
+		frappe.db.delete("CRM Daily Metric")
+		rebuild_daily_metrics()
+		self.assertEqual(repaired, get_metrics())
@@ -1,9 +1,18 @@
 # Copyright (c) 2025, Frappe Technologies Pvt. Ltd. and Contributors
 # See license.txt
 
-# import frappe
+from datetime import date
+from unittest.mock import patch
+
+import frappe
 from frappe.tests import IntegrationTestCase, UnitTestCase
 
+from crm.api.dashboard import (
+	evaluate_charts,
+	evict_dashboard_cache,
+	get_charts,
+	get_date_range_cond,
+)
 
 # On IntegrationTestCase, the doctype test records and all
 # link-field test record dependencies are recursively loaded
@@ -12,6 +21,10 @@ EXTRA_TEST_RECORD_DEPENDENCIES = []  # eg. ["User"]
 IGNORE_TEST_RECORD_DEPENDENCIES = []  # eg. ["User"]
 
 
+def explain(query, values):
+	return frappe.db.sql(f"EXPLAIN {query}", values, as_dict=True)[0]
+
+
 class UnitTestCRMDashboard(UnitTestCase):
 	"""
 	Unit tests for CRMDashboard.
@@ -27,4 +40,63 @@ class IntegrationTestCRMDashboard(IntegrationTestCase):
 	Use this class for testing interactions between multiple components.
 	"""
 
-	pass
+	def test_failing_chart_does_not_fail_dashboard(self):
+		with patch("crm.api.dashboard.get_won_deals", side_effect=frappe.QueryTimeoutError):
+			charts = evaluate_charts(
+				["total_leads", "won_deals", "spacer"], "2024-01-01", "2024-01-31", "Administrator"
+			)
+
+		self.assertEqual(set(charts), {"total_leads", "won_deals"})
+		self.assertIn("error", charts["won_deals"])
+		self.assertEqual(charts["total_leads"]["title"], "Total leads")
+
+	def test_charts_are_evaluated_on_worker_connections(self):
+		names = ["total_leads", "ongoing_deals", "won_deals", "average_deal_value", "sales_trend"]
+		# workers don't see the uncommitted data of the test transaction, only compare the titles
+		serial = evaluate_charts(names, "2024-01-01", "2024-01-31", "Administrator")
+
+		with (
+			patch.object(frappe.flags, "in_test", False),
+			patch.dict(frappe.conf, {"crm_dashboard_workers": 2}),
+			patch("frappe.connect", wraps=frappe.connect) as connect,
+		):
+			for _ in range(2):
+				charts = evaluate_charts(names, "2024-01-01", "2024-01-31", "Administrator")
+				self.assertEqual(
+					{name: chart.get("title") for name, chart in charts.items()},
+					{name: chart.get("title") for name, chart in serial.items()},
+				)
+				for chart in charts.values():
+					self.assertNotIn("error", chart)
+
+		# the pool and its connections are kept across requests
+		self.assertLessEqual(connect.call_count, 2)
+		self.assertTrue(frappe.db.sql("SELECT 1"))
+
+	def test_cached_charts_are_evicted_by_date(self):
+		evict_dashboard_cache()
+		january = get_charts(["total_leads"], "2024-01-01", "2024-01-31")["total_leads"]
+		june = get_charts(["total_leads"], "2024-06-01", "2024-06-30")["total_leads"]
+		self.assertIn("computed_at", january)
+
+		evict_dashboard_cache({date(2024, 1, 15)})
+
+		def recompute(names, *args):
+			return {name: {"error": "recomputed"} for name in names}
+
+		with patch("crm.api.dashboard.evaluate_charts", side_effect=recompute) as evaluate:
+			self.assertEqual(get_charts(["total_leads"], "2024-06-01", "2024-06-30")["total_leads"], june)
+			january = get_charts(["total_leads"], "2024-01-01", "2024-01-31")["total_leads"]
+		self.assertEqual(january["error"], "recomputed")
+		self.assertEqual(evaluate.call_args_list[0].args[0], [])
+		self.assertEqual(evaluate.call_args_list[1].args[0], ["total_leads"])
+
+	def test_date_range_predicates_can_use_indexes(self):
+		values = {"from": "2024-01-01", "to": "2024-12-31"}
+		query = "SELECT name FROM `tabCRM Deal` d WHERE {}"
+		by_day = explain(query.format("DATE(d.expected_closure_date) BETWEEN %(from)s AND %(to)s"), values)
+		half_open = explain(query.format(get_date_range_cond("d.expected_closure_date")), values)
+
+		# the plans show `type` ALL for the former and range for the latter on a populated table
+		self.assertNotIn("expected_closure_date_index", by_day.possible_keys or "")
+		self.assertIn("expected_closure_date_index", half_open.possible_keys or "")
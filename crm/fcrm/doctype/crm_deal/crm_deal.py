@@ -9,6 +9,7 @@ from frappe.model.document import Document
 from crm.fcrm.doctype.crm_service_level_agreement.utils import get_sla
 from crm.fcrm.doctype.crm_status_change_log.crm_status_change_log import add_status_change_log
 from crm.fcrm.doctype.fcrm_settings.fcrm_settings import get_exchange_rate
+from crm.utils import normalize_phone_number
 
 
 class CRMDeal(Document):
@@ -18,6 +19,7 @@ class CRMDeal(Document):
 	def validate(self):
 		self.set_primary_contact()
 		self.set_primary_email_mobile_no()
+		self.mobile_no_normalized = normalize_phone_number(self.mobile_no)
 		if not self.is_new() and self.has_value_changed("deal_owner") and self.deal_owner:
 			self.share_with_agent(self.deal_owner)
 			self.assign_agent(self.deal_owner)
@@ -133,9 +135,8 @@ class CRMDeal(Document):
 		"""
 		if not self.sla:
 			return
-		sla = frappe.get_last_doc("CRM Service Level Agreement", {"name": self.sla})
-		if sla:
-			sla.apply(self)
+		sla = frappe.get_cached_doc("CRM Service Level Agreement", self.sla)
+		sla.apply(self)
 
 	def update_closed_date(self):
 		"""
@@ -254,6 +255,13 @@ class CRMDeal(Document):
 		}
 
 
+def on_doctype_update():
+	# the forecast chart reads deals by expected closure date
+	frappe.db.add_index("CRM Deal", ["expected_closure_date"])
+	# the overdue SLA sweep scans deals by status and response target
+	frappe.db.add_index("CRM Deal", ["sla_status", "response_by"])
+
+
 @frappe.whitelist()
 def add_contact(deal, contact):
 	if not frappe.has_permission("CRM Deal", "write", deal):
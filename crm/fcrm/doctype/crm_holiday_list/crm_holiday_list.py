@@ -4,6 +4,14 @@
 # import frappe
 from frappe.model.document import Document
 
+from crm.fcrm.doctype.crm_service_level_agreement.crm_service_level_agreement import (
+	clear_business_calendar_cache,
+)
+
 
 class CRMHolidayList(Document):
-	pass
+	def on_update(self):
+		clear_business_calendar_cache()
+
+	def on_trash(self):
+		clear_business_calendar_cache()
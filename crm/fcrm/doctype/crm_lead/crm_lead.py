@@ -11,6 +11,7 @@ from crm.fcrm.doctype.crm_service_level_agreement.utils import get_sla
 from crm.fcrm.doctype.crm_status_change_log.crm_status_change_log import (
 	add_status_change_log,
 )
+from crm.utils import get_national_phone_number, normalize_phone_number
 
 
 class CRMLead(Document):
@@ -22,6 +23,8 @@ class CRMLead(Document):
 		self.set_lead_name()
 		self.set_title()
 		self.validate_email()
+		self.mobile_no_normalized = normalize_phone_number(self.mobile_no)
+		self.mobile_no_national = get_national_phone_number(self.mobile_no)
 		if not self.is_new() and self.has_value_changed("lead_owner") and self.lead_owner:
 			self.share_with_agent(self.lead_owner)
 			self.assign_agent(self.lead_owner)
@@ -314,9 +317,8 @@ class CRMLead(Document):
 		"""
 		if not self.sla:
 			return
-		sla = frappe.get_last_doc("CRM Service Level Agreement", {"name": self.sla})
-		if sla:
-			sla.apply(self)
+		sla = frappe.get_cached_doc("CRM Service Level Agreement", self.sla)
+		sla.apply(self)
 
 	def convert_to_deal(self, deal=None):
 		return convert_to_deal(lead=self.name, doc=self, deal=deal)
@@ -400,6 +402,11 @@ class CRMLead(Document):
 		}
 
 
+def on_doctype_update():
+	# the overdue SLA sweep scans leads by status and response target
+	frappe.db.add_index("CRM Lead", ["sla_status", "response_by"])
+
+
 @frappe.whitelist()
 def convert_to_deal(lead, doc=None, deal=None, existing_contact=None, existing_organization=None):
 	if not (doc and doc.flags.get("ignore_permissions")) and not frappe.has_permission(
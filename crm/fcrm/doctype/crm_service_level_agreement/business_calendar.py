@@ -0,0 +1,169 @@
+from bisect import bisect_left
+from datetime import date, datetime, timedelta
+
+
+class BusinessCalendar:
+	"""
+	Working time arithmetic over weekly working hours and holidays.
+
+	Time is counted by intersecting whole days with the working windows of
+	their weekday, so the cost depends on the number of weeks (and holidays)
+	in a span rather than on its length in seconds.
+	"""
+
+	def __init__(self, working_hours: dict[int, list[tuple[float, float]]], holidays=None):
+		"""
+		:param working_hours: Working windows per weekday (Monday is 0), as
+		        `(start, end)` offsets in seconds since midnight
+		:param holidays: Dates on which no time is counted
+		"""
+		self.windows = tuple(merge_windows(working_hours.get(weekday, [])) for weekday in range(7))
+		self.day_seconds = tuple(sum(end - start for start, end in windows) for windows in self.windows)
+		self.week_seconds = sum(self.day_seconds)
+		# working seconds from the start of the week up to each weekday, over two
+		# weeks so that any run of up to 7 days starting on any weekday is one lookup
+		self.week_offsets = [0]
+		for i in range(14):
+			self.week_offsets.append(self.week_offsets[-1] + self.day_seconds[i % 7])
+
+		self.holidays = frozenset(holidays or [])
+		# only holidays falling on a working weekday take time away, running totals
+		# of their seconds let any date range be discounted with two bisections
+		self.sorted_holidays = sorted(day for day in self.holidays if self.day_seconds[day.weekday()])
+		self.holiday_offsets = [0]
+		for day in self.sorted_holidays:
+			self.holiday_offsets.append(self.holiday_offsets[-1] + self.day_seconds[day.weekday()])
+
+	def is_working_day(self, day: date) -> bool:
+		return bool(self.day_seconds[day.weekday()]) and day not in self.holidays
+
+	def get_day_seconds(self, day: date) -> float:
+		"""
+		Return working seconds available on `day`
+		"""
+		if day in self.holidays:
+			return 0
+		return self.day_seconds[day.weekday()]
+
+	def get_seconds_before(self, day: date, offset: float) -> float:
+		"""
+		Return working seconds on `day` between midnight and `offset` seconds
+		"""
+		if day in self.holidays:
+			return 0
+		res = 0
+		for start, end in self.windows[day.weekday()]:
+			if offset <= start:
+				break
+			res += min(end, offset) - start
+		return res
+
+	def get_seconds_between_days(self, from_day: date, to_day: date) -> float:
+		"""
+		Return working seconds on all days from `from_day` up to, but excluding, `to_day`
+		"""
+		days = (to_day - from_day).days
+		if days <= 0:
+			return 0
+
+		weeks, extra_days = divmod(days, 7)
+		first_weekday = from_day.weekday()
+		res = weeks * self.week_seconds
+		res += self.week_offsets[first_weekday + extra_days] - self.week_offsets[first_weekday]
+
+		if self.sorted_holidays:
+			first = bisect_left(self.sorted_holidays, from_day)
+			last = bisect_left(self.sorted_holidays, to_day, first)
+			res -= self.holiday_offsets[last] - self.holiday_offsets[first]
+		return res
+
+	def get_elapsed_seconds(self, start: datetime, end: datetime) -> float:
+		"""
+		Return working seconds between `start` and `end`
+
+		:param start: Datetime at which calculation starts
+		:param end: Datetime at which calculation ends
+		:return: Number of seconds
+		"""
+		if end <= start:
+			return 0
+
+		start_day, end_day = start.date(), end.date()
+		start_offset = get_offset(start)
+		end_offset = get_offset(end)
+		if start_day == end_day:
+			return self.get_seconds_before(end_day, end_offset) - self.get_seconds_before(
+				start_day, start_offset
+			)
+
+		res = self.get_day_seconds(start_day) - self.get_seconds_before(start_day, start_offset)
+		res += self.get_seconds_between_days(start_day + timedelta(days=1), end_day)
+		res += self.get_seconds_before(end_day, end_offset)
+		return res
+
+	def add_seconds(self, start: datetime, seconds: float) -> datetime | None:
+		"""
+		Return the datetime at which `seconds` of working time have passed since `start`
+
+		:param start: Datetime at which calculation starts
+		:param seconds: Working seconds to add
+		:return: Resulting datetime, `None` if the calendar has no working time
+		"""
+		if not seconds or seconds <= 0:
+			return start
+		if not self.week_seconds:
+			return None
+
+		day = start.date()
+		offset = get_offset(start)
+		remaining = seconds
+		while True:
+			if day not in self.holidays:
+				for window_start, window_end in self.windows[day.weekday()]:
+					if window_end <= offset:
+						continue
+					window_start = max(window_start, offset)
+					available = window_end - window_start
+					if remaining <= available:
+						return get_midnight(day) + timedelta(seconds=window_start + remaining)
+					remaining -= available
+
+			day += timedelta(days=1)
+			offset = 0
+
+			# skip whole weeks that are used up entirely
+			while True:
+				next_week = day + timedelta(days=7)
+				week_seconds = self.get_seconds_between_days(day, next_week)
+				if remaining <= week_seconds:
+					break
+				remaining -= week_seconds
+				day = next_week
+
+
+def merge_windows(windows: list[tuple[float, float]]) -> tuple[tuple[float, float], ...]:
+	"""
+	Sort `windows` and merge the overlapping ones, dropping empty ones
+	"""
+	res = []
+	for start, end in sorted(windows):
+		if end <= start:
+			continue
+		if res and start <= res[-1][1]:
+			res[-1] = (res[-1][0], max(res[-1][1], end))
+		else:
+			res.append((start, end))
+	return tuple(res)
+
+
+def get_midnight(day: date) -> datetime:
+	return datetime(day.year, day.month, day.day)
+
+
+def get_offset(date_time: datetime) -> float:
+	"""
+	Return seconds passed since midnight at `date_time`
+	"""
+	return (
+		date_time.hour * 3600 + date_time.minute * 60 + date_time.second + date_time.microsecond / 1_000_000
+	)
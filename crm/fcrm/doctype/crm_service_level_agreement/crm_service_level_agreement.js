@@ -2,6 +2,28 @@
 // For license information, please see license.txt
 
 frappe.ui.form.on("CRM Service Level Agreement", {
+	refresh(frm) {
+		if (frm.is_new()) return;
+		frm.add_custom_button(__("Recompute SLA"), () => {
+			frappe.confirm(
+				__(
+					"Recompute response targets and SLA status of all leads and deals using this SLA?"
+				),
+				() => {
+					frappe.call({
+						method: "crm.fcrm.doctype.crm_service_level_agreement.recompute.enqueue_sla_recompute",
+						args: { sla: frm.doc.name },
+						callback: (r) => {
+							frappe.show_alert({
+								message: __("Recomputing SLA for {0} documents", [r.message.total]),
+								indicator: "green",
+							});
+						},
+					});
+				}
+			);
+		});
+	},
 	validate(frm) {
 		let default_priority_count = 0;
 		frm.doc.priorities.forEach(function (row) {
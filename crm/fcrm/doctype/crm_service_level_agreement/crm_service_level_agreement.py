@@ -3,17 +3,21 @@
 
 import frappe
 from frappe import _
-from datetime import timedelta
 from frappe.model.document import Document
 from frappe.utils import (
-	add_to_date,
 	get_datetime,
 	get_weekdays,
 	getdate,
 	now_datetime,
-	time_diff_in_seconds,
+	to_timedelta,
 )
-from crm.fcrm.doctype.crm_service_level_agreement.utils import get_context
+
+from crm.api.doc import clear_list_count_cache_for
+from crm.fcrm.doctype.crm_service_level_agreement.business_calendar import BusinessCalendar
+from crm.fcrm.doctype.crm_service_level_agreement.utils import clear_sla_rules_cache, get_context
+
+BUSINESS_CALENDAR_CACHE_KEY = "crm:sla_business_calendar"
+SLA_STATUS_CHUNK_SIZE = 10000
 
 
 class CRMServiceLevelAgreement(Document):
@@ -21,6 +25,14 @@ class CRMServiceLevelAgreement(Document):
 		self.validate_default()
 		self.validate_condition()
 
+	def on_update(self):
+		clear_business_calendar_cache()
+		clear_sla_rules_cache()
+
+	def on_trash(self):
+		clear_business_calendar_cache()
+		clear_sla_rules_cache()
+
 	def validate_default(self):
 		if self.default:
 			other_slas = frappe.get_all(
@@ -52,6 +64,30 @@ class CRMServiceLevelAgreement(Document):
 		self.handle_targets(doc)
 		self.handle_sla_status(doc)
 
+	def get_sla_values(self, doc) -> frappe._dict:
+		"""
+		Recompute SLA fields of `doc` under the current rules without changing it
+
+		:param doc: Lead/Deal or a row with its SLA fields
+		:return: `response_by`, `first_response_time` and `sla_status`
+		"""
+		row = frappe._dict(
+			sla_creation=doc.sla_creation,
+			communication_status=doc.communication_status,
+			first_responded_on=doc.first_responded_on,
+			first_response_time=doc.first_response_time,
+		)
+		self.set_response_by(row)
+		# keep the old target if the status has no priority under the current rules
+		row.response_by = row.response_by or doc.response_by
+		self.set_first_response_time(row)
+		self.handle_sla_status(row)
+		return frappe._dict(
+			response_by=row.response_by,
+			first_response_time=row.first_response_time,
+			sla_status=row.sla_status,
+		)
+
 	def handle_creation(self, doc: Document):
 		doc.sla_creation = doc.sla_creation or now_datetime()
 
@@ -112,34 +148,14 @@ class CRMServiceLevelAgreement(Document):
 		start_at: str,
 		duration_seconds: int,
 	):
-		res = get_datetime(start_at)
-		time_needed = duration_seconds
-		holidays = self.get_holidays()
-		weekdays = get_weekdays()
-		workdays = self.get_workdays()
-		while time_needed:
-			today = res
-			today_day = getdate(today)
-			today_weekday = weekdays[today.weekday()]
-			is_workday = today_weekday in workdays
-			is_holiday = today_day in holidays
-			if is_holiday or not is_workday:
-				res = add_to_date(res, days=1, as_datetime=True)
-				continue
-			today_workday = workdays[today_weekday]
-			now_in_seconds = time_diff_in_seconds(today, today_day)
-			start_time = max(today_workday.start_time.total_seconds(), now_in_seconds)
-			till_start_time = max(start_time - now_in_seconds, 0)
-			end_time = max(today_workday.end_time.total_seconds(), now_in_seconds)
-			time_left = max(end_time - start_time, 0)
-			if not time_left:
-				res = getdate(add_to_date(res, days=1, as_datetime=True))
-				continue
-			time_taken = min(time_needed, time_left)
-			time_needed -= time_taken
-			time_required = till_start_time + time_taken
-			res = add_to_date(res, seconds=time_required, as_datetime=True)
-		return res
+		"""
+		Get the time at which `duration_seconds` of working time have passed since `start_at`
+
+		:param start_at: Date at which calculation starts
+		:param duration_seconds: Working time to add, in seconds
+		:return: Resulting datetime, `None` if there are no working hours
+		"""
+		return self.get_business_calendar().add_seconds(get_datetime(start_at), duration_seconds)
 
 	def calc_elapsed_time(self, start_time, end_time) -> float:
 		"""
@@ -149,25 +165,37 @@ class CRMServiceLevelAgreement(Document):
 		:param end_at: Date at which calculation ends
 		:return: Number of seconds
 		"""
-		start_time = get_datetime(start_time)
-		end_time = get_datetime(end_time)
-		holiday_list = []
-		working_day_list = self.get_working_days()
-		working_hours = self.get_working_hours()
+		return self.get_business_calendar().get_elapsed_seconds(
+			get_datetime(start_time), get_datetime(end_time)
+		)
 
-		total_seconds = 0
-		current_time = start_time
+	def get_business_calendar(self) -> BusinessCalendar:
+		"""
+		Return compiled calendar for this SLA, cached until the SLA or its holiday list changes
+		"""
+		return frappe.cache.hget(
+			BUSINESS_CALENDAR_CACHE_KEY,
+			f"{self.name}:{self.modified}",
+			generator=self.build_business_calendar,
+		)
 
-		while current_time < end_time:
-			in_holiday_list = current_time.date() in holiday_list
-			not_in_working_day_list = get_weekdays()[current_time.weekday()] not in working_day_list
-			if in_holiday_list or not_in_working_day_list or not self.is_working_time(current_time, working_hours):
-				current_time += timedelta(seconds=1)
+	def build_business_calendar(self) -> BusinessCalendar:
+		"""
+		Return calendar built from working hours and holidays
+		"""
+		weekdays = get_weekdays()
+		working_hours = {}
+		for row in self.working_hours:
+			if row.workday not in weekdays or not row.end_time:
 				continue
-			total_seconds += 1
-			current_time += timedelta(seconds=1)
-
-		return total_seconds
+			working_hours.setdefault(weekdays.index(row.workday), []).append(
+				(
+					to_timedelta(row.start_time or "00:00:00").total_seconds(),
+					to_timedelta(row.end_time).total_seconds(),
+				)
+			)
+		holidays = {getdate(d) for d in self.get_holidays()}
+		return BusinessCalendar(working_hours, holidays)
 
 	def get_priorities(self):
 		"""
@@ -197,29 +225,73 @@ class CRMServiceLevelAgreement(Document):
 			res[row.workday] = row
 		return res
 
-	def get_working_days(self) -> dict[str, dict]:
-		workdays = []
-		for row in self.working_hours:
-			workdays.append(row.workday)
-		return workdays
-
-	def get_working_hours(self) -> dict[str, dict]:
-		res = {}
-		for row in self.working_hours:
-			res[row.workday] = (row.start_time, row.end_time)
-		return res
-
-	def is_working_time(self, date_time, working_hours):
-		day_of_week = get_weekdays()[date_time.weekday()]
-		start_time, end_time = working_hours.get(day_of_week, (0, 0))
-		date_time = timedelta(hours=date_time.hour, minutes=date_time.minute, seconds=date_time.second)
-		return start_time <= date_time < end_time
-
 	def get_holidays(self):
 		res = []
 		if not self.holiday_list:
 			return res
-		holiday_list = frappe.get_doc("CRM Holiday List", self.holiday_list)
+		holiday_list = frappe.get_cached_doc("CRM Holiday List", self.holiday_list)
 		for row in holiday_list.holidays:
 			res.append(row.date)
 		return res
+
+
+def clear_business_calendar_cache():
+	frappe.cache.delete_value(BUSINESS_CALENDAR_CACHE_KEY)
+
+
+def update_failed_sla_status():
+	"""
+	Mark the SLA of leads and deals which missed their first response as failed.
+	Runs as a scheduled job so that lists filtered on SLA status stay current
+	without the documents having to be saved.
+	"""
+	now = now_datetime()
+	res = {}
+	for doctype in ("CRM Lead", "CRM Deal"):
+		count = set_sla_status_failed(doctype, now)
+		if count:
+			res[doctype] = count
+
+	if res:
+		frappe.publish_realtime("crm_sla_status_updated", res)
+	return res
+
+
+def set_sla_status_failed(doctype: str, now, chunk_size: int = SLA_STATUS_CHUNK_SIZE) -> int:
+	"""
+	Set `sla_status` to Failed in chunks of `chunk_size` for all overdue open records of `doctype`.
+	Converted leads and won or lost deals are closed and keep their status.
+
+	:return: Number of updated records
+	"""
+	table = frappe.qb.DocType(doctype)
+	if doctype == "CRM Lead":
+		is_open = table.converted == 0
+	else:
+		status = frappe.qb.DocType("CRM Deal Status")
+		closed = frappe.qb.from_(status).select(status.name).where(status.type.isin(["Won", "Lost"]))
+		is_open = table.status.notin(closed)
+
+	count = 0
+	while True:
+		names = (
+			frappe.qb.from_(table)
+			.select(table.name)
+			.where(table.sla_status == "First Response Due")
+			.where(table.response_by < now)
+			.where(table.first_responded_on.isnull())
+			.where(is_open)
+			.limit(chunk_size)
+		).run(pluck=True)
+		if not names:
+			break
+
+		frappe.qb.update(table).set(table.sla_status, "Failed").where(table.name.isin(names)).run()
+		clear_list_count_cache_for(doctype)
+		count += len(names)
+		if not frappe.flags.in_test:
+			frappe.db.commit()
+
+		if len(names) < chunk_size:
+			break
+	return count
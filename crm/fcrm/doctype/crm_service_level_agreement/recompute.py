@@ -0,0 +1,196 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import frappe
+from frappe.utils import cint, get_datetime
+
+from crm.api.doc import clear_list_count_cache_for
+
+SLA_DOCTYPES = ("CRM Lead", "CRM Deal")
+SLA_FIELDS = [
+	"name",
+	"sla_creation",
+	"communication_status",
+	"first_responded_on",
+	"first_response_time",
+	"response_by",
+	"sla_status",
+]
+CHUNK_SIZE = 1000
+
+
+@frappe.whitelist()
+def enqueue_sla_recompute(sla: str, restart: bool = False):
+	"""
+	Recompute SLA fields of all leads and deals using `sla` in background jobs,
+	one job per chunk so that the work is spread across the workers of the long queue
+
+	:param sla: Name of the Service Level Agreement
+	:param restart: Ignore progress saved by an earlier, interrupted run
+	:return: Progress of the recompute
+	"""
+	frappe.only_for(["System Manager", "Sales Manager"])
+	frappe.get_doc("CRM Service Level Agreement", sla).check_permission("write")
+
+	for doctype, after, names in get_pending_chunks(sla, restart=cint(restart)):
+		frappe.enqueue(
+			recompute_chunk,
+			queue="long",
+			sla=sla,
+			doctype=doctype,
+			names=names,
+			after=after,
+		)
+	return get_sla_recompute_progress(sla)
+
+
+@frappe.whitelist()
+def get_sla_recompute_progress(sla: str) -> dict:
+	"""
+	Get progress of the recompute of `sla`
+
+	:param sla: Name of the Service Level Agreement
+	:return: Total and completed number of documents
+	"""
+	progress = frappe.cache.hgetall(get_progress_key(sla)) or {}
+	total = cint(progress.get("total"))
+	# completed chunks are stored as `(last name, count)` next to the total
+	done = sum(cint(value[1]) for value in progress.values() if isinstance(value, tuple))
+	return {"total": total, "done": done}
+
+
+def recompute_sla(
+	site: str,
+	sla: str,
+	processes: int | None = None,
+	chunk_size: int = CHUNK_SIZE,
+	restart: bool = False,
+	progress_callback=None,
+) -> int:
+	"""
+	Recompute SLA fields of all leads and deals using `sla` on a pool of processes.
+	Completed chunks are remembered by the names they span, so an interrupted run resumes where it
+	stopped even if documents were added or removed in between.
+
+	:param site: Site to connect to in the worker processes
+	:param sla: Name of the Service Level Agreement
+	:param processes: Size of the process pool, defaults to the number of CPUs
+	:param chunk_size: Number of documents handled in one go by a worker
+	:param restart: Ignore progress saved by an earlier, interrupted run
+	:param progress_callback: Called with the progress after every chunk
+	:return: Number of documents recomputed in this run
+	"""
+	chunks = get_pending_chunks(sla, chunk_size=chunk_size, restart=restart)
+	progress = get_sla_recompute_progress(sla)
+
+	res = 0
+	if not chunks:
+		frappe.cache.delete_value(get_progress_key(sla))
+		return res
+
+	context = multiprocessing.get_context("spawn")
+	with ProcessPoolExecutor(
+		processes, mp_context=context, initializer=init_worker, initargs=(site,)
+	) as pool:
+		futures = [
+			pool.submit(recompute_chunk, sla, doctype, names, after) for doctype, after, names in chunks
+		]
+		for future in as_completed(futures):
+			res += future.result()
+			if progress_callback:
+				progress_callback({"total": progress["total"], "done": progress["done"] + res})
+	return res
+
+
+def init_worker(site: str):
+	frappe.init(site)
+	frappe.connect()
+
+
+def get_pending_chunks(sla: str, chunk_size: int = CHUNK_SIZE, restart: bool = False) -> list[tuple]:
+	"""
+	Split documents using `sla` into chunks by name, leaving out the name ranges completed by an
+	earlier run
+
+	:return: List of `(doctype, after, names)`, `names` being the ones following `after`
+	"""
+	key = get_progress_key(sla)
+	if restart:
+		frappe.cache.delete_value(key)
+	progress = frappe.cache.hgetall(key) or {}
+
+	chunks = []
+	total = 0
+	for doctype in SLA_DOCTYPES:
+		filters = {"sla": sla, "sla_creation": ["is", "set"]}
+		total += frappe.db.count(doctype, filters)
+
+		after = ""
+		while True:
+			# skip the names up to the end of a completed chunk
+			if completed := progress.get(get_chunk_key(doctype, after)):
+				after = completed[0]
+				continue
+
+			names = frappe.get_all(
+				doctype,
+				filters={**filters, "name": [">", after]},
+				order_by="name asc",
+				limit=chunk_size,
+				pluck="name",
+			)
+			if not names:
+				break
+			chunks.append((doctype, after, names))
+			after = names[-1]
+
+	frappe.cache.hset(key, "total", total)
+	return chunks
+
+
+def recompute_chunk(sla: str, doctype: str, names: list[str], after: str = "") -> int:
+	"""
+	Recompute SLA fields for `names` and write back the changed ones in bulk,
+	without saving each document. The chunk is recorded as done from `after` to the last name.
+
+	:return: Number of documents recomputed
+	"""
+	agreement = frappe.get_cached_doc("CRM Service Level Agreement", sla)
+	rows = frappe.get_all(doctype, filters={"name": ["in", names]}, fields=SLA_FIELDS)
+
+	updates = {}
+	for row in rows:
+		values = agreement.get_sla_values(row)
+		if has_changed(row, values):
+			updates[row.name] = values
+
+	if updates:
+		frappe.db.bulk_update(doctype, updates, chunk_size=500, update_modified=False)
+		clear_list_count_cache_for(doctype)
+	frappe.db.commit()
+
+	key = get_progress_key(sla)
+	frappe.cache.hset(key, get_chunk_key(doctype, after), (names[-1], len(rows)))
+	progress = get_sla_recompute_progress(sla)
+	if progress["done"] >= progress["total"]:
+		# all chunks are through, the next run starts afresh
+		frappe.cache.delete_value(key)
+	return len(rows)
+
+
+def has_changed(row: dict, values: dict) -> bool:
+	if row.sla_status != values.sla_status:
+		return True
+	if (row.first_response_time or 0) != (values.first_response_time or 0):
+		return True
+	if bool(row.response_by) != bool(values.response_by):
+		return True
+	return bool(values.response_by) and get_datetime(row.response_by) != get_datetime(values.response_by)
+
+
+def get_progress_key(sla: str) -> str:
+	return f"crm:sla_recompute:{sla}"
+
+
+def get_chunk_key(doctype: str, after: str) -> str:
+	return f"{doctype}:{after}"
@@ -1,9 +1,188 @@
 # Copyright (c) 2023, Frappe Technologies Pvt. Ltd. and Contributors
 # See license.txt
 
-# import frappe
-from frappe.tests import UnitTestCase
+import timeit
+from datetime import date, datetime, timedelta
+
+import frappe
+from frappe.tests import IntegrationTestCase, UnitTestCase
+from frappe.utils import add_to_date, now_datetime
+
+from crm.fcrm.doctype.crm_service_level_agreement.business_calendar import BusinessCalendar
+from crm.fcrm.doctype.crm_service_level_agreement.crm_service_level_agreement import (
+	update_failed_sla_status,
+)
+from crm.fcrm.doctype.crm_service_level_agreement.recompute import (
+	get_chunk_key,
+	get_pending_chunks,
+	get_progress_key,
+)
+
+HOUR = 3600
+
+# Monday to Friday 09:00 - 17:00, with a lunch break on Wednesday
+WORKING_HOURS = {
+	0: [(9 * HOUR, 17 * HOUR)],
+	1: [(9 * HOUR, 17 * HOUR)],
+	2: [(9 * HOUR, 13 * HOUR), (14 * HOUR, 17 * HOUR)],
+	3: [(9 * HOUR, 17 * HOUR)],
+	4: [(9 * HOUR, 17 * HOUR)],
+}
+HOLIDAYS = {date(2024, 1, 1), date(2024, 1, 26)}
+
+
+def walk_elapsed_seconds(start, end):
+	"""Reference implementation, counting one second at a time"""
+	res = 0
+	current = start
+	while current < end:
+		offset = (current - datetime.combine(current.date(), datetime.min.time())).total_seconds()
+		windows = WORKING_HOURS.get(current.weekday(), [])
+		if current.date() not in HOLIDAYS and any(s <= offset < e for s, e in windows):
+			res += 1
+		current += timedelta(seconds=1)
+	return res
 
 
 class TestCRMServiceLevelAgreement(UnitTestCase):
-	pass
+	def setUp(self):
+		self.calendar = BusinessCalendar(WORKING_HOURS, HOLIDAYS)
+
+	def test_elapsed_seconds_matches_reference(self):
+		spans = [
+			(datetime(2024, 1, 2, 8), datetime(2024, 1, 2, 10)),
+			(datetime(2024, 1, 3, 12, 30), datetime(2024, 1, 3, 14, 30)),
+			(datetime(2024, 1, 5, 16), datetime(2024, 1, 8, 10)),
+			(datetime(2024, 1, 25, 16, 59, 30), datetime(2024, 1, 29, 9, 0, 30)),
+			(datetime(2023, 12, 29, 18), datetime(2024, 1, 2, 9, 15)),
+		]
+		for start, end in spans:
+			self.assertEqual(self.calendar.get_elapsed_seconds(start, end), walk_elapsed_seconds(start, end))
+
+	def test_elapsed_seconds_skips_holidays(self):
+		# 26th is a Friday holiday, so nothing counts until Monday morning
+		start = datetime(2024, 1, 25, 17)
+		end = datetime(2024, 1, 29, 10)
+		self.assertEqual(self.calendar.get_elapsed_seconds(start, end), HOUR)
+		self.assertEqual(self.calendar.get_elapsed_seconds(end, start), 0)
+
+	def test_add_seconds(self):
+		# starts before opening
+		self.assertEqual(self.calendar.add_seconds(datetime(2024, 1, 2, 7), HOUR), datetime(2024, 1, 2, 10))
+		# ends exactly at closing
+		self.assertEqual(
+			self.calendar.add_seconds(datetime(2024, 1, 2, 9), 8 * HOUR), datetime(2024, 1, 2, 17)
+		)
+		# lunch break on Wednesday
+		self.assertEqual(
+			self.calendar.add_seconds(datetime(2024, 1, 3, 12), 2 * HOUR), datetime(2024, 1, 3, 15)
+		)
+		# rolls over the weekend and the holiday on the 1st
+		self.assertEqual(
+			self.calendar.add_seconds(datetime(2023, 12, 29, 16), 2 * HOUR), datetime(2024, 1, 2, 10)
+		)
+		self.assertEqual(self.calendar.add_seconds(datetime(2024, 1, 2, 7), 0), datetime(2024, 1, 2, 7))
+
+	def test_add_seconds_is_inverse_of_elapsed_seconds(self):
+		start = datetime(2024, 1, 4, 11, 20)
+		for seconds in (1, HOUR, 40 * HOUR, 41 * HOUR, 500 * HOUR):
+			end = self.calendar.add_seconds(start, seconds)
+			self.assertEqual(self.calendar.get_elapsed_seconds(start, end), seconds)
+
+	def test_add_seconds_without_working_hours(self):
+		calendar = BusinessCalendar({})
+		self.assertIsNone(calendar.add_seconds(datetime(2024, 1, 2, 9), HOUR))
+		self.assertEqual(calendar.get_elapsed_seconds(datetime(2024, 1, 2), datetime(2024, 2, 2)), 0)
+
+	def test_month_long_span_benchmark(self):
+		start = datetime(2024, 1, 2, 10, 15)
+		end = datetime(2024, 2, 5, 16, 45)
+		number = 1000
+		elapsed = timeit.timeit(lambda: self.calendar.get_elapsed_seconds(start, end), number=number)
+		added = timeit.timeit(lambda: self.calendar.add_seconds(start, 180 * HOUR), number=number)
+		# microseconds per call on any reasonable machine, a generous bound keeps CI stable
+		self.assertLess(elapsed / number, 0.001)
+		self.assertLess(added / number, 0.001)
+
+
+class IntegrationTestCRMServiceLevelAgreement(IntegrationTestCase):
+	def test_failed_sla_status_sweep(self):
+		now = now_datetime()
+		overdue = add_to_date(now, hours=-1)
+		due = add_to_date(now, hours=1)
+		fields = [
+			"name",
+			"lead_name",
+			"status",
+			"converted",
+			"sla_status",
+			"response_by",
+			"first_responded_on",
+			"creation",
+			"modified",
+			"owner",
+			"modified_by",
+		]
+		values = []
+		for i in range(100_000):
+			# every tenth lead is still within its response window, every twentieth was responded to
+			# and every twenty-fifth was converted, closing it
+			response_by = due if i % 10 == 0 else overdue
+			first_responded_on = add_to_date(overdue, minutes=-5) if i % 20 == 1 else None
+			values.append(
+				(
+					f"CRM-LEAD-SWEEP-{i:06}",
+					f"Sweep Lead {i}",
+					"New",
+					1 if i % 25 == 3 else 0,
+					"Fulfilled" if first_responded_on else "First Response Due",
+					response_by,
+					first_responded_on,
+					now,
+					now,
+					"Administrator",
+					"Administrator",
+				)
+			)
+		frappe.db.bulk_insert("CRM Lead", fields, values)
+
+		expected = sum(1 for i in range(100_000) if i % 10 != 0 and i % 20 != 1 and i % 25 != 3)
+		with self.assertQueryCount(25):
+			res = update_failed_sla_status()
+
+		self.assertGreaterEqual(res.get("CRM Lead"), expected)
+		self.assertEqual(
+			frappe.db.count("CRM Lead", {"name": ["like", "CRM-LEAD-SWEEP-%"], "sla_status": "Failed"}),
+			expected,
+		)
+		self.assertEqual(
+			frappe.db.get_value("CRM Lead", "CRM-LEAD-SWEEP-000000", "sla_status"), "First Response Due"
+		)
+		self.assertEqual(frappe.db.get_value("CRM Lead", "CRM-LEAD-SWEEP-000001", "sla_status"), "Fulfilled")
+		self.assertEqual(
+			frappe.db.get_value("CRM Lead", "CRM-LEAD-SWEEP-000003", "sla_status"), "First Response Due"
+		)
+
+		# nothing left to sweep
+		self.assertFalse(update_failed_sla_status().get("CRM Lead"))
+
+	def test_recompute_resumes_by_name(self):
+		sla = "Recompute Resume SLA"
+		now = now_datetime()
+		frappe.db.bulk_insert(
+			"CRM Lead",
+			["name", "lead_name", "status", "sla", "sla_creation", "creation", "modified"],
+			[(f"CRM-LEAD-RESUME-{i:03}", f"Resume Lead {i}", "New", sla, now, now, now) for i in range(25)],
+		)
+		self.addCleanup(frappe.cache.delete_value, get_progress_key(sla))
+
+		chunks = get_pending_chunks(sla, chunk_size=10, restart=True)
+		self.assertEqual([len(names) for _, _, names in chunks], [10, 10, 5])
+
+		# the first chunk completes, then a lead in it is deleted before the run resumes
+		doctype, after, names = chunks[0]
+		frappe.cache.hset(get_progress_key(sla), get_chunk_key(doctype, after), (names[-1], len(names)))
+		frappe.db.delete("CRM Lead", "CRM-LEAD-RESUME-003")
+
+		pending = [name for _, _, names in get_pending_chunks(sla, chunk_size=10) for name in names]
+		self.assertEqual(pending, [f"CRM-LEAD-RESUME-{i:03}" for i in range(10, 25)])
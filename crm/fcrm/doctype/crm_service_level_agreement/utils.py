@@ -1,9 +1,10 @@
 import frappe
 from frappe.model.document import Document
-from frappe.query_builder import JoinType
+from frappe.utils import getdate, now_datetime
 from frappe.utils.safe_exec import get_safe_globals
-from frappe.utils import now_datetime
-from pypika import Criterion
+
+SLA_RULES_CACHE_KEY = "crm:sla_rules"
+
 
 def get_sla(doc: Document) -> Document:
 	"""
@@ -12,25 +13,15 @@ def get_sla(doc: Document) -> Document:
 	:param doc: Lead/Deal to use
 	:return: Applicable SLA
 	"""
-	SLA = frappe.qb.DocType("CRM Service Level Agreement")
-	Priority = frappe.qb.DocType("CRM Service Level Priority")
-	now = now_datetime()
+	today = getdate(now_datetime())
 	priority = doc.communication_status
-	q = (
-		frappe.qb.from_(SLA)
-		.select(SLA.name, SLA.condition)
-		.where(SLA.apply_on == doc.doctype)
-		.where(SLA.enabled == True)
-		.where(Criterion.any([SLA.start_date.isnull(), SLA.start_date <= now]))
-		.where(Criterion.any([SLA.end_date.isnull(), SLA.end_date >= now]))
-	)
-	if priority:
-		q = (
-			q.join(Priority, JoinType.inner)
-			.on(Priority.parent == SLA.name)
-			.where(Priority.priority == priority)
-		)
-	sla_list = q.run(as_dict=True)
+	sla_list = [
+		sla
+		for sla in get_sla_rules(doc.doctype)
+		if (not sla.start_date or sla.start_date <= today)
+		and (not sla.end_date or sla.end_date >= today)
+		and (not priority or priority in sla.priorities)
+	]
 	res = None
 
 	# move default sla to the end of the list
@@ -40,13 +31,57 @@ def get_sla(doc: Document) -> Document:
 			sla_list.append(sla)
 			break
 
+	context = None
 	for sla in sla_list:
 		cond = sla.get("condition")
-		if not cond or frappe.safe_eval(cond, None, get_context(doc)):
+		if not cond:
+			res = sla
+			break
+		# build the context once, conditions can't change `doc`
+		context = context or get_context(doc)
+		if frappe.safe_eval(cond, None, context):
 			res = sla
 			break
 	return res
 
+
+def get_sla_rules(doctype: str) -> list[dict]:
+	"""
+	Get enabled SLAs applicable on `doctype` along with their priorities,
+	cached until any SLA changes
+
+	:param doctype: Doctype the SLAs apply on
+	:return: List of SLAs
+	"""
+	return frappe.cache.hget(SLA_RULES_CACHE_KEY, doctype, generator=lambda: load_sla_rules(doctype))
+
+
+def load_sla_rules(doctype: str) -> list[dict]:
+	sla_list = frappe.get_all(
+		"CRM Service Level Agreement",
+		filters={"apply_on": doctype, "enabled": 1},
+		fields=["name", "condition", "default", "start_date", "end_date"],
+		order_by="creation asc",
+	)
+	priorities = frappe.get_all(
+		"CRM Service Level Priority",
+		filters={
+			"parenttype": "CRM Service Level Agreement",
+			"parent": ["in", [sla.name for sla in sla_list]],
+		},
+		fields=["parent", "priority"],
+	)
+	for sla in sla_list:
+		sla.start_date = getdate(sla.start_date) if sla.start_date else None
+		sla.end_date = getdate(sla.end_date) if sla.end_date else None
+		sla.priorities = [row.priority for row in priorities if row.parent == sla.name]
+	return sla_list
+
+
+def clear_sla_rules_cache():
+	frappe.cache.delete_value(SLA_RULES_CACHE_KEY)
+
+
 def get_context(d: Document) -> dict:
 	"""
 	Get safe context for `safe_eval`
@@ -58,4 +93,4 @@ def get_context(d: Document) -> dict:
 	return {
 		"doc": d.as_dict(),
 		"frappe": frappe._dict(utils=utils),
-	}
\ No newline at end of file
+	}
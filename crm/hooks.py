@@ -141,6 +141,8 @@ override_doctype_class = {
 doc_events = {
 	"Contact": {
 		"validate": ["crm.api.contact.validate"],
+		"on_change": ["crm.api.doc.clear_list_count_cache", "crm.integrations.api.clear_caller_id_cache"],
+		"on_trash": ["crm.api.doc.clear_list_count_cache", "crm.integrations.api.clear_caller_id_cache"],
 	},
 	"ToDo": {
 		"after_insert": ["crm.api.todo.after_insert"],
@@ -148,15 +150,96 @@ doc_events = {
 	},
 	"Comment": {
 		"on_update": ["crm.api.comment.on_update"],
+		"on_change": ["crm.fcrm.doctype.crm_activity.crm_activity.sync_activities"],
+		"on_trash": ["crm.fcrm.doctype.crm_activity.crm_activity.sync_activities"],
+	},
+	"Communication": {
+		"on_change": ["crm.fcrm.doctype.crm_activity.crm_activity.sync_activities"],
+		"on_trash": ["crm.fcrm.doctype.crm_activity.crm_activity.sync_activities"],
+	},
+	"Version": {
+		"after_insert": ["crm.fcrm.doctype.crm_activity.crm_activity.sync_activities"],
+	},
+	"File": {
+		"after_insert": ["crm.fcrm.doctype.crm_activity.crm_activity.sync_activities"],
+		"after_delete": ["crm.fcrm.doctype.crm_activity.crm_activity.sync_activities"],
+	},
+	"CRM Call Log": {
+		"on_change": ["crm.fcrm.doctype.crm_activity.crm_activity.sync_activities"],
+		"on_trash": ["crm.fcrm.doctype.crm_activity.crm_activity.sync_activities"],
+	},
+	"FCRM Note": {
+		"on_change": ["crm.fcrm.doctype.crm_activity.crm_activity.sync_activities"],
+		"on_trash": ["crm.fcrm.doctype.crm_activity.crm_activity.sync_activities"],
+	},
+	"Custom Field": {
+		"on_change": ["crm.api.activities.clear_timeline_fields_cache"],
+		"on_trash": ["crm.api.activities.clear_timeline_fields_cache"],
+	},
+	"Property Setter": {
+		"on_change": ["crm.api.activities.clear_timeline_fields_cache"],
+		"on_trash": ["crm.api.activities.clear_timeline_fields_cache"],
 	},
 	"WhatsApp Message": {
 		"validate": ["crm.api.whatsapp.validate"],
 		"on_update": ["crm.api.whatsapp.on_update"],
 	},
 	"CRM Deal": {
+		"after_insert": ["crm.fcrm.doctype.crm_activity.crm_activity.sync_activities"],
 		"on_update": [
 			"crm.fcrm.doctype.erpnext_crm_settings.erpnext_crm_settings.create_customer_in_erpnext"
 		],
+		"on_change": [
+			"crm.api.doc.clear_list_count_cache",
+			"crm.fcrm.doctype.crm_daily_metric.crm_daily_metric.update_daily_metrics",
+			"crm.api.dashboard.clear_dashboard_cache",
+			"crm.integrations.api.clear_caller_id_cache",
+		],
+		"on_trash": [
+			"crm.api.doc.clear_list_count_cache",
+			"crm.fcrm.doctype.crm_daily_metric.crm_daily_metric.update_daily_metrics",
+			"crm.api.dashboard.clear_dashboard_cache",
+			"crm.integrations.api.clear_caller_id_cache",
+			"crm.fcrm.doctype.crm_activity.crm_activity.sync_activities",
+		],
+	},
+	"CRM Lead": {
+		"after_insert": ["crm.fcrm.doctype.crm_activity.crm_activity.sync_activities"],
+		"on_change": [
+			"crm.api.doc.clear_list_count_cache",
+			"crm.fcrm.doctype.crm_daily_metric.crm_daily_metric.update_daily_metrics",
+			"crm.api.dashboard.clear_dashboard_cache",
+			"crm.integrations.api.clear_caller_id_cache",
+		],
+		"on_trash": [
+			"crm.api.doc.clear_list_count_cache",
+			"crm.fcrm.doctype.crm_daily_metric.crm_daily_metric.update_daily_metrics",
+			"crm.api.dashboard.clear_dashboard_cache",
+			"crm.integrations.api.clear_caller_id_cache",
+			"crm.fcrm.doctype.crm_activity.crm_activity.sync_activities",
+		],
+	},
+	"CRM Deal Status": {
+		"on_change": ["crm.api.dashboard.clear_dashboard_cache"],
+		"on_trash": ["crm.api.dashboard.clear_dashboard_cache"],
+	},
+	"CRM Status Change Log": {
+		"on_change": ["crm.api.dashboard.clear_dashboard_cache"],
+		"on_trash": ["crm.api.dashboard.clear_dashboard_cache"],
+	},
+	"CRM Organization": {
+		"on_change": ["crm.api.doc.clear_list_count_cache"],
+		"on_trash": ["crm.api.doc.clear_list_count_cache"],
+	},
+	"CRM Task": {
+		"on_change": [
+			"crm.api.doc.clear_list_count_cache",
+			"crm.fcrm.doctype.crm_activity.crm_activity.sync_activities",
+		],
+		"on_trash": [
+			"crm.api.doc.clear_list_count_cache",
+			"crm.fcrm.doctype.crm_activity.crm_activity.sync_activities",
+		],
 	},
 	"User": {
 		"before_validate": ["crm.api.demo.validate_user"],
@@ -167,6 +250,15 @@ doc_events = {
 # Scheduled Tasks
 # ---------------
 
+scheduler_events = {
+	"cron": {
+		"*/5 * * * *": [
+			"crm.fcrm.doctype.crm_service_level_agreement.crm_service_level_agreement.update_failed_sla_status"
+		],
+	},
+	"daily_long": ["crm.fcrm.doctype.crm_daily_metric.crm_daily_metric.rebuild_daily_metrics_in_chunks"],
+}
+
 # scheduler_events = {
 # "all": [
 # "crm.tasks.all"
@@ -19,6 +19,7 @@ def after_install(force=False):
 	add_default_fields_layout(force)
 	add_property_setter()
 	add_email_template_custom_fields()
+	add_phone_custom_fields()
 	add_default_industries()
 	add_default_lead_sources()
 	add_default_lost_reasons()
@@ -275,6 +276,41 @@ def add_email_template_custom_fields():
 		frappe.clear_cache(doctype="Email Template")
 
 
+def add_phone_custom_fields():
+	meta = frappe.get_meta("Contact Phone")
+	if not meta.has_field("mobile_no_normalized") or not meta.has_field("mobile_no_national"):
+		click.secho("* Installing Custom Fields in Contact Phone")
+
+		create_custom_fields(
+			{
+				"Contact Phone": [
+					{
+						"fieldname": "mobile_no_normalized",
+						"fieldtype": "Data",
+						"label": "Phone (Normalized)",
+						"insert_after": "phone",
+						"hidden": 1,
+						"read_only": 1,
+						"no_copy": 1,
+						"search_index": 1,
+					},
+					{
+						"fieldname": "mobile_no_national",
+						"fieldtype": "Data",
+						"label": "Phone (National)",
+						"insert_after": "mobile_no_normalized",
+						"hidden": 1,
+						"read_only": 1,
+						"no_copy": 1,
+						"search_index": 1,
+					},
+				]
+			}
+		)
+
+		frappe.clear_cache(doctype="Contact Phone")
+
+
 def add_default_industries():
 	industries = [
 		"Accounting",
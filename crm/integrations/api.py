@@ -1,8 +1,23 @@
+import time
+
 import frappe
 from frappe.query_builder import Order
-from pypika.functions import Replace
 
-from crm.utils import are_same_phone_number, parse_phone_number
+from crm.utils import parse_phone_numbers
+
+CALLER_ID_CACHE_KEY = "crm:caller_id"
+CALLER_ID_TOKEN_KEY = "crm:caller_id_token"
+# number of resolved callers kept per process
+CALLER_ID_CACHE_SIZE = 10000
+# seconds a resolved caller is kept, bounds how long a lookup racing an eviction keeps a stale one
+CALLER_ID_CACHE_TTL = 10 * 60
+_caller_id_cache = {}
+# fields that change what a phone number resolves to, besides the phone rows of contacts
+CALLER_ID_FIELDS = {
+	"Contact": ("full_name", "image", "mobile_no"),
+	"CRM Lead": ("lead_name", "image", "mobile_no", "converted"),
+	"CRM Deal": ("contact",),
+}
 
 
 @frappe.whitelist()
@@ -107,75 +122,209 @@ def add_task_to_call_log(call_sid, task):
 @frappe.whitelist()
 def get_contact_by_phone_number(phone_number):
 	"""Get contact by phone number."""
-	number = parse_phone_number(phone_number)
+	return get_contacts_by_phone_numbers([phone_number])[phone_number]
 
-	if number.get("is_valid"):
-		return get_contact(number.get("national_number"), number.get("country"))
-	else:
-		return get_contact(phone_number, number.get("country"), exact_match=True)
 
+def get_contacts_by_phone_numbers(phone_numbers):
+	"""
+	Batched `get_contact_by_phone_number`, resolving the numbers missing from the caller ID cache in
+	a query per doctype
 
-def get_contact(phone_number, country="IN", exact_match=False):
-	if not phone_number:
-		return {"mobile_no": phone_number}
-
-	cleaned_number = (
-		phone_number.strip()
-		.replace(" ", "")
-		.replace("-", "")
-		.replace("(", "")
-		.replace(")", "")
-		.replace("+", "")
-	)
-
-	# Check if the number is associated with a contact
+	:param phone_numbers: Phone numbers to look up
+	:return: Contact/lead details keyed by phone number
+	"""
+	numbers = {
+		phone_number: (parsed.normalized, parsed.national) if parsed else (None, None)
+		for phone_number, parsed in parse_phone_numbers(phone_numbers).items()
+	}
+	callers = get_caller_ids({number for number in numbers.values() if number[0]})
+
+	res = {}
+	for phone_number, number in numbers.items():
+		caller = callers.get(number)
+		# cached callers are shared, hand out copies
+		res[phone_number] = frappe._dict(caller) if caller else {"mobile_no": phone_number}
+	return res
+
+
+def get_caller_ids(numbers):
+	"""
+	Resolve phone numbers to the contact or lead calling from them. Resolved callers, unknown ones
+	included, are kept in Redis and in every process until `clear_caller_id_cache`, for at most
+	`CALLER_ID_CACHE_TTL`.
+
+	:param numbers: `(normalized, national)` pairs of phone numbers, as in `get_contacts`
+	:return: Contact/lead details keyed by pair, empty for unknown numbers
+	"""
+	token = get_caller_id_token()
+	now = time.time()
+	res, missing = {}, []
+	for number in numbers:
+		cache_key = "|".join(filter(None, number))
+		# entries are `(expires_at, caller)`, with the token the local ones were validated with
+		cached = _caller_id_cache.pop((frappe.local.site, cache_key), None)
+		if cached and cached[0] == token and cached[1][0] > now:
+			res[number] = cached[1]
+		elif (cached := frappe.cache.hget(CALLER_ID_CACHE_KEY, cache_key)) and cached[0] > now:
+			res[number] = cached
+		else:
+			missing.append(number)
+
+	if missing:
+		callers = get_contacts(
+			[number for number, _ in missing], {number: national for number, national in missing if national}
+		)
+		expires_at = now + CALLER_ID_CACHE_TTL
+		for number in missing:
+			res[number] = (expires_at, callers.get(number[0], {}))
+			frappe.cache.hset(CALLER_ID_CACHE_KEY, "|".join(filter(None, number)), res[number])
+		# expired entries are dropped along with the hash once no caller is resolved for a while
+		frappe.cache.expire(frappe.cache.make_key(CALLER_ID_CACHE_KEY), CALLER_ID_CACHE_TTL)
+
+	for number, cached in res.items():
+		# least recently used callers come first and are evicted first
+		if len(_caller_id_cache) >= CALLER_ID_CACHE_SIZE:
+			_caller_id_cache.pop(next(iter(_caller_id_cache), None), None)
+		_caller_id_cache[(frappe.local.site, "|".join(filter(None, number)))] = (token, cached)
+	return {number: caller for number, (_, caller) in res.items()}
+
+
+def get_caller_id_token():
+	token = frappe.cache.get_value(CALLER_ID_TOKEN_KEY)
+	if not token:
+		token = frappe.generate_hash(length=10)
+		frappe.cache.set_value(CALLER_ID_TOKEN_KEY, token)
+	return token
+
+
+def clear_caller_id_cache(doc, method=None):
+	"""
+	Evict resolved callers after a contact, lead or deal changes what phone numbers resolve to,
+	once the change is committed so that lookups meanwhile can't cache the previous callers again.
+	Contact Phone rows are saved with their contact and are compared along with it.
+	"""
+	if method == "on_trash" or has_caller_id_changed(doc):
+		frappe.db.after_commit.add(evict_caller_id_cache)
+
+
+def evict_caller_id_cache():
+	# processes drop their own callers once they see a new token
+	frappe.cache.delete_value([CALLER_ID_CACHE_KEY, CALLER_ID_TOKEN_KEY])
+
+
+def has_caller_id_changed(doc):
+	previous = doc.get_doc_before_save()
+	if not previous:
+		return True
+	return get_caller_id_values(previous) != get_caller_id_values(doc)
+
+
+def get_caller_id_values(doc):
+	values = [doc.get(field) for field in CALLER_ID_FIELDS[doc.doctype]]
+	if doc.doctype == "Contact":
+		values.append(sorted(row.phone or "" for row in doc.phone_nos))
+	return values
+
+
+def get_contacts(numbers, national_numbers=None):
+	"""
+	Match normalized phone numbers against contacts, then against unconverted leads. Numbers
+	written without a country code that don't match fall back to their national number stored
+	with any country code, the default region may not be the one they were written in.
+
+	:param numbers: Normalized phone numbers
+	:param national_numbers: National numbers, as in `ParsedPhoneNumber.national`, keyed by number
+	:return: Contact/lead details keyed by the numbers that matched
+	"""
+	if not numbers:
+		return {}
+
+	res = find_callers(numbers, "mobile_no_normalized")
+
+	national_numbers = {
+		number: national
+		for number, national in (national_numbers or {}).items()
+		if national and number in numbers and number not in res
+	}
+	if national_numbers:
+		callers = find_callers(set(national_numbers.values()), "mobile_no_national")
+		for number, national in national_numbers.items():
+			if national in callers:
+				res[number] = callers[national]
+	return res
+
+
+def find_callers(numbers, fieldname):
+	"""
+	Find the contacts, else the unconverted leads, calling from `numbers`
+
+	:param numbers: Numbers to find callers of
+	:param fieldname: Indexed field of Contact Phone and CRM Lead the numbers are stored in,
+	        `mobile_no_normalized` or `mobile_no_national`
+	:return: Contact/lead details keyed by the numbers that matched
+	"""
+	res = {}
+
+	# Check if the numbers are associated with a contact
 	Contact = frappe.qb.DocType("Contact")
-	normalized_phone = Replace(
-		Replace(Replace(Replace(Replace(Contact.mobile_no, " ", ""), "-", ""), "(", ""), ")", ""), "+", ""
-	)
-
+	ContactPhone = frappe.qb.DocType("Contact Phone")
 	query = (
-		frappe.qb.from_(Contact)
-		.select(Contact.name, Contact.full_name, Contact.image, Contact.mobile_no)
-		.where(normalized_phone.like(f"%{cleaned_number}%"))
-		.orderby("modified", order=Order.desc)
-	)
-	contacts = query.run(as_dict=True)
-
-	if len(contacts):
-		# Check if the contact is associated with a deal
-		for contact in contacts:
-			if frappe.db.exists("CRM Contacts", {"contact": contact.name, "is_primary": 1}):
-				deal = frappe.db.get_value(
-					"CRM Contacts", {"contact": contact.name, "is_primary": 1}, "parent"
-				)
-				if are_same_phone_number(contact.mobile_no, phone_number, country, validate=not exact_match):
-					contact["deal"] = deal
-					return contact
-		# Else, return the first contact
-		if are_same_phone_number(contacts[0].mobile_no, phone_number, country, validate=not exact_match):
-			return contacts[0]
-
-	# Else, Check if the number is associated with a lead
-	Lead = frappe.qb.DocType("CRM Lead")
-	normalized_phone = Replace(
-		Replace(Replace(Replace(Replace(Lead.mobile_no, " ", ""), "-", ""), "(", ""), ")", ""), "+", ""
-	)
-
-	query = (
-		frappe.qb.from_(Lead)
-		.select(Lead.name, Lead.lead_name, Lead.image, Lead.mobile_no)
-		.where(Lead.converted == 0)
-		.where(normalized_phone.like(f"%{cleaned_number}%"))
-		.orderby("modified", order=Order.desc)
+		frappe.qb.from_(ContactPhone)
+		.join(Contact)
+		.on(Contact.name == ContactPhone.parent)
+		.select(
+			Contact.name,
+			Contact.full_name,
+			Contact.image,
+			Contact.mobile_no,
+			ContactPhone.field(fieldname).as_("number"),
+		)
+		.where(ContactPhone.parenttype == "Contact")
+		.where(ContactPhone.field(fieldname).isin(list(numbers)))
+		.orderby(Contact.modified, order=Order.desc)
 	)
-	leads = query.run(as_dict=True)
-
-	if len(leads):
+	contacts = {}
+	for contact in query.run(as_dict=True):
+		matches = contacts.setdefault(contact.pop("number"), [])
+		if contact.name not in [match.name for match in matches]:
+			matches.append(contact)
+
+	deals = {}
+	if contacts:
+		for link in frappe.get_all(
+			"CRM Contacts",
+			filters={
+				"contact": ("in", list({c.name for matches in contacts.values() for c in matches})),
+				"is_primary": 1,
+			},
+			fields=["contact", "parent"],
+		):
+			deals.setdefault(link.contact, link.parent)
+
+	for number, matches in contacts.items():
+		# Check if the contact is associated with a deal, else return the first contact
+		contact = next((contact for contact in matches if contact.name in deals), matches[0])
+		res[number] = frappe._dict(contact)
+		if contact.name in deals:
+			res[number].deal = deals[contact.name]
+
+	# Else, Check if the numbers are associated with a lead
+	pending = [number for number in numbers if number not in res]
+	if pending:
+		Lead = frappe.qb.DocType("CRM Lead")
+		leads = (
+			frappe.qb.from_(Lead)
+			.select(
+				Lead.name, Lead.lead_name, Lead.image, Lead.mobile_no, Lead.field(fieldname).as_("number")
+			)
+			.where(Lead.field(fieldname).isin(pending))
+			.where(Lead.converted == 0)
+			.orderby(Lead.modified, order=Order.desc)
+			.run(as_dict=True)
+		)
 		for lead in leads:
-			if are_same_phone_number(lead.mobile_no, phone_number, country, validate=not exact_match):
-				lead["lead"] = lead.name
-				lead["full_name"] = lead.lead_name
-				return lead
+			number = lead.pop("number")
+			if number not in res:
+				res[number] = frappe._dict(lead, lead=lead.name, full_name=lead.lead_name)
 
-	return {"mobile_no": phone_number}
+	return res
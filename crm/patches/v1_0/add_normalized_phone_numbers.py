@@ -0,0 +1,41 @@
+import frappe
+
+from crm.install import add_phone_custom_fields
+from crm.utils import parse_phone_numbers
+
+CHUNK_SIZE = 10000
+# fields phone numbers are stored in, and whether the doctype has a national number as well
+PHONE_FIELDS = (
+	("CRM Lead", "mobile_no", True),
+	("CRM Deal", "mobile_no", False),
+	("Contact Phone", "phone", True),
+)
+
+
+def execute():
+	add_phone_custom_fields()
+
+	for doctype, field, has_national_number in PHONE_FIELDS:
+		after = ""
+		while True:
+			records = frappe.get_all(
+				doctype,
+				filters={field: ("is", "set"), "name": (">", after)},
+				fields=["name", field],
+				order_by="name asc",
+				limit=CHUNK_SIZE,
+				as_list=True,
+			)
+			if not records:
+				break
+
+			parsed = parse_phone_numbers([phone_number for _, phone_number in records], cache=False)
+			updates = {}
+			for name, phone_number in records:
+				if number := parsed[phone_number]:
+					updates[name] = {"mobile_no_normalized": number.normalized}
+					if has_national_number:
+						updates[name]["mobile_no_national"] = number.national_number
+
+			frappe.db.bulk_update(doctype, updates, update_modified=False)
+			after = records[-1][0]
@@ -0,0 +1,5 @@
+from crm.fcrm.doctype.crm_daily_metric.crm_daily_metric import rebuild_daily_metrics
+
+
+def execute():
+	rebuild_daily_metrics(commit=True)
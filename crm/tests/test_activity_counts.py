@@ -0,0 +1,88 @@
+import frappe
+from frappe.tests import IntegrationTestCase
+
+from crm.api.doc import get_activity_counts
+
+
+def count_record_activities(doctype, name):
+	"""
+	Counts of one record, the way they were counted before they were batched
+	"""
+	return {
+		"_email_count": frappe.db.count(
+			"Communication",
+			{
+				"reference_doctype": doctype,
+				"reference_name": name,
+				"communication_type": ["in", ["Communication", "Automated Message"]],
+			},
+		),
+		"_comment_count": frappe.db.count(
+			"Comment", {"reference_doctype": doctype, "reference_name": name, "comment_type": "Comment"}
+		),
+		"_task_count": frappe.db.count("CRM Task", {"reference_doctype": doctype, "reference_docname": name}),
+		"_note_count": frappe.db.count(
+			"FCRM Note", {"reference_doctype": doctype, "reference_docname": name}
+		),
+	}
+
+
+def add_activities(doctype, name, count):
+	for i in range(count):
+		frappe.get_doc(
+			{
+				"doctype": "Comment",
+				"comment_type": "Comment",
+				"reference_doctype": doctype,
+				"reference_name": name,
+				"content": f"Comment {i}",
+			}
+		).insert(ignore_permissions=True)
+		frappe.get_doc(
+			{
+				"doctype": "Communication",
+				"communication_type": "Automated Message" if i % 2 else "Communication",
+				"communication_medium": "Email",
+				"subject": f"Email {i}",
+				"reference_doctype": doctype,
+				"reference_name": name,
+			}
+		).insert(ignore_permissions=True)
+		frappe.get_doc(
+			{
+				"doctype": "CRM Task",
+				"title": f"Task {i}",
+				"reference_doctype": doctype,
+				"reference_docname": name,
+			}
+		).insert(ignore_permissions=True)
+	for i in range(count + 1):
+		frappe.get_doc(
+			{
+				"doctype": "FCRM Note",
+				"title": f"Note {i}",
+				"reference_doctype": doctype,
+				"reference_docname": name,
+			}
+		).insert(ignore_permissions=True)
+
+
+class TestActivityCounts(IntegrationTestCase):
+	def test_batched_counts_match_per_record_counts(self):
+		leads = [
+			frappe.get_doc({"doctype": "CRM Lead", "first_name": f"Counted Lead {i}"}).insert().name
+			for i in range(3)
+		]
+		deals = [
+			frappe.get_doc({"doctype": "CRM Deal", "lead": lead}).insert(ignore_mandatory=True).name
+			for lead in leads[:2]
+		]
+		# the last lead and deal have no activities at all
+		add_activities("CRM Lead", leads[0], 2)
+		add_activities("CRM Lead", leads[1], 1)
+		add_activities("CRM Deal", deals[0], 3)
+
+		for doctype, names in (("CRM Lead", leads), ("CRM Deal", deals)):
+			counts = get_activity_counts(doctype, names)
+			self.assertEqual(counts, {name: count_record_activities(doctype, name) for name in names})
+			self.assertEqual(set(counts[names[-1]].values()), {0})
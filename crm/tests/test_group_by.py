@@ -0,0 +1,51 @@
+import frappe
+from frappe.tests import IntegrationTestCase
+
+from crm.api.doc import get_data, get_group_by_rows
+
+
+class TestGroupBy(IntegrationTestCase):
+	def test_groups_are_counted_and_loaded_lazily(self):
+		for i in range(3):
+			frappe.get_doc(
+				{"doctype": "CRM Lead", "first_name": f"Group Lead {i}", "status": "Nurture"}
+			).insert()
+
+		data = get_data(
+			"CRM Lead",
+			{},
+			"modified desc",
+			page_length=1,
+			default_filters={"converted": 0},
+			view={"view_type": "group_by", "group_by_field": "status"},
+		)
+		counts = data["group_by_field"]["counts"]
+		self.assertEqual(
+			counts["Nurture"], frappe.db.count("CRM Lead", {"status": "Nurture", "converted": 0})
+		)
+
+		res = get_group_by_rows(
+			"CRM Lead",
+			{},
+			"modified desc",
+			"status",
+			"Nurture",
+			rows=["name", "status"],
+			page_length=2,
+			default_filters={"converted": 0},
+		)
+		self.assertEqual(len(res["data"]), 2)
+		self.assertEqual({row["status"] for row in res["data"]}, {"Nurture"})
+		self.assertTrue(res["cursor"])
+
+	def test_group_by_field_is_validated(self):
+		for group_by_field in ("status`, (select 1)", "not_a_field"):
+			with self.assertRaises(frappe.ValidationError):
+				get_group_by_rows("CRM Lead", {}, "modified desc", group_by_field, "Nurture")
+			with self.assertRaises(frappe.ValidationError):
+				get_data(
+					"CRM Lead",
+					{},
+					"modified desc",
+					view={"view_type": "group_by", "group_by_field": group_by_field},
+				)
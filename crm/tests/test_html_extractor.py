@@ -0,0 +1,66 @@
+from bs4 import BeautifulSoup
+from frappe.tests import UnitTestCase
+
+from crm.api.activities import parse_attachment_log
+from crm.api.comment import extract_mentions
+from crm.utils.html_extractor import extract_tag, extract_tags
+
+ATTACHMENT_LOG = '<a href="/private/files/a&amp;b.pdf" target="_blank"><span>a&amp;b</span>.pdf</a>'
+COMMENT = (
+	'<p>Hi <span class="mention" data-type="mention" data-id="jane@example.com" data-label="Jane">'
+	'@Jane</span>, see <span data-type="mention" data-id="john@example.com" data-label="John">'
+	"@John</span> <span>not a mention</span></p>"
+)
+
+NESTED_MENTIONS = (
+	'<span data-type="mention" data-id="jane@example.com">@Jane '
+	'<span data-type="mention" data-id="john@example.com">@John</span></span>'
+	'<span data-type="mention" data-id="joe@example.com">@Joe</span>'
+)
+
+
+class TestHTMLExtractor(UnitTestCase):
+	def test_matches_beautifulsoup(self):
+		a_tag = BeautifulSoup(ATTACHMENT_LOG, "html.parser").find("a")
+		match = extract_tag(ATTACHMENT_LOG, "a")
+		self.assertEqual((match.attrs["href"], match.text), (a_tag["href"], a_tag.text))
+
+		spans = BeautifulSoup(COMMENT, "html.parser").find_all("span", attrs={"data-type": "mention"})
+		matches = extract_tags(COMMENT, "span", {"data-type": "mention"})
+		self.assertEqual(
+			[(match.attrs["data-id"], match.text) for match in matches],
+			[(span.get("data-id"), span.text) for span in spans],
+		)
+
+	def test_nested_matches(self):
+		spans = BeautifulSoup(NESTED_MENTIONS, "html.parser").find_all("span", attrs={"data-type": "mention"})
+		matches = extract_tags(NESTED_MENTIONS, "span", {"data-type": "mention"})
+		self.assertEqual(
+			[(match.attrs["data-id"], match.text) for match in matches],
+			[(span.get("data-id"), span.text) for span in spans],
+		)
+		self.assertEqual(extract_tag(NESTED_MENTIONS, "span").text, "@Jane @John")
+
+	def test_unclosed_and_missing_tags(self):
+		self.assertEqual(extract_tag('<a href="/files/x">x <b>y', "a").text, "x y")
+		self.assertIsNone(extract_tag("Removed x.pdf", "a"))
+		self.assertEqual(extract_tags("", "a"), [])
+
+	def test_cached_results_are_copies(self):
+		extract_tag(ATTACHMENT_LOG, "a").attrs["href"] = "/changed"
+		self.assertEqual(extract_tag(ATTACHMENT_LOG, "a").attrs["href"], "/private/files/a&b.pdf")
+
+	def test_callers_keep_their_return_shapes(self):
+		self.assertEqual(
+			parse_attachment_log(ATTACHMENT_LOG, "Attachment"),
+			{
+				"type": "added",
+				"file_name": "a&b.pdf",
+				"file_url": "/private/files/a&b.pdf",
+				"is_private": True,
+			},
+		)
+		self.assertEqual(
+			[(m.full_name, m.email) for m in extract_mentions(COMMENT)],
+			[("Jane", "jane@example.com"), ("John", "john@example.com")],
+		)
@@ -0,0 +1,30 @@
+from unittest.mock import patch
+
+import frappe
+from frappe.tests import IntegrationTestCase
+
+from crm.api.doc import get_total_count
+
+
+class TestListCounts(IntegrationTestCase):
+	def test_only_unfiltered_counts_are_estimated(self):
+		frappe.get_doc({"doctype": "CRM Lead", "first_name": "Count Lead"}).insert()
+		filters = {"first_name": "Count Lead"}
+
+		with patch("crm.api.doc.ESTIMATED_COUNT_THRESHOLD", 0):
+			self.assertEqual(
+				get_total_count("CRM Lead", filters, "estimated"),
+				(frappe.db.count("CRM Lead", filters), False),
+			)
+			if frappe.db.db_type == "mariadb":
+				self.assertTrue(get_total_count("CRM Lead", {}, "estimated")[1])
+
+	def test_counts_of_values_with_percent_signs(self):
+		frappe.get_doc({"doctype": "CRM Lead", "first_name": "50%"}).insert()
+		frappe.get_doc({"doctype": "CRM Lead", "first_name": "50%%"}).insert()
+
+		for first_name in ("50%", "50%%"):
+			filters = {"first_name": first_name}
+			self.assertEqual(
+				get_total_count("CRM Lead", filters), (frappe.db.count("CRM Lead", filters), False)
+			)
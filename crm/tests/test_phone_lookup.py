@@ -0,0 +1,83 @@
+from unittest.mock import patch
+
+import frappe
+from frappe.tests import IntegrationTestCase
+
+from crm.api.whatsapp import get_lead_or_deal_from_number
+from crm.benchmark.runner import record_queries
+from crm.integrations.api import (
+	evict_caller_id_cache,
+	get_contact_by_phone_number,
+	get_contacts_by_phone_numbers,
+)
+from crm.utils import normalize_phone_number
+
+
+class TestPhoneLookup(IntegrationTestCase):
+	def setUp(self):
+		region = patch("crm.utils.get_default_phone_region", return_value="IN")
+		region.start()
+		self.addCleanup(region.stop)
+		self.lead = frappe.get_doc(
+			{"doctype": "CRM Lead", "first_name": "Phone Lead", "mobile_no": "+91 (766) 667-6666"}
+		).insert()
+		# evictions run once changes are committed, tests roll back instead
+		evict_caller_id_cache()
+
+	def test_normalize_phone_number(self):
+		self.assertEqual(normalize_phone_number("+91 (766) 667-6666"), "+917666676666")
+		self.assertEqual(normalize_phone_number("7666676666"), "+917666676666")
+		self.assertEqual(normalize_phone_number("12-34"), "+1234")
+		self.assertIsNone(normalize_phone_number("n/a"))
+		self.assertEqual(self.lead.mobile_no_normalized, "+917666676666")
+
+	def test_lookup_ignores_format(self):
+		for number in ("7666676666", "+917666676666", "+91 766 667 6666"):
+			self.assertEqual(get_contact_by_phone_number(number).get("lead"), self.lead.name)
+
+		self.assertEqual(get_lead_or_deal_from_number("917666676666"), (self.lead.name, "CRM Lead"))
+
+	def test_lookup_is_cached_until_phone_changes(self):
+		get_contact_by_phone_number("7666676666")
+		with record_queries() as recorder:
+			self.assertEqual(get_contact_by_phone_number("+91 76666 76666").get("lead"), self.lead.name)
+		self.assertEqual(recorder.count, 0)
+
+		self.lead.mobile_no = "+91 98450 67890"
+		self.lead.save()
+		# the cached caller is only evicted once the change is committed
+		self.assertEqual(get_contact_by_phone_number("7666676666").get("lead"), self.lead.name)
+		frappe.db.after_commit.run()
+		self.assertNotEqual(get_contact_by_phone_number("7666676666").get("lead"), self.lead.name)
+		self.assertEqual(get_contact_by_phone_number("9845067890").get("lead"), self.lead.name)
+
+	def test_lookup_matches_any_contact_phone(self):
+		contact = frappe.get_doc(
+			{
+				"doctype": "Contact",
+				"first_name": "Phone Contact",
+				"phone_nos": [
+					{"phone": "+91 98765 43210", "is_primary_mobile_no": 1},
+					{"phone": "098450 12345"},
+				],
+			}
+		).insert()
+
+		contacts = get_contacts_by_phone_numbers(["9876543210", "+919845012345", "+1 415 555 0100"])
+		self.assertEqual(contacts["9876543210"].get("name"), contact.name)
+		self.assertEqual(contacts["+919845012345"].get("name"), contact.name)
+		self.assertEqual(contacts["+1 415 555 0100"], {"mobile_no": "+1 415 555 0100"})
+
+	def test_national_numbers_outside_india(self):
+		with patch("crm.utils.get_default_phone_region", return_value="US"):
+			self.assertEqual(normalize_phone_number("(415) 555-0123"), "+14155550123")
+			lead = frappe.get_doc(
+				{"doctype": "CRM Lead", "first_name": "US Lead", "mobile_no": "(415) 555-0123"}
+			).insert()
+			self.assertEqual(lead.mobile_no_normalized, "+14155550123")
+			self.assertEqual(lead.mobile_no_national, "4155550123")
+			self.assertEqual(get_contact_by_phone_number("415-555-0123").get("lead"), lead.name)
+
+		# parsed as an Indian number, it still matches on its national number
+		self.assertEqual(get_contact_by_phone_number("(415) 555-0123").get("lead"), lead.name)
+		self.assertNotEqual(get_contact_by_phone_number("+44 415 555 0123").get("lead"), lead.name)
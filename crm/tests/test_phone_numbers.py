@@ -0,0 +1,68 @@
+from unittest.mock import patch
+
+from frappe.tests import UnitTestCase
+
+from crm.utils import (
+	are_same_phone_number,
+	get_parsed_phone_number,
+	normalize_phone_number,
+	normalize_phone_numbers,
+	parse_phone_number,
+	parse_phone_numbers,
+)
+
+
+class TestPhoneNumbers(UnitTestCase):
+	def setUp(self):
+		region = patch("crm.utils.get_default_phone_region", return_value="IN")
+		region.start()
+		self.addCleanup(region.stop)
+
+	def test_parsing_is_memoized(self):
+		get_parsed_phone_number.cache_clear()
+		parsed = get_parsed_phone_number("+91 76666 76666", "IN")
+		self.assertTrue(parsed.is_valid)
+		self.assertEqual(parsed.e164, "+917666676666")
+		self.assertIs(get_parsed_phone_number("+91 76666 76666", "IN"), parsed)
+
+		normalize_phone_number("+91 76666 76666")
+		are_same_phone_number("+91 76666 76666", "07666676666")
+		self.assertEqual(get_parsed_phone_number.cache_info().misses, 2)
+
+	def test_parse_phone_number(self):
+		number = parse_phone_number("07666676666")
+		self.assertTrue(number["success"])
+		self.assertEqual(number["national_number"], "7666676666")
+		self.assertEqual(number["formats"]["E164"], "+917666676666")
+		self.assertEqual(number["country"], "IN")
+		self.assertFalse(parse_phone_number("n/a")["success"])
+
+	def test_are_same_phone_number(self):
+		self.assertTrue(are_same_phone_number("+91 76666 76666", "07666676666"))
+		self.assertFalse(are_same_phone_number("+91 76666 76666", "+91 76666 76667"))
+		self.assertFalse(are_same_phone_number("1234", "1234"))
+		self.assertTrue(are_same_phone_number("1234", "1234", validate=False))
+		self.assertFalse(are_same_phone_number("n/a", "n/a", validate=False))
+
+	def test_normalize_phone_numbers(self):
+		phone_numbers = ["+91 76666 76666", "07666676666", "12-34", "n/a", None, "07666676666"]
+		expected = {
+			"+91 76666 76666": "+917666676666",
+			"07666676666": "+917666676666",
+			"12-34": "+1234",
+			"n/a": None,
+			None: None,
+		}
+		self.assertEqual(normalize_phone_numbers(phone_numbers), expected)
+		self.assertEqual(normalize_phone_numbers(phone_numbers, cache=False), expected)
+		for phone_number, normalized in expected.items():
+			self.assertEqual(normalize_phone_number(phone_number), normalized)
+
+	def test_national_numbers(self):
+		parsed = parse_phone_numbers(["(415) 555-0123", "+1 415 555 0123", "0041 415 555 0123", "12-34"])
+		self.assertEqual(parsed["(415) 555-0123"].national, "4155550123")
+		self.assertIsNone(parsed["+1 415 555 0123"].national)
+		self.assertEqual(parsed["+1 415 555 0123"].national_number, "4155550123")
+		self.assertIsNone(parsed["0041 415 555 0123"].national)
+		self.assertIsNone(parsed["12-34"].national)
+		self.assertEqual(normalize_phone_number("(415) 555-0123", "US"), "+14155550123")
@@ -0,0 +1,170 @@
+import frappe
+from frappe.tests import IntegrationTestCase
+from frappe.utils import add_days, nowdate
+
+from crm.api.activities import get_activities, get_timeline
+from crm.api.dashboard import evict_dashboard_cache, get_dashboard
+from crm.api.doc import get_data
+from crm.api.notifications import get_notifications
+from crm.api.whatsapp import get_whatsapp_messages
+from crm.benchmark.data import DataGenerator
+from crm.benchmark.runner import get_busiest_document, record_queries
+from crm.fcrm.doctype.crm_activity.crm_activity import backfill_activities
+from crm.fcrm.doctype.crm_daily_metric.crm_daily_metric import rebuild_daily_metrics
+from crm.fcrm.doctype.crm_dashboard.crm_dashboard import create_default_manager_dashboard
+from crm.integrations.api import evict_caller_id_cache, get_contact_by_phone_number
+
+# ceilings of (queries, rows fetched) per call with warm caches, lower them as endpoints get cheaper
+BUDGETS = {
+	"get_data:list": (30, 200),
+	"get_data:kanban": (40, 500),
+	"get_data:group_by": (30, 300),
+	"get_dashboard": (24, 400),
+	"get_notifications": (3, 100),
+	"get_activities": (60, 400),
+	"get_timeline": (8, 60),
+	"get_whatsapp_messages": (6, 50),
+	"get_contact_by_phone_number": (4, 10),
+	"get_contact_by_phone_number:cached": (0, 0),
+}
+
+
+class TestQueryBudgets(IntegrationTestCase):
+	@classmethod
+	def setUpClass(cls):
+		super().setUpClass()
+		# `get_dashboard` commits when it creates the dashboard, which would keep the generated data
+		create_default_manager_dashboard()
+		DataGenerator(scale=0.02, seed=16).generate()
+		rebuild_daily_metrics()
+		backfill_activities()
+		cls.deal = get_busiest_document("CRM Deal")
+		cls.mobile_no = frappe.db.get_value("CRM Lead", get_busiest_document("CRM Lead"), "mobile_no")
+		cls.users = frappe.get_all("User", filters={"enabled": 1}, limit=5, pluck="name")
+
+	def record(self, call):
+		# the first call fills meta and other caches every request after it can rely on
+		call()
+		with record_queries() as recorder:
+			call()
+		return recorder
+
+	def assertWithinBudget(self, name, call):
+		queries, rows = BUDGETS[name]
+		recorder = self.record(call)
+		msg = f"{name} ran {recorder.count} queries:\n\n" + "\n\n".join(recorder.queries)
+		self.assertLessEqual(recorder.count, queries, msg)
+		self.assertLessEqual(recorder.rows, rows, f"{name} fetched {recorder.rows} rows")
+
+	def test_list_views(self):
+		self.assertWithinBudget(
+			"get_data:list",
+			lambda: get_data("CRM Lead", {}, "modified desc", view={"view_type": "list"}),
+		)
+		self.assertWithinBudget(
+			"get_data:kanban",
+			lambda: get_data(
+				"CRM Deal",
+				{},
+				"modified desc",
+				column_field="status",
+				title_field="organization",
+				view={"view_type": "kanban"},
+			),
+		)
+		self.assertWithinBudget(
+			"get_data:group_by",
+			lambda: get_data(
+				"CRM Lead", {}, "modified desc", view={"view_type": "group_by", "group_by_field": "status"}
+			),
+		)
+
+	def test_dashboard(self):
+		def call():
+			evict_dashboard_cache()
+			return get_dashboard(add_days(nowdate(), -365), nowdate())
+
+		self.assertWithinBudget("get_dashboard", call)
+
+	def test_activities(self):
+		self.assertWithinBudget("get_activities", lambda: get_activities(self.deal))
+		self.assertWithinBudget("get_timeline", lambda: get_timeline(self.deal, previews=True))
+		self.assertWithinBudget("get_whatsapp_messages", lambda: get_whatsapp_messages("CRM Deal", self.deal))
+
+	def test_caller_id(self):
+		def call():
+			evict_caller_id_cache()
+			return get_contact_by_phone_number(self.mobile_no)
+
+		self.assertWithinBudget("get_contact_by_phone_number", call)
+		self.assertWithinBudget(
+			"get_contact_by_phone_number:cached", lambda: get_contact_by_phone_number(self.mobile_no)
+		)
+
+	def test_notifications_are_constant_in_number_of_notifications(self):
+		self.add_notifications(2)
+		few = self.record(get_notifications)
+		self.add_notifications(20)
+		many = self.record(get_notifications)
+
+		self.assertEqual(few.count, many.count)
+		self.assertWithinBudget("get_notifications", get_notifications)
+
+	def test_activities_are_constant_in_number_of_comments(self):
+		lead = frappe.get_doc({"doctype": "CRM Lead", "first_name": "Budget Lead"}).insert()
+		self.add_comments(lead.name, 2)
+		few = self.record(lambda: get_activities(lead.name))
+		self.add_comments(lead.name, 20)
+		many = self.record(lambda: get_activities(lead.name))
+
+		self.assertEqual(few.count, many.count)
+
+	def test_activities_are_constant_in_number_of_calls(self):
+		lead = frappe.get_doc({"doctype": "CRM Lead", "first_name": "Budget Lead"}).insert()
+		self.add_calls(lead.name, 2)
+		few = self.record(lambda: get_activities(lead.name))
+		self.add_calls(lead.name, 20)
+		many = self.record(lambda: get_activities(lead.name))
+
+		self.assertEqual(few.count, many.count)
+
+	def add_notifications(self, count):
+		for i in range(count):
+			frappe.get_doc(
+				{
+					"doctype": "CRM Notification",
+					"from_user": self.users[i % len(self.users)],
+					"to_user": frappe.session.user,
+					"type": "Mention",
+					"notification_text": f"Mentioned you {i}",
+				}
+			).insert(ignore_permissions=True)
+
+	def add_comments(self, name, count):
+		for i in range(count):
+			frappe.get_doc(
+				{
+					"doctype": "Comment",
+					"comment_type": "Comment",
+					"reference_doctype": "CRM Lead",
+					"reference_name": name,
+					"content": f"<p>Comment {i}</p>",
+				}
+			).insert(ignore_permissions=True)
+
+	def add_calls(self, name, count):
+		offset = frappe.db.count("CRM Call Log", {"reference_docname": name})
+		for i in range(offset, offset + count):
+			frappe.get_doc(
+				{
+					"doctype": "CRM Call Log",
+					"id": f"{name}-{i}",
+					"from": f"+9198765{i:05d}",
+					"to": "+919999999999",
+					"status": "Completed",
+					"type": "Incoming",
+					"receiver": self.users[i % len(self.users)],
+					"reference_doctype": "CRM Lead",
+					"reference_docname": name,
+				}
+			).insert(ignore_permissions=True)
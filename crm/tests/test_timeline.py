@@ -0,0 +1,88 @@
+from unittest.mock import patch
+
+import frappe
+from frappe.tests import IntegrationTestCase
+
+from crm.api.activities import (
+	get_activities,
+	get_communication_content,
+	get_timeline,
+	get_version_activity,
+)
+
+
+class TestTimeline(IntegrationTestCase):
+	def setUp(self):
+		self.lead = frappe.get_doc({"doctype": "CRM Lead", "first_name": "Timeline Lead"}).insert()
+		for i in range(7):
+			self.add_comment(f"<p>Comment {i}</p>")
+
+	def add_comment(self, content):
+		return frappe.get_doc(
+			{
+				"doctype": "Comment",
+				"comment_type": "Comment",
+				"reference_doctype": "CRM Lead",
+				"reference_name": self.lead.name,
+				"content": content,
+			}
+		).insert(ignore_permissions=True)
+
+	def get_all_pages(self, **kwargs):
+		activities = []
+		page = get_timeline(self.lead.name, limit=3, **kwargs)
+		activities += page["activities"]
+		while page["has_more"]:
+			page = get_timeline(self.lead.name, before=page["cursor"], limit=3, **kwargs)
+			activities += page["activities"]
+		return activities
+
+	def test_pages_cover_the_timeline_once(self):
+		activities = self.get_all_pages()
+		comments = [a["name"] for a in activities if a["activity_type"] == "comment"]
+
+		self.assertEqual(len(comments), 7)
+		self.assertEqual(len(set(comments)), 7)
+		self.assertEqual(activities[-1]["activity_type"], "creation")
+		creations = [a["creation"] for a in activities]
+		self.assertEqual(creations, sorted(creations, reverse=True))
+
+	def test_since_returns_only_new_activities(self):
+		latest = get_timeline(self.lead.name)["latest"]
+		comment = self.add_comment("<p>New comment</p>")
+
+		activities = get_timeline(self.lead.name, since=latest)["activities"]
+		self.assertEqual([a["name"] for a in activities], [comment.name])
+
+	def test_email_previews(self):
+		communication = frappe.get_doc(
+			{
+				"doctype": "Communication",
+				"communication_type": "Communication",
+				"communication_medium": "Email",
+				"sent_or_received": "Received",
+				"subject": "Preview",
+				"content": "<div><p>Hello &amp; welcome</p>" + "<p>word</p>" * 500 + "</div>",
+				"reference_doctype": "CRM Lead",
+				"reference_name": self.lead.name,
+			}
+		).insert(ignore_permissions=True)
+
+		activities = get_timeline(self.lead.name, previews=True)["activities"]
+		email = next(a for a in activities if a["activity_type"] == "communication")
+
+		self.assertTrue(email["data"]["is_preview"])
+		self.assertTrue(email["data"]["content"].startswith("Hello & welcome word"))
+		self.assertLessEqual(len(email["data"]["content"]), 201)
+		self.assertEqual(get_communication_content(communication.name), communication.content)
+
+	def test_warm_loads_reuse_parsed_versions(self):
+		self.lead.first_name = "Renamed Lead"
+		self.lead.save()
+		get_activities(self.lead.name)
+
+		with patch("crm.api.activities.get_version_activity", wraps=get_version_activity) as parse:
+			activities = get_activities(self.lead.name)[0]
+
+		parse.assert_not_called()
+		self.assertTrue([a for a in activities if a["activity_type"] == "changed"])
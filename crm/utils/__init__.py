@@ -1,4 +1,5 @@
 import functools
+from typing import NamedTuple
 
 import frappe
 import phonenumbers
@@ -7,34 +8,121 @@ from frappe import _
 from frappe.model.docstatus import DocStatus
 from frappe.model.dynamic_links import get_dynamic_link_map
 from frappe.utils import floor
+from frappe.utils.caching import request_cache
 from phonenumbers import NumberParseException
 from phonenumbers import PhoneNumberFormat as PNF
 
+# number of parsed phone numbers kept per process
+PHONE_NUMBER_CACHE_SIZE = 4096
+# shortest national number matched against numbers stored with any country code
+NATIONAL_NUMBER_MIN_LENGTH = 7
+
+
+class ParsedPhoneNumber(NamedTuple):
+	"""
+	A phone number parsed and validated once. Instances are shared by `get_parsed_phone_number`,
+	`number` must not be modified.
+	"""
+
+	raw: str
+	number: phonenumbers.PhoneNumber | None
+	is_valid: bool = False
+	e164: str | None = None
+	error: str | None = None
+
+	@classmethod
+	def parse(cls, phone_number, region="IN"):
+		try:
+			number = phonenumbers.parse(phone_number, region)
+		except NumberParseException as e:
+			return cls(phone_number, None, error=str(e))
+
+		return cls(
+			phone_number,
+			number,
+			is_valid=phonenumbers.is_valid_number(number),
+			e164=phonenumbers.format_number(number, PNF.E164),
+		)
+
+	@property
+	def normalized(self):
+		"""E.164 of valid numbers, else the digits of the number after a "+", `None` without digits"""
+		if self.is_valid:
+			return self.e164
+
+		digits = "".join(c for c in self.raw or "" if c.isdigit())
+		return f"+{digits}" if digits else None
+
+	@property
+	def national_number(self):
+		"""
+		National number, stored next to the normalized one so that numbers can be matched on it
+		whatever country code they were stored with, `None` if it is too short to tell numbers apart
+		"""
+		if not self.number:
+			return None
+
+		national = str(self.number.national_number)
+		return national if len(national) >= NATIONAL_NUMBER_MIN_LENGTH else None
+
+	@property
+	def national(self):
+		"""
+		National number of numbers written without a country code, `None` for the others. The
+		default region may not be the one they were written in, so they also match the numbers
+		stored with this `national_number`.
+		"""
+		if (self.raw or "").lstrip().startswith(("+", "00")):
+			return None
+		return self.national_number
+
+
+@request_cache
+def get_default_phone_region():
+	"""
+	Region of phone numbers written without a country code: the country in System Settings,
+	India if it is not set
+	"""
+	country = frappe.db.get_single_value("System Settings", "country")
+	code = country and frappe.get_cached_value("Country", country, "code")
+	return code.upper() if code else "IN"
+
+
+@functools.lru_cache(maxsize=PHONE_NUMBER_CACHE_SIZE)
+def get_parsed_phone_number(phone_number, region="IN"):
+	"""
+	Parse and validate a phone number, memoized by `(phone_number, region)`
+
+	:param phone_number: Phone number in any format
+	:param region: Region of numbers without a country code
+	:return: `ParsedPhoneNumber`, with `error` set if the number can't be parsed
+	"""
+	return ParsedPhoneNumber.parse(phone_number, region)
+
 
 def parse_phone_number(phone_number, default_country="IN"):
-	try:
-		# Parse the number
-		number = phonenumbers.parse(phone_number, default_country)
-
-		# Get various information about the number
-		result = {
-			"is_valid": phonenumbers.is_valid_number(number),
-			"country_code": number.country_code,
-			"national_number": str(number.national_number),
-			"formats": {
-				"international": phonenumbers.format_number(number, PNF.INTERNATIONAL),
-				"national": phonenumbers.format_number(number, PNF.NATIONAL),
-				"E164": phonenumbers.format_number(number, PNF.E164),
-				"RFC3966": phonenumbers.format_number(number, PNF.RFC3966),
-			},
-			"type": phonenumbers.number_type(number),
-			"country": phonenumbers.region_code_for_number(number),
-			"is_possible": phonenumbers.is_possible_number(number),
-		}
-
-		return {"success": True, **result}
-	except NumberParseException as e:
-		return {"success": False, "error": str(e)}
+	parsed = get_parsed_phone_number(phone_number, default_country)
+	if parsed.error:
+		return {"success": False, "error": parsed.error}
+
+	# Get various information about the number
+	number = parsed.number
+	result = {
+		"is_valid": parsed.is_valid,
+		"country_code": number.country_code,
+		"national_number": str(number.national_number),
+		"formats": {
+			"international": phonenumbers.format_number(number, PNF.INTERNATIONAL),
+			"national": phonenumbers.format_number(number, PNF.NATIONAL),
+			"E164": parsed.e164,
+			"RFC3966": phonenumbers.format_number(number, PNF.RFC3966),
+		},
+		"type": phonenumbers.number_type(number),
+		"country": phonenumbers.region_code_for_number(number),
+		"is_possible": phonenumbers.is_possible_number(number),
+	}
+
+	return {"success": True, **result}
 
 
 def are_same_phone_number(number1, number2, default_region="IN", validate=True):
@@ -49,23 +137,77 @@ def are_same_phone_number(number1, number2, default_region="IN", validate=True):
 	Returns:
 	    bool: True if numbers are same, False otherwise
 	"""
-	try:
-		# Parse both numbers
-		parsed1 = phonenumbers.parse(number1, default_region)
-		parsed2 = phonenumbers.parse(number2, default_region)
+	parsed1 = get_parsed_phone_number(number1, default_region)
+	parsed2 = get_parsed_phone_number(number2, default_region)
+	if parsed1.error or parsed2.error:
+		return False
 
-		# Check if both numbers are valid
-		if validate and not (phonenumbers.is_valid_number(parsed1) and phonenumbers.is_valid_number(parsed2)):
-			return False
+	# Check if both numbers are valid
+	if validate and not (parsed1.is_valid and parsed2.is_valid):
+		return False
 
-		# Convert both to E164 format and compare
-		formatted1 = phonenumbers.format_number(parsed1, phonenumbers.PhoneNumberFormat.E164)
-		formatted2 = phonenumbers.format_number(parsed2, phonenumbers.PhoneNumberFormat.E164)
+	# Compare the E164 formats
+	return parsed1.e164 == parsed2.e164
 
-		return formatted1 == formatted2
 
-	except phonenumbers.NumberParseException:
-		return False
+def normalize_phone_number(phone_number, default_region=None):
+	"""
+	Normalize a phone number to E.164 for indexed lookups, e.g. "+91 (766) 667 6666" -> "+917666676666".
+	Numbers that are not valid keep just their digits after a "+".
+
+	:param phone_number: Phone number in any format
+	:param default_region: Region of numbers without a country code, `get_default_phone_region` if not set
+	:return: Normalized number, `None` if there are no digits
+	"""
+	if not phone_number:
+		return None
+
+	return get_parsed_phone_number(phone_number, default_region or get_default_phone_region()).normalized
+
+
+def get_national_phone_number(phone_number, default_region=None):
+	"""
+	Get the national number of a phone number, as in `ParsedPhoneNumber.national_number`
+
+	:param phone_number: Phone number in any format
+	:param default_region: Region of numbers without a country code, `get_default_phone_region` if not set
+	"""
+	if not phone_number:
+		return None
+
+	return get_parsed_phone_number(phone_number, default_region or get_default_phone_region()).national_number
+
+
+def normalize_phone_numbers(phone_numbers, default_region=None, cache=True):
+	"""
+	Normalize many phone numbers at once, parsing every distinct number once
+
+	:param phone_numbers: Phone numbers in any format
+	:param default_region: Region of numbers without a country code, `get_default_phone_region` if not set
+	:param cache: Go through the cache of `get_parsed_phone_number`, imports of mostly distinct
+	        numbers should skip it rather than evict the numbers other requests keep looking up
+	:return: Normalized numbers as in `normalize_phone_number`, keyed by phone number
+	"""
+	return {
+		phone_number: parsed.normalized if parsed else None
+		for phone_number, parsed in parse_phone_numbers(phone_numbers, default_region, cache).items()
+	}
+
+
+def parse_phone_numbers(phone_numbers, default_region=None, cache=True):
+	"""
+	Parse many phone numbers at once like `normalize_phone_numbers`
+
+	:return: `ParsedPhoneNumber` keyed by phone number, `None` for empty numbers
+	"""
+	parse = get_parsed_phone_number if cache else ParsedPhoneNumber.parse
+	default_region = default_region or get_default_phone_region()
+
+	res = {}
+	for phone_number in phone_numbers:
+		if phone_number not in res:
+			res[phone_number] = parse(phone_number, default_region) if phone_number else None
+	return res
 
 
 def seconds_to_duration(seconds):
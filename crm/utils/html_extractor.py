@@ -0,0 +1,116 @@
+import hashlib
+from html.parser import HTMLParser
+
+import frappe
+
+# number of parsed contents kept per process
+CACHE_SIZE = 1024
+_cache = {}
+
+
+class StopParsing(Exception):
+	pass
+
+
+class TagExtractor(HTMLParser):
+	"""
+	Collect the attributes and text of the tags matching `tag` and `attrs` as the HTML is fed,
+	without building a tree, and stop once `limit` of them are found. Matches nested in another
+	match are collected too, in document order like `find_all` of BeautifulSoup.
+	"""
+
+	def __init__(self, tag: str, attrs: dict | None = None, limit: int | None = None):
+		super().__init__(convert_charrefs=True)
+		self.tag = tag
+		self.attrs = attrs or {}
+		self.limit = limit
+		self.matches = []
+		# `tag` elements open at the current position, with their match or `None` if they don't match
+		self.stack = []
+
+	def handle_starttag(self, tag, attrs):
+		if tag != self.tag:
+			return
+
+		match = None
+		attrs = dict(attrs)
+		if not self.limit_reached() and all(attrs.get(key) == value for key, value in self.attrs.items()):
+			match = frappe._dict(attrs=attrs, text=[])
+			self.matches.append(match)
+		self.stack.append(match)
+
+	def handle_data(self, data):
+		for match in self.stack:
+			if match:
+				match.text.append(data)
+
+	def handle_endtag(self, tag):
+		if tag != self.tag or not self.stack:
+			return
+		if match := self.stack.pop():
+			self.finish_match(match)
+
+	def close(self):
+		super().close()
+		# unclosed matches run to the end of the content
+		while self.stack:
+			if match := self.stack.pop():
+				self.finish_match(match)
+
+	def finish_match(self, match):
+		match.text = "".join(match.text)
+		if self.limit_reached() and not any(self.stack):
+			raise StopParsing
+
+	def limit_reached(self):
+		return bool(self.limit) and len(self.matches) >= self.limit
+
+
+def extract_tags(html: str, tag: str, attrs: dict | None = None, limit: int | None = None) -> list:
+	"""
+	Get the tags of `html` matching `tag` and `attrs`, in document order. Results are cached by
+	the hash of the content, so that the same content is parsed once per process.
+
+	:param html: HTML content
+	:param tag: Tag name
+	:param attrs: Attribute values the tags must have
+	:param limit: Stop parsing after this many matches
+	:return: `attrs` and `text` of every matching tag
+	"""
+	if not html:
+		return []
+
+	key = (
+		hashlib.md5(html.encode()).hexdigest(),
+		tag,
+		tuple(sorted((attrs or {}).items())),
+		limit,
+	)
+	matches = _cache.get(key)
+	if matches is None:
+		matches = parse_tags(html, tag, attrs, limit)
+		if len(_cache) >= CACHE_SIZE:
+			_cache.pop(next(iter(_cache), None), None)
+		_cache[key] = matches
+
+	return [frappe._dict(attrs=dict(match.attrs), text=match.text) for match in matches]
+
+
+def extract_tag(html: str, tag: str, attrs: dict | None = None):
+	"""
+	Get the first tag of `html` matching `tag` and `attrs`, like `extract_tags`
+
+	:return: `attrs` and `text` of the tag, `None` if there is none
+	"""
+	matches = extract_tags(html, tag, attrs, limit=1)
+	return matches[0] if matches else None
+
+
+def parse_tags(html, tag, attrs=None, limit=None):
+	extractor = TagExtractor(tag, attrs, limit)
+	try:
+		extractor.feed(html)
+		extractor.close()
+	except StopParsing:
+		pass
+	return extractor.matches